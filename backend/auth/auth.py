@@ -1,12 +1,10 @@
 from fastapi import HTTPException, status
 from passlib.context import CryptContext
-from db.connection import db
+from models.db import users_collection
 from .jwt_handler import create_access_token
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-users_collection = db.users  # MongoDB collection
-
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
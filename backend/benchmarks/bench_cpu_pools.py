@@ -0,0 +1,190 @@
+"""Throughput of the local models under mixed concurrent load, with and without CPU pools.
+
+Run from backend/:
+    python -m benchmarks.bench_cpu_pools --duration 60
+    python -m benchmarks.bench_cpu_pools --workload synthetic --duration 20 --clients 2
+    CPU_POOLS="tinyllama=0-7;t5=8-11;bert=12-13;minilm=14-15" python -m benchmarks.bench_cpu_pools
+    python -m benchmarks.bench_cpu_pools --pools tinyllama --duration 30
+
+Each mode runs in a fresh process, since torch thread settings cannot be undone:
+"shared" disables the scheduler (every model uses every core, as before) and
+"partitioned" gives each model pool its own cores. Every pool is driven by
+--clients threads calling it back to back for --duration seconds.
+
+--pools limits the load to some pools. Driving a single pool measures what a
+lone request costs when nothing else runs, which partitioning makes slower;
+the scheduler is off by default, so enabling it on a machine should come with
+both numbers (mixed and single-pool) recorded via --out.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+
+from benchmarks import synthetic
+
+MODES = {"shared": "0", "partitioned": "1"}
+
+
+# === Workloads: pool -> (call, items per call) ===
+def model_workloads(args):
+    from pipeline.classifytrain import classify_texts_with_model
+    from pipeline.comcheck_llama import llama_classify_batch
+    from pipeline.summarize_t5 import generate_section_summary
+    from serving.registry import embed_texts
+
+    pages = synthetic.report_text(args.items, args.seed)
+    claims = synthetic.claims(args.items, args.seed)
+    prompt = "summarize the cash flow and capital expenditures information: " + " ".join(pages[:3])
+    return {
+        "tinyllama": (lambda: llama_classify_batch(claims[:2]), 2),
+        "t5": (lambda: generate_section_summary(prompt), 1),
+        "bert": (lambda: classify_texts_with_model(pages), len(pages)),
+        "minilm": (lambda: embed_texts(pages * 4), len(pages) * 4),
+    }
+
+
+def synthetic_workloads(args):
+    # Matmul chains sized like the models' relative cost, for machines without the weights.
+    import torch
+    from serving.scheduler import SCHEDULER
+
+    def matmuls(size: int, steps: int):
+        a = torch.randn(size, size)
+        b = torch.randn(size, size)
+
+        def run():
+            x = a
+            for _ in range(steps):
+                x = torch.tanh(x @ b)
+            return x
+        return run
+
+    shapes = {"tinyllama": (1024, 16), "t5": (768, 12), "bert": (768, 6), "minilm": (384, 6)}
+    workloads = {}
+    for pool, (size, steps) in shapes.items():
+        run = matmuls(size, steps)
+        workloads[pool] = (lambda pool=pool, run=run: SCHEDULER.call(pool, run), 1)
+    return workloads
+
+
+WORKLOADS = {"models": model_workloads, "synthetic": synthetic_workloads}
+
+
+# === One mode, in this process ===
+def drive(workloads, clients: int, duration: float, warmup: int) -> dict:
+    for call, _ in workloads.values():
+        for _ in range(warmup):
+            call()
+
+    latencies = {pool: [] for pool in workloads}
+    lock = threading.Lock()
+    start = threading.Barrier(len(workloads) * clients + 1)
+    deadline = [0.0]
+
+    def client(pool, call):
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            started = time.perf_counter()
+            call()
+            with lock:
+                latencies[pool].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(pool, call), daemon=True)
+               for pool, (call, _) in workloads.items() for _ in range(clients)]
+    for t in threads:
+        t.start()
+    deadline[0] = time.perf_counter() + duration
+    began = time.perf_counter()
+    start.wait()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+
+    results = {}
+    for pool, (_, items) in workloads.items():
+        ms = sorted(s * 1000 for s in latencies[pool])
+        results[pool] = {
+            "calls": len(ms),
+            "items_per_s": round(len(ms) * items / elapsed, 2),
+            "p50_ms": round(statistics.median(ms), 1) if ms else None,
+            "p95_ms": round(ms[int(0.95 * (len(ms) - 1))], 1) if ms else None,
+        }
+    return results
+
+
+def run_mode(args) -> dict:
+    from serving.scheduler import SCHEDULER
+    workloads = WORKLOADS[args.workload](args)
+    if args.pools:
+        workloads = {pool: workloads[pool] for pool in args.pools.split(",")}
+    return {"cpu": SCHEDULER.snapshot(), "results": drive(workloads, args.clients, args.duration, args.warmup)}
+
+
+# === Both modes, one subprocess each ===
+def spawn(mode: str, args) -> dict:
+    command = [sys.executable, "-m", "benchmarks.bench_cpu_pools", "--mode", mode,
+               "--workload", args.workload, "--duration", str(args.duration), "--clients", str(args.clients),
+               "--items", str(args.items), "--warmup", str(args.warmup), "--seed", str(args.seed)]
+    if args.pools:
+        command += ["--pools", args.pools]
+    env = {**os.environ, "CPU_SCHEDULER": MODES[mode]}
+    out = subprocess.run(command, env=env, capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def print_report(report: dict):
+    shared, partitioned = report["shared"], report["partitioned"]
+    for mode, result in report.items():
+        if "error" in result:
+            print(f"{mode}: failed: {result['error']}")
+    if "error" in shared or "error" in partitioned:
+        return
+    print(f"{'pool':<10} {'cores':<12} {'shared/s':>10} {'pinned/s':>10} {'speedup':>8} {'p95 shared':>11} {'p95 pinned':>11}")
+    for pool, before in shared["results"].items():
+        after = partitioned["results"][pool]
+        cores = partitioned["cpu"]["pools"].get(pool, {}).get("cores", [])
+        span = f"{cores[0]}-{cores[-1]}" if len(cores) > 1 else ",".join(map(str, cores))
+        speedup = after["items_per_s"] / before["items_per_s"] if before["items_per_s"] else float("nan")
+        print(f"{pool:<10} {span:<12} {before['items_per_s']:>10.2f} {after['items_per_s']:>10.2f} {speedup:>7.2f}x "
+              f"{before['p95_ms'] or 0:>10.1f}  {after['p95_ms'] or 0:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", choices=list(WORKLOADS), default="models")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of mixed load per mode")
+    parser.add_argument("--clients", type=int, default=1, help="concurrent callers per pool")
+    parser.add_argument("--items", type=int, default=8, help="pages/claims per model call")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pools", help="comma-separated pools to drive (default: all)")
+    parser.add_argument("--mode", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--out", help="write both modes' results JSON here")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args)))
+        return
+
+    report = {mode: spawn(mode, args) for mode in MODES}
+    print_report(report)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
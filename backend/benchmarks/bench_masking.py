@@ -0,0 +1,110 @@
+"""Throughput of the single-pass masking engine against the legacy per-rule passes.
+
+Run from backend/:  python -m benchmarks.bench_masking --pages 2000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.masking import MASKER, PII_MASKER
+
+
+# === Legacy implementations (as they were in classify.py / classifytrain.py) ===
+def legacy_mask_sensitive_data(text: str) -> str:
+    text = text.encode('ascii', 'ignore').decode('utf-8', 'ignore')
+    text = text.replace('\r', '').replace('\n', ' ')
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    text = re.sub(r'\b\d{4}[\s\-]?\d{4}[\s\-]?\d{4}\b', 'XXXXX', text)
+    text = re.sub(r'\b\d{3}-\d{2}-\d{4}\b', 'XXX-XX-XXXX', text)
+    text = re.sub(r'\+?\d{1,2}[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{4}', 'Phone Number: XXXXX', text)
+    text = re.sub(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}', 'EMAIL', text)
+
+    orgs = ['IRS', 'Infosys', 'TCS', 'Wipro', 'HDFC', 'ICICI', 'Deloitte']
+    for org in orgs:
+        text = re.sub(fr'\b{org}\b', '[ORG]', text, flags=re.IGNORECASE)
+
+    text = re.sub(r'(₹|\$|Rs\.?)\s?\d+[,.]?\d*', 'XXXXX', text)
+    text = re.sub(r'Name\s*[:\-]?\s*[A-Z][a-z]+\s[A-Z][a-z]+', 'Name: XXXXX', text)
+    return text
+
+
+def legacy_mask_pii(text: str) -> str:
+    text = re.sub(r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}\b', 'XXXXX', text)
+    text = re.sub(r'\b[A-Z]{5}[0-9]{4}[A-Z]\b', 'XXXXX', text)
+    text = re.sub(r'\b[6-9]\d{9}\b', 'XXXXX', text)
+    text = re.sub(r'\b\d{10}\b', 'XXXXX', text)
+    text = re.sub(r'\$\d{1,3}(?:,\d{3})*(?:\.\d{2})?', 'XXXXX', text)
+    text = re.sub(r'(Taxpayer Name:\s*)(.*)', r'\1XXXXX', text)
+    return text
+
+
+# === Synthetic OCR pages ===
+FILLER = (
+    "Invoice for professional services rendered during the quarter. Payment terms net 30. "
+    "Line item consulting hours billed at the agreed rate with applicable GST. "
+)
+
+
+def synthetic_page(rng: random.Random) -> str:
+    pii = [
+        f"Name: {rng.choice(['Ravi', 'Asha', 'John'])} {rng.choice(['Kumar', 'Rao', 'Smith'])}",
+        f"Taxpayer Name: {rng.choice(['Meera', 'Arjun'])} {rng.choice(['Iyer', 'Shah'])}",
+        f"PAN {''.join(rng.choices('ABCDEFGHIJ', k=5))}{rng.randint(1000, 9999)}Z",
+        f"Aadhaar {rng.randint(1000, 9999)} {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}",
+        f"SSN {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}",
+        f"Mobile {rng.randint(6, 9)}{rng.randint(100000000, 999999999)}",
+        f"contact{rng.randint(1, 99)}@example.com",
+        f"Amount ${rng.randint(1, 999)},{rng.randint(100, 999)}.00 and Rs. {rng.randint(100, 99999)}",
+        rng.choice(['Infosys', 'TCS', 'HDFC Bank', 'Deloitte', 'IRS']),
+    ]
+    lines = []
+    for _ in range(20):
+        lines.append(FILLER)
+        lines.append(rng.choice(pii))
+    return "\n".join(lines)
+
+
+def throughput(fn, pages, repeat):
+    size_mb = sum(len(p.encode('utf-8')) for p in pages) / 1e6
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(pages)
+        best = min(best, time.perf_counter() - start)
+    return size_mb / best, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [synthetic_page(rng) for _ in range(args.pages)]
+
+    cases = {
+        "legacy mask_sensitive_data": lambda ps: [legacy_mask_sensitive_data(p) for p in ps],
+        "legacy mask_pii": lambda ps: [legacy_mask_pii(p) for p in ps],
+        "legacy both (per page)": lambda ps: [(legacy_mask_sensitive_data(p), legacy_mask_pii(p)) for p in ps],
+        "engine mask_sensitive_data": lambda ps: [MASKER.mask(p, normalize=True) for p in ps],
+        "engine mask_pii": lambda ps: [PII_MASKER.mask(p) for p in ps],
+        "engine both (per page)": lambda ps: [(MASKER.mask(p, normalize=True), PII_MASKER.mask(p)) for p in ps],
+        "engine mask_batch (both)": lambda ps: (MASKER.mask_batch(ps, normalize=True), PII_MASKER.mask_batch(ps)),
+    }
+
+    print(f"{args.pages} pages, best of {args.repeat}")
+    for name, fn in cases.items():
+        mb_s, seconds = throughput(fn, pages, args.repeat)
+        print(f"{name:<30} {mb_s:8.2f} MB/s  {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare two benchmark result files and flag regressions.
+
+Run from backend/:  python -m benchmarks.compare benchmarks/baselines/main.json benchmarks/results/current.json
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_THRESHOLD = 0.15
+# Noisier benchmarks get more headroom before they count as regressions.
+THRESHOLDS = {
+    "ocr": 0.25,
+    "t5_summarize": 0.25,
+    "tinyllama": 0.25,
+}
+
+
+def load(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD,
+            selected: Optional[Iterable[str]] = None) -> List[Dict]:
+    """One row per benchmark measured in the baseline (limited to `selected` when the
+    current run only ran some); `regressed` when p50 grew past its threshold, or when
+    the current run skipped it or no longer has it."""
+    selected = set(selected) if selected is not None else None
+    rows = []
+    for name, before in baseline["results"].items():
+        if "p50_ms" not in before or (selected is not None and name not in selected):
+            continue
+        now = current["results"].get(name)
+        limit = THRESHOLDS.get(name, threshold)
+        if now is None or "p50_ms" not in now:
+            rows.append({
+                "name": name,
+                "baseline_p50_ms": before["p50_ms"],
+                "current_p50_ms": None,
+                "change": None,
+                "threshold": limit,
+                "regressed": True,
+                "status": now["skipped"] if now and "skipped" in now else "missing",
+            })
+            continue
+        change = now["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        rows.append({
+            "name": name,
+            "baseline_p50_ms": before["p50_ms"],
+            "current_p50_ms": now["p50_ms"],
+            "change": round(change, 4),
+            "threshold": limit,
+            "regressed": change > limit,
+        })
+    return rows
+
+
+def unmeasured(report: Dict) -> List[str]:
+    return [name for name, result in report["results"].items() if "p50_ms" not in result]
+
+
+def print_report(rows: List[Dict], baseline: Dict = None):
+    if baseline is not None and unmeasured(baseline):
+        # Those benchmarks are not guarded at all until the baseline is re-recorded.
+        print(f"⚠ baseline did not measure: {', '.join(unmeasured(baseline))}")
+    for row in rows:
+        if row["current_p50_ms"] is None:
+            print(f"{row['name']:<26} {row['baseline_p50_ms']:10.2f} → {'—':>10}    not measured: {row['status']}  REGRESSED")
+            continue
+        flag = "REGRESSED" if row["regressed"] else "ok"
+        print(f"{row['name']:<26} {row['baseline_p50_ms']:10.2f} → {row['current_p50_ms']:10.2f} ms "
+              f"{row['change'] * 100:+7.1f}%  (limit {row['threshold'] * 100:.0f}%)  {flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    baseline = load(args.baseline)
+    rows = compare(baseline, load(args.current), args.threshold)
+    print_report(rows, baseline)
+    sys.exit(1 if any(r["regressed"] for r in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
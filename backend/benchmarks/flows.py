@@ -0,0 +1,89 @@
+"""End-to-end endpoint flows, driven in-process through the ASGI app.
+
+The app lifespan is not started, so no job workers or index bootstrapping run;
+result documents still go through the buffered writer off the request path.
+"""
+from typing import Callable, Dict
+
+from benchmarks import synthetic
+
+FLOWS: Dict[str, Callable] = {}
+
+
+def flow(name: str):
+    def register(setup):
+        FLOWS[name] = setup
+        return setup
+    return register
+
+
+def _pdf_upload(pdf: bytes, name: str = "report.pdf"):
+    return {"file": (name, pdf, "application/pdf")}
+
+
+@flow("summarize_gemini")
+def _summarize(params):
+    pdf = synthetic.report_pdf(params["pdf_pages"], params["seed"])
+    return ("/summarize", {"summary_type": "short", "model": "gemini"}, _pdf_upload(pdf)), 1
+
+
+@flow("summarize_t5")
+def _summarize_t5(params):
+    text = "\n\n".join(synthetic.report_text(params["model_items"], params["seed"]))
+    return ("/summarize", {"model": "t5", "text": text}, None), 1
+
+
+@flow("qa_gemini")
+def _qa(params):
+    pdf = synthetic.report_pdf(params["pdf_pages"], params["seed"])
+    return ("/qa_api", {"question": "What was the operating margin?", "model": "gemini"}, _pdf_upload(pdf)), 1
+
+
+@flow("qa_t5")
+def _qa_t5(params):
+    pdf = synthetic.report_pdf(params["pdf_pages"], params["seed"])
+    return ("/qa_api", {"question": "What was the operating margin?", "model": "t5_small"}, _pdf_upload(pdf)), 1
+
+
+@flow("classify_bert")
+def _classify_bert(params):
+    pdf = synthetic.report_pdf(params["ocr_pages"], params["seed"])
+    return ("/classify", {"model": "bert"}, _pdf_upload(pdf)), params["ocr_pages"]
+
+
+@flow("classify_cascade")
+def _classify_cascade(params):
+    pdf = synthetic.report_pdf(params["ocr_pages"], params["seed"])
+    return ("/classify", {"model": "cascade"}, _pdf_upload(pdf)), params["ocr_pages"]
+
+
+@flow("compliance_gemini")
+def _compliance_gemini(params):
+    text = synthetic.claims_document(params["claims"], params["seed"])
+    return ("/compliance", {"model": "gemini", "text": text}, None), params["claims"]
+
+
+@flow("compliance_tinyllama")
+def _compliance_llama(params):
+    text = synthetic.claims_document(params["model_items"], params["seed"])
+    return ("/compliance", {"model": "tinyllama", "text": text}, None), params["model_items"]
+
+
+def make_client(app):
+    """One in-process client for every flow, so timings don't include client setup."""
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+
+
+def make_caller(client, request) -> Callable:
+    """Returns an async callable that posts one request and fails on non-2xx."""
+    path, data, files = request
+
+    async def call():
+        response = await client.post(path, data=data, files=files)
+        response.raise_for_status()
+        body = response.json()
+        if isinstance(body, dict) and "error" in body:
+            raise RuntimeError(body["error"])
+        return body
+    return call
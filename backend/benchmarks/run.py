@@ -0,0 +1,171 @@
+"""Offline benchmark suite: per-stage timings and full endpoint flows.
+
+Run from backend/:
+    python -m benchmarks.run --out benchmarks/results/current.json
+    python -m benchmarks.run --stages rules,masking --flows none --baseline benchmarks/baselines/main.json
+
+benchmarks/baselines/main.json is the committed reference run; refresh it with
+--out when a change is meant to move the numbers, on a machine with every
+dependency and model installed (compare warns about anything it did not
+measure). results/ is not committed.
+
+Gemini is replaced by a deterministic local stand-in (see fake_gemini.py);
+stages whose dependencies or models are unavailable are recorded as skipped.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+# The pipelines refuse to import without a key; the fake client never uses it.
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+
+from benchmarks import compare as compare_mod
+from benchmarks.flows import FLOWS, make_caller, make_client
+from benchmarks.stages import STAGES
+
+
+def summarize_timings(timings, items: int) -> dict:
+    ms = sorted(t * 1000 for t in timings)
+    p50 = statistics.median(ms)
+    return {
+        "runs": len(ms),
+        "items": items,
+        "min_ms": round(ms[0], 3),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "items_per_s": round(items / (p50 / 1000), 2) if p50 else None,
+    }
+
+
+def time_sync(fn, repeat: int, warmup: int):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def time_async(fn, repeat: int, warmup: int):
+    for _ in range(warmup):
+        await fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def select(names: str, registry: dict):
+    if names == "all":
+        return list(registry)
+    if names == "none":
+        return []
+    chosen = [n.strip() for n in names.split(",") if n.strip()]
+    unknown = [n for n in chosen if n not in registry]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)} (available: {', '.join(registry)})")
+    return chosen
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run_stages(names, params, repeat, warmup, results):
+    for name in names:
+        try:
+            fn, items = STAGES[name](params)
+            results[name] = summarize_timings(time_sync(fn, repeat, warmup), items)
+        except Exception as e:
+            results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+        print(f"stage {name:<24} {results[name]}")
+
+
+async def run_flows(names, params, repeat, warmup, results, gemini_latency_ms):
+    if not names:
+        return
+    from benchmarks import fake_gemini
+    from main import app
+    fake_gemini.install(gemini_latency_ms)
+    async with make_client(app) as client:
+        for name in names:
+            try:
+                request, items = FLOWS[name](params)
+                timings = await time_async(make_caller(client, request), repeat, warmup)
+                results[f"flow:{name}"] = summarize_timings(timings, items)
+            except Exception as e:
+                results[f"flow:{name}"] = {"skipped": f"{type(e).__name__}: {e}"}
+            print(f"flow  {name:<24} {results[f'flow:{name}']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default="all", help="comma-separated stage names, 'all' or 'none'")
+    parser.add_argument("--flows", default="all", help="comma-separated flow names, 'all' or 'none'")
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--ocr-pages", type=int, default=3)
+    parser.add_argument("--claims", type=int, default=200)
+    parser.add_argument("--model-items", type=int, default=8, help="inputs per local-model benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=0.0)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=compare_mod.DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    params = {
+        "pdf_pages": args.pdf_pages, "ocr_pages": args.ocr_pages, "claims": args.claims,
+        "model_items": args.model_items, "seed": args.seed,
+    }
+    results = {}
+    stages, flows = select(args.stages, STAGES), select(args.flows, FLOWS)
+    run_stages(stages, params, args.repeat, args.warmup, results)
+    asyncio.run(run_flows(flows, params, args.repeat, args.warmup, results, args.gemini_latency_ms))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {**params, "repeat": args.repeat, "warmup": args.warmup,
+                       "gemini_latency_ms": args.gemini_latency_ms},
+        },
+        "results": results,
+    }
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+
+    if args.baseline:
+        baseline = compare_mod.load(args.baseline)
+        selected = stages + [f"flow:{name}" for name in flows]
+        rows = compare_mod.compare(baseline, report, args.threshold, selected)
+        compare_mod.print_report(rows, baseline)
+        if any(r["regressed"] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Single-stage benchmarks. Each setup builds its inputs once and returns (fn, items)."""
+import io
+import random
+from typing import Callable, Dict
+
+from benchmarks import synthetic
+
+STAGES: Dict[str, Callable] = {}
+
+
+def bench(name: str):
+    def register(setup):
+        STAGES[name] = setup
+        return setup
+    return register
+
+
+# === Extraction ===
+@bench("pdf_extract_pypdf2")
+def _pdf_extract_pypdf2(params):
+    from pipeline.qa import extract_text_from_pdf_bytes
+    pdf = synthetic.report_pdf(params["pdf_pages"], params["seed"])
+    return lambda: extract_text_from_pdf_bytes(io.BytesIO(pdf)), params["pdf_pages"]
+
+
+@bench("pdf_extract_pymupdf")
+def _pdf_extract_pymupdf(params):
+    from pipeline.comcheck import extract_text_from_bytes
+    pdf = synthetic.report_pdf(params["pdf_pages"], params["seed"])
+    return lambda: extract_text_from_bytes(pdf), params["pdf_pages"]
+
+
+@bench("locate_sections")
+def _locate_sections(params):
+    from utils.sections import locate_sections
+    pdf = synthetic.report_pdf(params["pdf_pages"], params["seed"])
+    return lambda: locate_sections(pdf), params["pdf_pages"]
+
+
+@bench("ocr")
+def _ocr(params):
+    import pytesseract
+    pages = min(params["pdf_pages"], params["ocr_pages"])
+    images = synthetic.pdf_page_images(synthetic.report_pdf(pages, params["seed"]))
+    return lambda: [pytesseract.image_to_string(img) for img in images], pages
+
+
+# === Text processing ===
+@bench("chunk")
+def _chunk(params):
+    from pipeline.summarize import split_into_chunks
+    text = " ".join(synthetic.report_text(params["pdf_pages"], params["seed"]))
+    return lambda: split_into_chunks(text), params["pdf_pages"]
+
+
+@bench("masking")
+def _masking(params):
+    from benchmarks.bench_masking import synthetic_page
+    from utils.masking import MASKER
+    rng = random.Random(params["seed"])
+    pages = [synthetic_page(rng) for _ in range(params["pdf_pages"])]
+    return lambda: MASKER.mask_batch(pages), len(pages)
+
+
+@bench("rules")
+def _rules(params):
+    from pipeline.travel_rules import evaluate_claims
+    claims = synthetic.claims(params["claims"], params["seed"])
+    return lambda: evaluate_claims(claims), len(claims)
+
+
+# === Retrieval ===
+@bench("embed")
+def _embed(params):
+    from pipeline.policy_index import EMBEDDER
+    chunks = synthetic.report_text(params["pdf_pages"], params["seed"])
+    return lambda: EMBEDDER.encode(chunks, convert_to_numpy=True), len(chunks)
+
+
+@bench("faiss_search")
+def _faiss_search(params):
+    from pipeline.policy_index import POLICY_INDEX, EMBEDDER
+    claims = synthetic.claims(params["claims"], params["seed"])
+    vectors = EMBEDDER.encode(claims, convert_to_numpy=True, normalize_embeddings=True)
+    index = POLICY_INDEX.snapshot.index
+    return lambda: index.search(vectors, 2), len(claims)
+
+
+@bench("policy_search_many")
+def _policy_search_many(params):
+    from pipeline.policy_index import POLICY_INDEX
+    claims = synthetic.claims(params["claims"], params["seed"])
+    return lambda: POLICY_INDEX.search_many(claims), len(claims)
+
+
+# === Local models ===
+@bench("bert")
+def _bert(params):
+    from pipeline.classifytrain import classify_texts_with_model
+    pages = synthetic.report_text(params["model_items"], params["seed"])
+    return lambda: classify_texts_with_model(pages), len(pages)
+
+
+@bench("t5_summarize")
+def _t5(params):
+    from pipeline.summarize_t5 import structured_summary_with_sections
+    chunks = synthetic.report_text(params["model_items"], params["seed"])
+    queries = ["summarize the cash flow and capital expenditures information"]
+    return lambda: structured_summary_with_sections(chunks, queries), len(queries)
+
+
+@bench("tinyllama")
+def _tinyllama(params):
+    from pipeline.comcheck_llama import llama_classify_batch
+    claims = synthetic.claims(params["model_items"], params["seed"] + 1)
+    return lambda: llama_classify_batch(claims), len(claims)
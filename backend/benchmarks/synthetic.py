@@ -0,0 +1,120 @@
+"""Deterministic synthetic inputs: annual-report PDFs, OCR-like pages and travel claims."""
+import random
+from typing import List
+
+SECTIONS = [
+    ("Management Discussion and Analysis",
+     "Revenue grew {pct}% year over year to ${rev} million, driven by {driver}. Operating margin "
+     "expanded to {margin}% as cost programmes matured. Management expects continued demand in {region}."),
+    ("Consolidated Statement of Cash Flows",
+     "Net cash from operating activities was ${ocf} million. Capital expenditures of ${capex} million "
+     "were funded from operations. Financing outflows included dividends of ${div} million."),
+    ("Risk Factors",
+     "The company is exposed to {risk}. Adverse changes in {risk2} could materially affect results. "
+     "Mitigation includes hedging programmes and supplier diversification."),
+    ("Income Taxes",
+     "The effective tax rate was {tax}% compared with {tax_prev}% in the prior year. Foreign tax "
+     "liabilities of ${ftl} million relate primarily to operations in {region}."),
+    ("Internal Control over Financial Reporting",
+     "Management assessed the effectiveness of internal control over financial reporting and concluded "
+     "it was effective. The independent auditor issued an unqualified opinion."),
+]
+DRIVERS = ["cloud subscriptions", "retail banking fees", "industrial orders", "consumer electronics"]
+REGIONS = ["Asia Pacific", "Europe", "North America", "Latin America"]
+RISKS = ["foreign exchange volatility", "interest rate movements", "supply chain disruption",
+         "regulatory change", "cybersecurity incidents", "commodity prices"]
+
+
+def report_paragraph(rng: random.Random) -> str:
+    title, template = rng.choice(SECTIONS)
+    body = template.format(
+        pct=rng.randint(2, 30), rev=rng.randint(500, 90000), driver=rng.choice(DRIVERS),
+        margin=rng.randint(5, 40), region=rng.choice(REGIONS), ocf=rng.randint(100, 9000),
+        capex=rng.randint(50, 4000), div=rng.randint(10, 900), risk=rng.choice(RISKS),
+        risk2=rng.choice(RISKS), tax=rng.randint(15, 30), tax_prev=rng.randint(15, 30),
+        ftl=rng.randint(5, 800),
+    )
+    return f"{title}\n{body}"
+
+
+def report_text(pages: int, seed: int = 0, paragraphs_per_page: int = 6) -> List[str]:
+    rng = random.Random(seed)
+    return ["\n\n".join(report_paragraph(rng) for _ in range(paragraphs_per_page)) for _ in range(pages)]
+
+
+def report_pdf(pages: int, seed: int = 0) -> bytes:
+    """A text-layer PDF of `pages` report pages, built with PyMuPDF."""
+    import fitz
+    doc = fitz.open()
+    for text in report_text(pages, seed):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), text, fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def pdf_page_images(pdf_bytes: bytes, dpi: int = 150):
+    """Rasterised pages (PIL images) for OCR benchmarks, without needing poppler."""
+    import fitz
+    from PIL import Image
+    images = []
+    with fitz.open("pdf", pdf_bytes) as doc:
+        for page in doc:
+            pix = page.get_pixmap(dpi=dpi)
+            images.append(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+    return images
+
+
+# === Travel claims ===
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Pune", "Jaipur", "Lucknow", "Nagpur", "Mysuru"]
+GRADES = ["Management Executive", "Senior Executive", "Executive"]
+CATEGORIES = ["Accommodation", "Meals", "Air Travel", "Rail Travel", "Local Conveyance"]
+
+
+def claim_text(rng: random.Random) -> str:
+    category = rng.choice(CATEGORIES)
+    fields = [
+        f"Employee_Grade: {rng.choice(GRADES)}",
+        f"City: {rng.choice(CITIES)}",
+        f"Expense_Type: {category}",
+        f"Amount: ₹{rng.randint(200, 25000)}",
+        f"Receipt_Attached: {rng.choice(['Yes', 'Yes', 'Yes', 'No'])}",
+    ]
+    if category == "Accommodation":
+        fields.append(f"Nights: {rng.randint(1, 5)}")
+    if category == "Meals":
+        fields.append(f"Days: {rng.randint(1, 5)}")
+    if category == "Air Travel":
+        fields += [
+            f"Approval_Status: {rng.choice(['true', 'false'])}",
+            f"Days_In_Advance: {rng.randint(0, 21)}",
+            f"Class: {rng.choice(['Economy', 'Economy', 'Business'])}",
+        ]
+    if rng.random() < 0.2:
+        # Free-text claims the rules cannot settle and must escalate to the LLM.
+        return f"Team dinner with client in {rng.choice(CITIES)}, shared cab and tips, total ₹{rng.randint(500, 9000)}"
+    return ", ".join(fields)
+
+
+def claims(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [claim_text(rng) for _ in range(count)]
+
+
+def claims_document(count: int, seed: int = 0) -> str:
+    """Claims in the "Claim: ..." layout the compliance endpoints split on."""
+    return "\n".join(f"Claim: {c}" for c in claims(count, seed))
+
+
+def claims_pdf(count: int, seed: int = 0, per_page: int = 20) -> bytes:
+    import fitz
+    doc = fitz.open()
+    lines = claims_document(count, seed).splitlines()
+    for i in range(0, len(lines), per_page):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, page.rect.width - 40, page.rect.height - 40),
+                            "\n".join(lines[i:i + per_page]), fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
@@ -0,0 +1,179 @@
+import os
+import base64
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+
+from db.mongodb import mongo
+from db.storage import HISTORY_PREVIEW_CHARS, load_large_fields
+from models.db import compliance_collection, summarization_collection, classification_collection, qa_collection
+
+# === User history ===
+# Every result collection is read newest-first per user, so each gets a
+# (user_id, timestamp, _id) index and pages are fetched by keyset: the cursor is
+# the (timestamp, _id) of the last row returned, so page N costs the same as page 1.
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "500"))
+# Requests with neither cursor nor limit come from clients written before
+# pagination (the Flutter app): they keep getting full rows, up to the old limit.
+HISTORY_LEGACY_LIMIT = int(os.getenv("HISTORY_LEGACY_LIMIT", "100"))
+
+HISTORY_SORT = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+HISTORY_INDEX = [("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]
+
+# kind -> (collection, small fields returned as-is, heavy text fields returned as previews)
+HISTORY_COLLECTIONS = {
+    "compliance": (
+        compliance_collection,
+        ["timestamp", "input_type", "claim_text", "compliant", "matched_policies", "rule_ids", "decided_by", "policy_version"],
+        ["reasoning"],
+    ),
+    "summarization": (
+        summarization_collection,
+        ["timestamp", "input_type", "summary_type", "model", "input_excerpt"],
+        ["summary"],
+    ),
+    "classification": (
+        classification_collection,
+        ["timestamp", "input_type", "page", "label", "confidence", "stage"],
+        ["masked_text"],
+    ),
+    "qa": (
+        qa_collection,
+        ["timestamp", "input_type", "model", "question"],
+        ["answer"],
+    ),
+}
+
+
+def list_projection(kind: str) -> dict:
+    _, fields, heavy = HISTORY_COLLECTIONS[kind]
+    projection = {field: 1 for field in fields}
+    for field in heavy:
+        projection[field] = {"$substrCP": [{"$ifNull": [f"${field}", ""]}, 0, HISTORY_PREVIEW_CHARS]}
+    return projection
+
+
+for _collection, _, _ in HISTORY_COLLECTIONS.values():
+    mongo.register_index(_collection, HISTORY_INDEX, name="user_timestamp")
+
+
+# --- cursors ---
+def encode_cursor(doc: dict) -> str:
+    raw = f"{doc['timestamp'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    timestamp, oid = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+    return datetime.fromisoformat(timestamp), ObjectId(oid)
+
+
+def after_cursor(cursor: Optional[str]) -> dict:
+    if not cursor:
+        return {}
+    try:
+        timestamp, oid = decode_cursor(cursor)
+    except (ValueError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": oid}},
+    ]}
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    return max(1, min(limit or HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE))
+
+
+# --- queries ---
+async def fetch_history_page(kind: str, user_id: str, cursor: Optional[str] = None,
+                             limit: Optional[int] = None) -> Tuple[List[dict], Optional[str]]:
+    """Returns one page of list-view rows and the cursor for the next page (None at the end)."""
+    collection, _, _ = HISTORY_COLLECTIONS[kind]
+    legacy = not cursor and not limit
+    limit = HISTORY_LEGACY_LIMIT if legacy else clamp_page_size(limit)
+    projection = None if legacy else list_projection(kind)
+    query = {"user_id": user_id, **after_cursor(cursor)}
+
+    # Fetch one extra row to know whether another page exists.
+    rows = await collection.find(query, projection).sort(HISTORY_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    for r in rows:
+        r["_id"] = str(r["_id"])
+    if legacy:
+        rows = await asyncio.gather(*(load_large_fields(collection, r) for r in rows))
+    return list(rows), next_cursor
+
+
+async def fetch_history_record(kind: str, user_id: str, record_id: str) -> Optional[dict]:
+    collection, _, _ = HISTORY_COLLECTIONS[kind]
+    try:
+        oid = ObjectId(record_id)
+    except InvalidId:
+        return None
+    record = await collection.find_one({"_id": oid, "user_id": user_id})
+    if record is None:
+        return None
+    record["_id"] = str(record["_id"])
+    return await load_large_fields(collection, record)
+
+
+# === Unified timeline ===
+# One aggregation over every result collection: each branch matches on the
+# (user_id, timestamp) index and projects list-view fields, $unionWith stitches
+# the branches together and a single sort orders the merged feed.
+def _timeline_branch(kind: str, match: dict) -> list:
+    return [{"$match": match}, {"$project": {**list_projection(kind), "kind": {"$literal": kind}}}]
+
+
+def timeline_pipeline(user_id: str, kinds: List[str], cursor: Optional[str] = None,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      limit: Optional[int] = None) -> Tuple[object, list]:
+    match = {"user_id": user_id, **after_cursor(cursor)}
+    window = {}
+    if since:
+        window["$gte"] = since
+    if until:
+        window["$lt"] = until
+    if window:
+        match = {"$and": [match, {"timestamp": window}]}
+
+    first, *rest = kinds
+    pipeline = _timeline_branch(first, match)
+    for kind in rest:
+        collection, _, _ = HISTORY_COLLECTIONS[kind]
+        pipeline.append({"$unionWith": {"coll": collection.name, "pipeline": _timeline_branch(kind, match)}})
+    pipeline.append({"$sort": dict(HISTORY_SORT)})
+    if limit:
+        pipeline.append({"$limit": limit + 1})
+    return HISTORY_COLLECTIONS[first][0], pipeline
+
+
+async def stream_timeline(user_id: str, kinds: Optional[List[str]] = None, cursor: Optional[str] = None,
+                          since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          limit: Optional[int] = None):
+    """Yields timeline rows newest-first, then an end record carrying the next cursor.
+
+    Without a limit the whole feed is streamed; rows are pulled from the server
+    in batches, so memory stays flat however long the history is.
+    """
+    kinds = kinds or list(HISTORY_COLLECTIONS)
+    limit = min(limit, HISTORY_MAX_PAGE_SIZE * 10) if limit else None
+    collection, pipeline = timeline_pipeline(user_id, kinds, cursor, since, until, limit)
+
+    count, last, next_cursor = 0, None, None
+    async for row in collection.aggregate(pipeline, allowDiskUse=True, batchSize=HISTORY_PAGE_SIZE):
+        if limit and count == limit:
+            next_cursor = encode_cursor(last)
+            break
+        last = row
+        count += 1
+        yield {"event": "item", **row, "_id": str(row["_id"])}
+    yield {"event": "end", "count": count, "next_cursor": next_cursor}
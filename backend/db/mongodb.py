@@ -1,7 +1,148 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
 import os
+import time
+from typing import List, Optional
 
+# === MongoDB connection manager ===
+# The one client for the whole process. The API opens it in the FastAPI lifespan;
+# job workers and scripts open it lazily on first use in their own event loop.
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URI)
-user_db = client["finance_app"]
-# usecases_db = client["finance_gpt"]
\ No newline at end of file
+MONGO_APP_DB = os.getenv("MONGO_APP_DB", "finance_gpt")
+MONGO_USER_DB = os.getenv("MONGO_USER_DB", "finance_app")
+
+
+# Server error codes for create_index on an existing index with different options/keys.
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+
+def _write_concern(value: str):
+    return int(value) if value.isdigit() else value
+
+
+CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "60000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    "w": _write_concern(os.getenv("MONGO_WRITE_CONCERN", "1")),
+    "appname": os.getenv("MONGO_APP_NAME", "finance-gpt"),
+}
+
+
+class CollectionProxy:
+    """Module-level stand-in for a collection, resolved through the manager on use.
+
+    Lets pipelines keep `from models.db import compliance_collection` while the
+    client itself is only created once the app (or worker) starts.
+    """
+
+    def __init__(self, manager: "MongoManager", db_name: str, name: str):
+        self._manager = manager
+        self._db_name = db_name
+        self.name = name
+        self.full_name = f"{db_name}.{name}"
+
+    @property
+    def collection(self) -> AsyncIOMotorCollection:
+        return self._manager.client[self._db_name][self.name]
+
+    def __getattr__(self, attr):
+        return getattr(self.collection, attr)
+
+
+class MongoManager:
+    def __init__(self, uri: str = MONGO_URI, **options):
+        self.uri = uri
+        self.options = {**CLIENT_OPTIONS, **options}
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._indexes: List[tuple] = []
+        self._ttls: List[tuple] = []
+
+    # --- lifecycle ---
+    def connect(self) -> AsyncIOMotorClient:
+        if self._client is None:
+            self._client = AsyncIOMotorClient(self.uri, **self.options)
+        return self._client
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        return self.connect()
+
+    # --- accessors ---
+    def collection(self, db_name: str, name: str) -> CollectionProxy:
+        return CollectionProxy(self, db_name, name)
+
+    # --- indexes ---
+    def register_index(self, collection: CollectionProxy, keys, **kwargs):
+        """Declares an index; created by ensure_indexes() at startup."""
+        self._indexes.append((collection, keys, kwargs))
+
+    def register_ttl(self, collection: CollectionProxy, field: str, seconds: float):
+        """Declares retention: documents expire `seconds` after `field`; 0 keeps them forever."""
+        self._ttls.append((collection, field, int(seconds)))
+
+    def retention(self, collection: CollectionProxy) -> int:
+        return next((seconds for c, _, seconds in self._ttls if c.full_name == collection.full_name), 0)
+
+    async def _ensure_ttl(self, collection: CollectionProxy, field: str, seconds: int):
+        # create_index refuses to change expireAfterSeconds on an existing index, so
+        # retention changes go through collMod and disabling it drops the index.
+        name = f"{field}_ttl"
+        existing = await collection.index_information()
+        if seconds <= 0:
+            if name in existing:
+                await collection.drop_index(name)
+        elif name not in existing:
+            await collection.create_index([(field, ASCENDING)], name=name, expireAfterSeconds=seconds)
+        elif existing[name].get("expireAfterSeconds") != seconds:
+            await collection.database.command("collMod", collection.name,
+                                              index={"name": name, "expireAfterSeconds": seconds})
+
+    async def _ensure_index(self, collection: CollectionProxy, keys, kwargs: dict):
+        try:
+            await collection.create_index(keys, **kwargs)
+        except OperationFailure as e:
+            # An index of that name exists with other options (e.g. not yet unique): replace it.
+            if e.code not in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT) or "name" not in kwargs:
+                raise
+            await collection.drop_index(kwargs["name"])
+            await collection.create_index(keys, **kwargs)
+
+    async def ensure_indexes(self):
+        for collection, keys, kwargs in self._indexes:
+            try:
+                await self._ensure_index(collection, keys, kwargs)
+            except Exception as e:
+                print(f"⚠ Could not create index {kwargs.get('name', keys)} on {collection.full_name}: {e}")
+        for collection, field, seconds in self._ttls:
+            try:
+                await self._ensure_ttl(collection, field, seconds)
+            except Exception as e:
+                print(f"⚠ Could not apply retention on {collection.full_name}: {e}")
+
+    # --- health ---
+    async def health(self) -> dict:
+        started = time.perf_counter()
+        try:
+            await self.client.admin.command("ping")
+        except Exception as e:
+            return {"status": "down", "error": str(e)}
+        return {
+            "status": "ok",
+            "ping_ms": round((time.perf_counter() - started) * 1000, 2),
+            "max_pool_size": self.options["maxPoolSize"],
+            "write_concern": self.options["w"],
+        }
+
+
+mongo = MongoManager()
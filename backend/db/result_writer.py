@@ -0,0 +1,145 @@
+import os
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from db.storage import prepare_documents
+from utils.metrics import observe_stage, register_queue
+
+# === Buffered result logging ===
+# Pipelines hand their history documents to RESULT_WRITER instead of awaiting an
+# insert_one per item. A background task groups them per collection and writes
+# them with insert_many(ordered=False) once RESULT_WRITER_BATCH documents are
+# waiting or RESULT_WRITER_FLUSH_MS has passed, whichever comes first.
+RESULT_WRITER_BATCH = int(os.getenv("RESULT_WRITER_BATCH", "200"))
+RESULT_WRITER_FLUSH_MS = float(os.getenv("RESULT_WRITER_FLUSH_MS", "250"))
+RESULT_WRITER_MAX_QUEUE = int(os.getenv("RESULT_WRITER_MAX_QUEUE", "10000"))
+
+# Set by `capture()`; every document written in that context is also copied here.
+_captured = contextvars.ContextVar("result_writer_captured", default=None)
+
+
+class ResultWriter:
+    """Bounded, batching writer for fire-and-forget result documents.
+
+    `write` only blocks when the queue is full, which pushes back on producers
+    instead of letting memory grow while the database is slow or down.
+    """
+
+    def __init__(self, max_batch: int = RESULT_WRITER_BATCH, flush_ms: float = RESULT_WRITER_FLUSH_MS,
+                 max_queue: int = RESULT_WRITER_MAX_QUEUE):
+        self.max_batch = max_batch
+        self.flush_interval = flush_ms / 1000.0
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop = None
+        self._worker = None
+        self._stats = {
+            "queued": 0, "written": 0, "failed": 0, "batches": 0,
+            "max_queue_depth": 0, "last_flush_ms": 0.0,
+        }
+
+    # --- lifecycle ---
+    def _ensure_started(self):
+        # Started lazily on the running loop; job worker processes get their own.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = loop.create_task(self._run())
+
+    async def flush(self):
+        """Wait until everything queued so far has been written."""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    # --- producers ---
+    @contextmanager
+    def capture(self):
+        """Collect (collection, document) copies of everything written inside the block."""
+        captured = []
+        token = _captured.set(captured)
+        try:
+            yield captured
+        finally:
+            _captured.reset(token)
+
+    async def write(self, collection, document: dict):
+        self._ensure_started()
+        captured = _captured.get()
+        if captured is not None:
+            # Copied before insert_many adds an _id to the queued document.
+            captured.append((collection, dict(document)))
+        await self._queue.put((collection, document))
+        self._stats["queued"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+
+    async def write_many(self, collection, documents: List[dict]):
+        for document in documents:
+            await self.write(collection, document)
+
+    # --- consumer ---
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_batch(self, batch: list):
+        grouped: Dict[str, tuple] = {}
+        for collection, document in batch:
+            grouped.setdefault(collection.full_name, (collection, []))[1].append(document)
+
+        started = time.perf_counter()
+        for collection, documents in grouped.values():
+            collection_started = time.perf_counter()
+            try:
+                await prepare_documents(collection, documents)
+                await collection.insert_many(documents, ordered=False)
+                self._stats["written"] += len(documents)
+            except BulkWriteError as e:
+                failed = len(e.details.get("writeErrors", []))
+                self._stats["written"] += len(documents) - failed
+                self._stats["failed"] += failed
+                print(f"⚠ Result writer: {failed} documents rejected by {collection.full_name}")
+            except Exception as e:
+                self._stats["failed"] += len(documents)
+                print(f"⚠ Result writer: dropped {len(documents)} documents for {collection.full_name}: {e}")
+            observe_stage("db_write", time.perf_counter() - collection_started, endpoint="result_writer", model=collection.name)
+        self._stats["batches"] += 1
+        self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {**self._stats, "queue_depth": self._queue.qsize() if self._queue is not None else 0}
+
+
+RESULT_WRITER = ResultWriter()
+register_queue("result_writer", lambda: RESULT_WRITER.stats()["queue_depth"])
@@ -0,0 +1,166 @@
+import os
+import json
+import zlib
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from db.mongodb import mongo
+from utils.metrics import count_event
+
+# === Large result fields ===
+# Page text, long summaries and retrieved QA context are most of the bytes in the
+# result collections but are only needed when one record is opened. Before
+# RESULT_WRITER inserts a batch, every registered field of at least
+# STORAGE_COMPRESS_MIN_BYTES is zlib-compressed into `_stored.<field>` and the
+# field itself keeps a short preview, so list views, the timeline and the
+# history indexes work unchanged on small documents. Compressed values of
+# STORAGE_GRIDFS_MIN_BYTES or more go to a GridFS bucket instead of the document.
+# Detail reads restore the full values with `load_large_fields`.
+STORAGE_COMPRESS_MIN_BYTES = int(os.getenv("STORAGE_COMPRESS_MIN_BYTES", "2048"))
+STORAGE_GRIDFS_MIN_BYTES = int(os.getenv("STORAGE_GRIDFS_MIN_BYTES", str(256 * 1024)))
+STORAGE_COMPRESSION_LEVEL = int(os.getenv("STORAGE_COMPRESSION_LEVEL", "6"))
+STORAGE_BUCKET = os.getenv("STORAGE_BUCKET", "result_blobs")
+BLOB_SWEEP_INTERVAL_S = float(os.getenv("BLOB_SWEEP_INTERVAL_S", "3600"))
+# Inline preview length; list views never show more than this.
+HISTORY_PREVIEW_CHARS = int(os.getenv("HISTORY_PREVIEW_CHARS", "400"))
+
+STORED_KEY = "_stored"
+
+# collection full name -> (collection, large fields)
+_LARGE_FIELDS: Dict[str, Tuple[object, Tuple[str, ...]]] = {}
+_stats = Counter()
+
+
+def register_large_fields(collection, *fields: str):
+    _LARGE_FIELDS[collection.full_name] = (collection, fields)
+
+
+def _bucket(collection) -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(collection.database, bucket_name=STORAGE_BUCKET)
+
+
+# --- write path ---
+def _pack(value):
+    """(meta, compressed bytes) for a value worth compressing, else None."""
+    if isinstance(value, str):
+        raw, fmt = value.encode("utf-8"), "text"
+    elif isinstance(value, (list, dict)):
+        raw, fmt = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), "json"
+    else:
+        return None
+    if len(raw) < STORAGE_COMPRESS_MIN_BYTES:
+        return None
+    data = zlib.compress(raw, STORAGE_COMPRESSION_LEVEL)
+    return {"codec": "zlib", "format": fmt, "size": len(raw), "stored_size": len(data)}, data
+
+
+def _compress(fields: Tuple[str, ...], documents: List[dict]) -> List[tuple]:
+    """Compresses large fields in place; returns the (document, field, data) too big to keep inline."""
+    offload = []
+    for document in documents:
+        stored = {}
+        for field in fields:
+            value = document.get(field)
+            packed = _pack(value)
+            if packed is None:
+                continue
+            meta, data = packed
+            _stats["raw_bytes"] += meta["size"]
+            _stats["stored_bytes"] += meta["stored_size"]
+            if len(data) >= STORAGE_GRIDFS_MIN_BYTES:
+                offload.append((document, field, data))
+            else:
+                meta["data"] = Binary(data)
+                _stats["inline"] += 1
+            stored[field] = meta
+            document[field] = value[:HISTORY_PREVIEW_CHARS] if isinstance(value, str) else None
+        if stored:
+            document[STORED_KEY] = stored
+    return offload
+
+
+async def prepare_documents(collection, documents: List[dict]):
+    """Rewrites registered large fields of documents about to be inserted."""
+    registered = _LARGE_FIELDS.get(collection.full_name)
+    if registered is None:
+        return
+    offload = await asyncio.to_thread(_compress, registered[1], documents)
+    for document, field, data in offload:
+        meta = document[STORED_KEY][field]
+        try:
+            meta["gridfs"] = await _bucket(collection).upload_from_stream(
+                f"{collection.name}.{field}", data,
+                metadata={"collection": collection.full_name, "field": field},
+            )
+            _stats["gridfs"] += 1
+            count_event("result_storage", "gridfs")
+        except Exception as e:
+            # Keep the value inline rather than lose it; only a >16 MB document would still fail.
+            print(f"⚠ Could not offload {collection.full_name}.{field} to GridFS, storing inline: {e}")
+            meta["data"] = Binary(data)
+            _stats["inline"] += 1
+    if any(STORED_KEY in d for d in documents):
+        count_event("result_storage", "compressed")
+
+
+# --- read path ---
+async def load_large_fields(collection, document: dict) -> dict:
+    """Restores the full values of a fetched record. Blobs already swept stay as previews."""
+    stored = document.pop(STORED_KEY, None)
+    for field, meta in (stored or {}).items():
+        try:
+            data = meta.get("data")
+            if data is None:
+                stream = await _bucket(collection).open_download_stream(meta["gridfs"])
+                data = await stream.read()
+            raw = zlib.decompress(data)
+            document[field] = raw.decode("utf-8") if meta["format"] == "text" else json.loads(raw)
+        except Exception as e:
+            print(f"⚠ Could not load {collection.full_name}.{field}: {e}")
+            document.setdefault("truncated_fields", []).append(field)
+    return document
+
+
+# --- retention ---
+async def sweep_expired_blobs() -> int:
+    """Deletes GridFS blobs older than their collection's retention; TTL indexes cannot reach them."""
+    removed = 0
+    for full_name, (collection, _) in _LARGE_FIELDS.items():
+        seconds = mongo.retention(collection)
+        if seconds <= 0:
+            continue
+        cutoff = datetime.utcnow() - timedelta(seconds=seconds)
+        files = collection.database[f"{STORAGE_BUCKET}.files"]
+        expired = files.find({"metadata.collection": full_name, "uploadDate": {"$lt": cutoff}}, {"_id": 1})
+        bucket = _bucket(collection)
+        async for blob in expired:
+            await bucket.delete(blob["_id"])
+            removed += 1
+    _stats["swept"] += removed
+    return removed
+
+
+async def run_blob_sweeper(interval: float = BLOB_SWEEP_INTERVAL_S):
+    while True:
+        try:
+            removed = await sweep_expired_blobs()
+            if removed:
+                print(f"🧹 Removed {removed} expired result blobs")
+        except Exception as e:
+            print(f"⚠ Blob sweep failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def storage_stats() -> dict:
+    raw, stored = _stats["raw_bytes"], _stats["stored_bytes"]
+    return {
+        **_stats,
+        "compression_ratio": round(raw / stored, 2) if stored else None,
+        "fields": {name: list(fields) for name, (_, fields) in _LARGE_FIELDS.items()},
+        "retention_days": {name: mongo.retention(c) / 86400 for name, (c, _) in _LARGE_FIELDS.items()},
+    }
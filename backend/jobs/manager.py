@@ -0,0 +1,228 @@
+import os
+import uuid
+import queue
+import asyncio
+import itertools
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from jobs.store import UNFINISHED, create_job_store
+from jobs.tasks import TASKS, JobCancelled, run_job
+from utils.metrics import register_queue
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_UPLOAD_FOLDER = os.path.join("uploads", "jobs")
+# A running job's owner refreshes its heartbeat every JOB_HEARTBEAT_S; one not
+# refreshed for JOB_LEASE_S belonged to a worker that died and is requeued.
+JOB_HEARTBEAT_S = float(os.getenv("JOB_HEARTBEAT_S", "10"))
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "60"))
+
+
+class JobManager:
+    """Priority queue in the API process feeding a pool of local worker processes.
+
+    Higher priority runs first; equal priorities run in submission order.
+    Every API worker runs one manager and all of them share the job store:
+    whichever claims a queued job first runs it, and only jobs whose owner
+    stopped heartbeating are requeued. Cancellation is recorded in the store;
+    the owning manager stops the task in its worker process. Uploaded inputs
+    are deleted once the job is done, failed or cancelled.
+    """
+
+    def __init__(self, store=None, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._seq = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._pool = None
+        self._mp_manager = None
+        self._progress = None
+        self._tasks = []
+        self._cancel_flags = None
+        self.owner = uuid.uuid4().hex
+        self._enqueued = set()
+        self._running = set()
+
+    # --- lifecycle ---
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def start(self):
+        if self.store is None:
+            self.store = create_job_store()
+        os.makedirs(JOB_UPLOAD_FOLDER, exist_ok=True)
+        self._queue = asyncio.PriorityQueue()
+        self._pool = self._new_pool()
+        self._mp_manager = multiprocessing.get_context("spawn").Manager()
+        self._progress = self._mp_manager.Queue()
+        self._cancel_flags = self._mp_manager.dict()
+
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._pump_progress()))
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._mp_manager is not None:
+            self._mp_manager.shutdown()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # --- API ---
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex
+
+    async def submit(self, kind: str, params: dict, priority: int = 0,
+                     user_id: str = None, job_id: str = None) -> dict:
+        if kind not in TASKS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.utcnow()
+        job = {
+            "id": job_id or self.new_job_id(),
+            "kind": kind,
+            "status": "queued",
+            "priority": priority,
+            "params": {**params, "user_id": user_id},
+            "progress": 0.0,
+            "stage": "queued",
+            "result": None,
+            "error": None,
+            "user_id": user_id,
+            "created_at": now,
+            "updated_at": now,
+            "owner": None,
+            "heartbeat_at": None,
+        }
+        await self.store.create(job)
+        self._enqueue(job["id"], priority)
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        job = await self.store.get(job_id)
+        if job is None or job["status"] not in UNFINISHED:
+            return job
+        if not await self.store.update_if(job_id, {"status": job["status"]}, status="cancelled", stage="cancelled"):
+            return await self.cancel(job_id)  # claimed or finished meanwhile; act on the new state
+        if job["status"] == "queued":
+            _remove_upload(job)  # nobody can claim it any more
+        elif job.get("owner") == self.owner:
+            self._cancel_flags[job_id] = True
+        # A job running under another API worker stops at that worker's next heartbeat.
+        return await self.store.get(job_id)
+
+    # --- internals ---
+    def _enqueue(self, job_id: str, priority: int):
+        self._enqueued.add(job_id)
+        self._queue.put_nowait((-priority, next(self._seq), job_id))
+
+    async def _update_owned(self, job_id: str, **fields) -> bool:
+        # No-op when the job was cancelled (or requeued by another worker) meanwhile.
+        return await self.store.update_if(job_id, {"status": "running", "owner": self.owner}, **fields)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job_id = await self._queue.get()
+            self._enqueued.discard(job_id)
+            job = await self.store.get(job_id)
+            if job is None or job["status"] != "queued":
+                continue
+            claimed = await self.store.update_if(job_id, {"status": "queued"}, status="running", stage="dispatched",
+                                                 owner=self.owner, heartbeat_at=datetime.utcnow())
+            if not claimed:
+                continue
+
+            self._running.add(job_id)
+            try:
+                pool = self._pool
+                result = await loop.run_in_executor(
+                    pool, run_job, job_id, job["kind"], job["params"], self._progress, self._cancel_flags
+                )
+            except JobCancelled:
+                pass
+            except BrokenProcessPool as e:
+                # A worker died (OOM, segfault): replace the pool and fail this job. Every job
+                # still on the broken pool lands here, but only the first one replaces it.
+                if self._pool is pool:
+                    self._pool = self._new_pool()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                await self._update_owned(job_id, status="failed", error=f"Worker crashed: {e}", stage="failed")
+            except Exception as e:
+                await self._update_owned(job_id, status="failed", error=str(e), stage="failed")
+            else:
+                await self._update_owned(job_id, status="done", progress=1.0, stage="done", result=result)
+            finally:
+                self._running.discard(job_id)
+                self._cancel_flags.pop(job_id, None)
+
+            current = await self.store.get(job_id)
+            if current is not None and current["status"] not in UNFINISHED:
+                _remove_upload(current)
+
+    async def _recover(self):
+        """Enqueues queued jobs not yet in our queue and requeues running jobs whose lease expired."""
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_LEASE_S)
+        for job in await self.store.list_unfinished():
+            if job["status"] == "running":
+                beat = job.get("heartbeat_at")
+                if beat is not None and beat >= cutoff:
+                    continue
+                requeued = await self.store.update_if(job["id"], {"status": "running", "heartbeat_at": beat},
+                                                      status="queued", progress=0.0, stage="requeued", owner=None)
+                if not requeued:
+                    continue
+            elif job["id"] in self._enqueued:
+                continue
+            self._enqueue(job["id"], job.get("priority") or 0)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_S)
+            try:
+                now = datetime.utcnow()
+                for job_id in list(self._running):
+                    if not await self._update_owned(job_id, heartbeat_at=now) and job_id in self._running:
+                        # Cancelled, possibly through another API worker: stop the task.
+                        self._cancel_flags[job_id] = True
+                await self._recover()
+            except Exception as e:
+                print(f"⚠ Job heartbeat failed: {e}")
+
+    async def _pump_progress(self):
+        while True:
+            try:
+                job_id, progress, stage = await asyncio.to_thread(self._progress.get, True, 1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, BrokenPipeError):
+                return
+            if progress < 1.0:
+                await self._update_owned(job_id, progress=progress, stage=stage)
+
+
+def _remove_upload(job: dict):
+    path = (job.get("params") or {}).get("file_path")
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠ Could not remove job input {path}: {e}")
+
+
+job_manager = JobManager()
+register_queue("jobs", lambda: job_manager.queue_depth)
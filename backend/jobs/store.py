@@ -0,0 +1,128 @@
+import os
+import json
+import sqlite3
+import asyncio
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+# === Job persistence ===
+# Jobs survive API/worker restarts. MongoDB is the default; JOB_STORE=sqlite
+# keeps them in a local file for single-node setups without a database.
+# update_if is the only way state changes hands between API workers: a job is
+# claimed, finished, cancelled or requeued only if it is still in the state the
+# caller last saw.
+UNFINISHED = ("queued", "running")
+
+
+class MongoJobStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def create(self, job: dict):
+        await self.collection.insert_one({"_id": job["id"], **job})
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": job_id}, {"_id": 0})
+
+    async def update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        await self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    async def update_if(self, job_id: str, expected: dict, **fields) -> bool:
+        fields["updated_at"] = datetime.utcnow()
+        result = await self.collection.update_one({"_id": job_id, **expected}, {"$set": fields})
+        return result.matched_count == 1
+
+    async def list_unfinished(self) -> List[dict]:
+        cursor = self.collection.find({"status": {"$in": list(UNFINISHED)}}, {"_id": 0})
+        return await cursor.to_list(None)
+
+
+class SQLiteJobStore:
+    COLUMNS = ("id", "kind", "status", "priority", "params", "progress", "stage",
+               "result", "error", "user_id", "created_at", "updated_at", "owner", "heartbeat_at")
+    JSON_COLUMNS = ("params", "result")
+    DATETIME_COLUMNS = ("created_at", "updated_at", "heartbeat_at")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT, status TEXT, priority INTEGER, params TEXT, "
+            "progress REAL, stage TEXT, result TEXT, error TEXT, user_id TEXT, "
+            "created_at TEXT, updated_at TEXT, owner TEXT, heartbeat_at TEXT)"
+        )
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column in ("owner", "heartbeat_at"):
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        self._conn.commit()
+
+    def _encode(self, key, value):
+        if key in self.JSON_COLUMNS:
+            return json.dumps(value, default=str)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def _decode(self, row) -> dict:
+        job = dict(zip(self.COLUMNS, row))
+        for key in self.JSON_COLUMNS:
+            job[key] = json.loads(job[key]) if job[key] else None
+        for key in self.DATETIME_COLUMNS:
+            job[key] = datetime.fromisoformat(job[key]) if job[key] else None
+        return job
+
+    def _execute(self, sql: str, args=()):
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+            self._conn.commit()
+            return rows
+
+    def _execute_count(self, sql: str, args=()) -> int:
+        with self._lock:
+            count = self._conn.execute(sql, args).rowcount
+            self._conn.commit()
+            return count
+
+    async def create(self, job: dict):
+        values = [self._encode(c, job.get(c)) for c in self.COLUMNS]
+        sql = f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})"
+        await asyncio.to_thread(self._execute, sql, values)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        rows = await asyncio.to_thread(self._execute, f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,))
+        return self._decode(rows[0]) if rows else None
+
+    async def update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        values = [self._encode(k, v) for k, v in fields.items()] + [job_id]
+        await asyncio.to_thread(self._execute, f"UPDATE jobs SET {assignments} WHERE id = ?", values)
+
+    async def update_if(self, job_id: str, expected: dict, **fields) -> bool:
+        fields["updated_at"] = datetime.utcnow()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        conditions = "".join(f" AND {k} IS ?" for k in expected)
+        values = [self._encode(k, v) for k, v in fields.items()] + [job_id]
+        values += [self._encode(k, v) for k, v in expected.items()]
+        sql = f"UPDATE jobs SET {assignments} WHERE id = ?{conditions}"
+        return await asyncio.to_thread(self._execute_count, sql, values) == 1
+
+    async def list_unfinished(self) -> List[dict]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN (?, ?)",
+            UNFINISHED,
+        )
+        return [self._decode(r) for r in rows]
+
+
+def create_job_store():
+    if os.getenv("JOB_STORE", "mongo").lower() == "sqlite":
+        return SQLiteJobStore(os.getenv("JOB_SQLITE_PATH", "jobs.sqlite3"))
+    from models.db import jobs_collection
+    return MongoJobStore(jobs_collection)
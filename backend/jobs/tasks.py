@@ -0,0 +1,121 @@
+import os
+import sys
+import asyncio
+import threading
+from pathlib import Path
+
+# Runs inside the worker processes: make backend/ importable and keep one event
+# loop per process so Motor clients and micro-batchers stay bound to it.
+backend_root = Path(__file__).resolve().parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.append(str(backend_root))
+
+_LOOP = None
+# How often a running job checks whether it was cancelled.
+JOB_CANCEL_POLL_S = float(os.getenv("JOB_CANCEL_POLL_S", "0.5"))
+
+
+class JobCancelled(Exception):
+    """Raised out of run_job when the job was cancelled while running."""
+
+
+def _event_loop():
+    global _LOOP
+    if _LOOP is None:
+        _LOOP = asyncio.new_event_loop()
+        asyncio.set_event_loop(_LOOP)
+    return _LOOP
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# === Task implementations ===
+async def _summarize(params: dict, report) -> dict:
+    model = params.get("model", "gemini")
+    user_id = params.get("user_id")
+    source = params.get("file_path") or params["text"]
+    is_text = not params.get("file_path")
+    report(0.2, "summarizing")
+
+    if model == "gemini":
+        from pipeline.summarize import generate_summary
+        summary = await generate_summary(source, params.get("summary_type", "detailed"),
+                                         model=model, is_text=is_text, user_id=user_id)
+    elif model == "t5":
+        from pipeline.summarize_t5 import summarize_pdf_sectionwise, summarize_text_sectionwise
+        if is_text:
+            summary = await summarize_text_sectionwise(source, user_id=user_id, model=model)
+        else:
+            summary = await summarize_pdf_sectionwise(source, user_id=user_id, model=model)
+    else:
+        raise ValueError(f"Unsupported model: {model}")
+    return {"summary": summary}
+
+
+async def _classify(params: dict, report) -> dict:
+    model = params.get("model", "bert")
+    user_id = params.get("user_id")
+    contents = _read_bytes(params["file_path"]) if params.get("file_path") else None
+    report(0.2, "classifying")
+
+    if model in ["bert", "distilbert"]:
+        from pipeline.classifytrain import classify_pdf_bytes_with_model, classify_file_from_train_model
+        if contents is not None:
+            return await classify_pdf_bytes_with_model(contents, user_id=user_id)
+        return await classify_file_from_train_model(text=params["text"], file=None, user_id=user_id)
+    if model == "gemini":
+        from pipeline.classify import classify_pdf_bytes, classify_text_content
+        if contents is not None:
+            return await classify_pdf_bytes(contents, user_id=user_id)
+        return {"results": [{"page": 1, "label": classify_text_content(params["text"]), "text_preview": params["text"][:300]}]}
+    if model == "cascade":
+        from pipeline.cascade import classify_pdf_cascade, classify_text_cascade
+        if contents is not None:
+            return await classify_pdf_cascade(contents, user_id=user_id)
+        return await classify_text_cascade(params["text"], user_id=user_id)
+    raise ValueError(f"Unsupported model: {model}")
+
+
+TASKS = {
+    "summarize": _summarize,
+    "classify": _classify,
+}
+
+
+def run_job(job_id: str, kind: str, params: dict, progress_queue=None, cancel_flags=None):
+    """Process-pool entry point; returns a JSON-serialisable result.
+
+    cancel_flags is a shared dict the manager sets job_id in to cancel the job;
+    the task is cancelled at its next await and JobCancelled is raised.
+    """
+    def report(progress: float, stage: str):
+        if progress_queue is not None:
+            progress_queue.put((job_id, progress, stage))
+
+    report(0.05, "starting")
+    from db.result_writer import RESULT_WRITER
+    loop = _event_loop()
+    task = loop.create_task(TASKS[kind](params, report))
+    finished = threading.Event()
+
+    def watch_cancel():
+        while not finished.wait(JOB_CANCEL_POLL_S):
+            if cancel_flags.get(job_id):
+                loop.call_soon_threadsafe(task.cancel)
+                return
+
+    if cancel_flags is not None:
+        threading.Thread(target=watch_cancel, name=f"job_{job_id}_cancel", daemon=True).start()
+    try:
+        result = loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        raise JobCancelled(job_id) from None
+    finally:
+        finished.set()
+        # History documents must be written before the job counts as done.
+        loop.run_until_complete(RESULT_WRITER.flush())
+    report(1.0, "done")
+    return result
@@ -1,32 +1,62 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Response
+from starlette.routing import Match
+import time
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
-from typing import Optional
+from typing import List, Optional
 import fitz
 import io
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Summarization and QA
-from pipeline.qa import run_qa_gemini, run_qa_from_text_gemini
+from pipeline.qa import run_qa_gemini, run_qa_from_text_gemini, run_qa_routed
 from pipeline.t5small import run_qa_pdf_t5, run_qa_text_t5
 from pipeline.summarize import generate_summary
 from pipeline.summarize_t5 import summarize_pdf_sectionwise,summarize_text_sectionwise
+from pipeline.compare import stream_comparison
 
 
 # Compliance
 from pipeline.comcheck import run_compliance_check_gemini 
-from pipeline.comcheck_llama import run_compliance_check_llama 
+from pipeline.comcheck_llama import run_compliance_check_llama, stream_compliance_check_llama
+from pipeline.bulk_compliance import run_bulk_compliance
 
 # Classification
-from pipeline.classify import classify_pdf_bytes, classify_text_content
-from pipeline.classifytrain import classify_file_from_train_model
+from pipeline.classify import classify_pdf_bytes, classify_pdf_bytes_routed, classify_text_routed, classify_text_content
+from pipeline.classifytrain import classify_file_from_train_model, classify_pdf_bytes_with_model
+from pipeline.cascade import classify_pdf_cascade, classify_text_cascade
 
 from pathlib import Path
 from routes import user
-from fastapi.responses import JSONResponse
-
-app = FastAPI()
+from routes import jobs as job_routes
+from jobs.manager import job_manager
+from db.result_writer import RESULT_WRITER
+from db.mongodb import mongo
+from db.storage import run_blob_sweeper, storage_stats
+from utils.router import router_stats
+from utils.singleflight import SINGLE_FLIGHT
+from utils.answer_cache import QA_ANSWER_CACHE
+from serving import registry as model_registry
+from utils.metrics import stage, set_endpoint, set_model, observe_request, render_metrics
+from fastapi.responses import JSONResponse, StreamingResponse
+import json
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mongo.connect()
+    await mongo.ensure_indexes()
+    await job_manager.start()
+    blob_sweeper = asyncio.create_task(run_blob_sweeper())
+    yield
+    blob_sweeper.cancel()
+    await job_manager.stop()
+    await RESULT_WRITER.close()
+    mongo.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -35,9 +65,68 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(user.router, prefix="/api/user")
+app.include_router(job_routes.router, prefix="/jobs")
+
+# === Metrics ===
+def _route_template(request: Request) -> str:
+    # Label by route template, not raw path, so user ids don't explode cardinality.
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def track_latency(request: Request, call_next):
+    endpoint = _route_template(request)
+    set_endpoint(endpoint)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        observe_request(endpoint, request.method, status, time.perf_counter() - started)
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/health/db")
+async def db_health():
+    health = await mongo.health()
+    if health["status"] != "ok":
+        return JSONResponse(status_code=503, content=health)
+    return health
+
+@app.get("/health/models")
+async def models_health():
+    try:
+        return await asyncio.to_thread(model_registry.status)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "error": str(e)})
+
+@app.get("/stats/router")
+async def routing_stats():
+    return router_stats()
+
+@app.get("/stats/qa-cache")
+async def qa_cache_stats():
+    return QA_ANSWER_CACHE.stats()
+
+@app.get("/stats/result-writer")
+async def result_writer_stats():
+    return RESULT_WRITER.stats()
+
+@app.get("/stats/storage")
+async def result_storage_stats():
+    return storage_stats()
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -51,37 +140,56 @@ async def summarize(
     text: str = Form(None),
     user_id: str = Form(None)
 ):
-    print(f"📌 Summarize Request | Type: {summary_type} | Model: {model}")
+    set_model(model)
+
+    if file is None and not text:
+        return {"error": "❌ Please provide either a PDF file or text input."}
+    if model not in ("gemini", "t5"):
+        return {"error": "❌ Unsupported summarization model."}
 
     if file is not None:
-        file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        with open(file_path, "wb") as f:
+        with stage("upload"):
             content = await file.read()
-            f.write(content)
-
-        if model == "gemini":
-            summary = await generate_summary(file_path, summary_type, model=model, is_text=False,user_id=user_id)
-        elif model == "t5":
-            summary = await summarize_pdf_sectionwise(file_path, user_id=user_id, model=model)
-
-        else:
-            return {"error": "❌ Unsupported summarization model."}
-
-        return {"summary": summary}
 
-    elif text:
-        if model == "gemini":
-            summary = await generate_summary(text, summary_type, model=model, is_text=True,user_id=user_id)
-        elif model == "t5":
-            summary = await summarize_text_sectionwise(text, user_id=user_id, model=model)
-
-        else:
-            return {"error": "❌ Unsupported summarization model."}
+        async def compute():
+            file_path = os.path.join(UPLOAD_FOLDER, file.filename)
+            with open(file_path, "wb") as f:
+                f.write(content)
+            if model == "gemini":
+                return await generate_summary(file_path, summary_type, model=model, is_text=False, user_id=user_id)
+            return await summarize_pdf_sectionwise(file_path, user_id=user_id, model=model)
+    else:
+        content = text
+
+        async def compute():
+            if model == "gemini":
+                return await generate_summary(text, summary_type, model=model, is_text=True, user_id=user_id)
+            return await summarize_text_sectionwise(text, user_id=user_id, model=model)
+
+    # Identical uploads in flight share one summary.
+    key = SINGLE_FLIGHT.key("/summarize", content, model=model, summary_type=summary_type,
+                            is_file=file is not None, has_user=bool(user_id))
+    summary = await SINGLE_FLIGHT.do(key, compute, user_id=user_id)
+    return {"summary": summary}
+
+@app.post("/summarize/compare")
+async def summarize_compare(
+    files: List[UploadFile] = File(...),
+    summary_type: str = Form("short"),
+    model: str = Form("gemini"),
+    user_id: str = Form(None)
+):
+    set_model(model)
+    if model != "gemini":
+        return {"error": "❌ Report comparison is only available with gemini."}
+    with stage("upload"):
+        documents = [(f.filename, await f.read()) for f in files]
 
-        return {"summary": summary}
+    async def ndjson_results():
+        async for record in stream_comparison(documents, summary_type=summary_type, user_id=user_id):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
 
-    else:
-        return {"error": "❌ Please provide either a PDF file or text input."}
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
 
 # ✅ === Updated QA API: /qa ===
 @app.post("/qa_api")
@@ -90,10 +198,11 @@ async def qa_api(
     model: str = Form("gemini"),
     text: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
-    user_id: Optional[str] = Form(None) 
+    user_id: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None)
 ):
     try:
-        print(f"🤖 Q&A Request | Model: {model} | Question: {question}")
+        set_model(model.lower())
         is_text_input = text is not None and text.strip() != ""
         is_file_input = file is not None
 
@@ -105,17 +214,27 @@ async def qa_api(
 
         if model.lower() == "t5_small":
             if is_file_input:
-                pdf_bytes = await file.read()
+                with stage("upload"):
+                    pdf_bytes = await file.read()
                 response = await run_qa_pdf_t5(pdf_bytes, question,user_id=user_id)
             else:
                 response = await run_qa_text_t5(text, question,user_id=user_id)
 
         elif model.lower() == "gemini":
             if is_file_input:
-                pdf_bytes = await file.read()
-                response = await run_qa_gemini(pdf_bytes, question,user_id=user_id)
+                with stage("upload"):
+                    pdf_bytes = await file.read()
+                response = await run_qa_gemini(pdf_bytes, question,user_id=user_id, session_id=session_id)
             else:
-                response = await run_qa_from_text_gemini(text, question,user_id=user_id)
+                response = await run_qa_from_text_gemini(text, question,user_id=user_id, session_id=session_id)
+
+        elif model.lower() == "auto":
+            pdf_bytes = None
+            if is_file_input:
+                with stage("upload"):
+                    pdf_bytes = await file.read()
+            return await run_qa_routed(question, pdf_bytes=pdf_bytes, context=None if is_file_input else text,
+                                       user_id=user_id, session_id=session_id)
 
         else:
             return JSONResponse(
@@ -123,7 +242,7 @@ async def qa_api(
                 content={"answer": "❌ Unsupported model name"}
             )
 
-        return {"answer": response, "model_used": model}
+        return {**response, "model_used": model}
 
     except Exception as e:
         return JSONResponse(
@@ -132,6 +251,50 @@ async def qa_api(
         )
 
 # ✅ === Unified Classification ===
+CLASSIFY_MODELS = ("bert", "distilbert", "gemini", "auto", "cascade")
+
+async def run_classification(model: str, contents: Optional[bytes], text: Optional[str], user_id: Optional[str]):
+    if model in ["bert", "distilbert"]:
+        if contents is not None:
+            result = await classify_pdf_bytes_with_model(contents, user_id=user_id)
+            return {"results": [{
+                "page": page["page"],
+                "label": page["label"],
+                "confidence": page.get("confidence"),
+                "text_preview": page["masked_text"][:300]
+            } for page in result["results"]]}
+        result = await classify_file_from_train_model(text=text, file=None, user_id=user_id)
+        return {
+            "results": [{
+                "page": 1,
+                "label": result["label"],
+                "confidence": result.get("confidence"),
+                "text_preview": result["masked"][:300]
+            }]
+        }
+
+    elif model == "gemini":
+        if contents is not None:
+            return await classify_pdf_bytes(contents)
+        label = classify_text_content(text)
+        return {
+            "results": [{
+                "page": 1,
+                "label": label,
+                "text_preview": text[:300]
+            }]
+        }
+
+    elif model == "auto":
+        if contents is not None:
+            return await classify_pdf_bytes_routed(contents, user_id=user_id)
+        return await classify_text_routed(text, user_id=user_id)
+
+    else:
+        if contents is not None:
+            return await classify_pdf_cascade(contents, user_id=user_id)
+        return await classify_text_cascade(text, user_id=user_id)
+
 @app.post("/classify")
 async def classify(
     file: Optional[UploadFile] = File(None),
@@ -139,45 +302,23 @@ async def classify(
     model: str = Form("bert"),
     user_id: str = Form(None)
 ):
-    print(f"📄 Classify | Model: {model}")
+    set_model(model)
+
+    if model not in CLASSIFY_MODELS:
+        return {"error": f"❌ Unsupported model: {model}"}
+    if not file and not text:
+        return {"error": "❌ No input provided."}
 
     try:
-        if model in ["bert", "distilbert"]:
-            result = await classify_file_from_train_model(text=text, file=file,user_id=user_id)
-            if result.get("type") == "pdf":
-                results = [{
-                    "page": page["page"],
-                    "label": page["label"],
-                    "text_preview": page["masked_text"][:300]
-                } for page in result["results"]]
-                return {"results": results}
-            else:
-                return {
-                    "results": [{
-                        "page": 1,
-                        "label": result["label"],
-                        "text_preview": result["masked"][:300]
-                    }]
-                }
-
-        elif model == "gemini":
-            if file:
+        contents = None
+        if file:
+            with stage("upload"):
                 contents = await file.read()
-                return await classify_pdf_bytes(contents)
-            elif text:
-                label = classify_text_content(text)
-                return {
-                    "results": [{
-                        "page": 1,
-                        "label": label,
-                        "text_preview": text[:300]
-                    }]
-                }
-            else:
-                return {"error": "❌ No input provided."}
 
-        else:
-            return {"error": f"❌ Unsupported model: {model}"}
+        # Identical uploads in flight share one classification run.
+        key = SINGLE_FLIGHT.key("/classify", contents if contents is not None else text,
+                                model=model, is_file=contents is not None, has_user=bool(user_id))
+        return await SINGLE_FLIGHT.do(key, lambda: run_classification(model, contents, text, user_id), user_id=user_id)
 
     except Exception as e:
         return {"error": f"❌ Classification failed: {str(e)}"}
@@ -188,11 +329,10 @@ async def compliance_api(
     model: str = Form("gemini"),
     file: UploadFile = File(None),
     text: str = Form(None),
-    user_id: str = Form(None)
+    user_id: str = Form(None),
+    stream: bool = Form(False)
 ):
-    print("📥 Incoming Compliance Request")
-    print("📌 Model:", model)
-    print("📌 User ID:", user_id)
+    set_model(model)
 
     if file is None and not text:
         return {"results": [dict(
@@ -202,13 +342,20 @@ async def compliance_api(
             matched_policies=[]
         )]}
 
-    content = text if text else await file.read()
+    with stage("upload"):
+        content = text if text else await file.read()
     is_raw_text = bool(text)
-    print("📌 Raw Text?", is_raw_text)
-    print("📄 Content:\n", content[:500])
+
+    if stream and model in ["tinyllama", "tiny_lama"]:
+        async def ndjson_events():
+            async for event in stream_compliance_check_llama(content, is_raw_text=is_raw_text, user_id=user_id):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        return StreamingResponse(ndjson_events(), media_type="application/x-ndjson")
 
     if model == "gemini":
         result = await run_compliance_check_gemini(content, is_raw_text=is_raw_text, user_id=user_id)
+    elif model == "auto":
+        result = await run_compliance_check_gemini(content, is_raw_text=is_raw_text, user_id=user_id, hedge=True)
     elif model in ["tinyllama", "tiny_lama"]:
         result = await run_compliance_check_llama(content, is_raw_text=is_raw_text, user_id=user_id)
     else:
@@ -219,5 +366,21 @@ async def compliance_api(
             matched_policies=[]
         )]}
 
-    print("📤 Result:", result)
     return result
+
+# === Bulk Compliance (CSV / JSONL / zip of PDFs) ===
+@app.post("/compliance/bulk")
+async def bulk_compliance_api(
+    file: UploadFile = File(...),
+    model: str = Form("gemini"),
+    user_id: str = Form(None)
+):
+    set_model(model)
+    with stage("upload"):
+        data = await file.read()
+
+    async def ndjson_results():
+        async for record in run_bulk_compliance(file.filename, data, model=model, user_id=user_id):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
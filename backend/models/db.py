@@ -1,10 +1,40 @@
 # models/db.py
-from motor.motor_asyncio import AsyncIOMotorClient
+import os
 
-client = AsyncIOMotorClient("mongodb://localhost:27017")
-db = client["finance_gpt"]
+from pymongo import ASCENDING, DESCENDING
 
-compliance_collection = db.compliance_results
-summarization_collection = db.summarization_results
-qa_collection = db.qa_results
-classification_collection = db.classification_results
+from db.mongodb import CollectionProxy, mongo, MONGO_APP_DB, MONGO_USER_DB
+from db.storage import register_large_fields
+
+compliance_collection: CollectionProxy = mongo.collection(MONGO_APP_DB, "compliance_results")
+summarization_collection: CollectionProxy = mongo.collection(MONGO_APP_DB, "summarization_results")
+qa_collection: CollectionProxy = mongo.collection(MONGO_APP_DB, "qa_results")
+classification_collection: CollectionProxy = mongo.collection(MONGO_APP_DB, "classification_results")
+jobs_collection: CollectionProxy = mongo.collection(MONGO_APP_DB, "jobs")
+users_collection: CollectionProxy = mongo.collection(MONGO_USER_DB, "users")
+
+mongo.register_index(jobs_collection, [("status", ASCENDING), ("priority", DESCENDING)], name="status_priority")
+# Unique, so two concurrent registrations of one address cannot both succeed.
+mongo.register_index(users_collection, [("email", ASCENDING)], name="email", unique=True)
+
+# Large text fields are stored compressed (or in GridFS) and loaded on detail reads only.
+register_large_fields(classification_collection, "ocr_text", "masked_text")
+register_large_fields(summarization_collection, "summary")
+register_large_fields(qa_collection, "answer", "context_used")
+
+# Retention is opt-in: every result collection is kept forever unless its variable
+# sets a number of days, after which documents expire (TTL index on `timestamp`)
+# together with their GridFS blobs (db.storage sweeper):
+#     RETENTION_DAYS_COMPLIANCE_RESULTS       compliance_results
+#     RETENTION_DAYS_SUMMARIZATION_RESULTS    summarization_results
+#     RETENTION_DAYS_QA_RESULTS               qa_results
+#     RETENTION_DAYS_CLASSIFICATION_RESULTS   classification_results
+# Setting one back to 0 drops the TTL index again.
+RETENTION_DAYS = {
+    compliance_collection: os.getenv("RETENTION_DAYS_COMPLIANCE_RESULTS", "0"),
+    summarization_collection: os.getenv("RETENTION_DAYS_SUMMARIZATION_RESULTS", "0"),
+    qa_collection: os.getenv("RETENTION_DAYS_QA_RESULTS", "0"),
+    classification_collection: os.getenv("RETENTION_DAYS_CLASSIFICATION_RESULTS", "0"),
+}
+for _collection, _days in RETENTION_DAYS.items():
+    mongo.register_ttl(_collection, "timestamp", float(_days) * 86400)
@@ -0,0 +1,267 @@
+import io
+import os
+import csv
+import json
+import time
+import asyncio
+import zipfile
+from collections import Counter, deque
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List
+
+from models.db import compliance_collection
+from db.result_writer import RESULT_WRITER
+from pipeline.comcheck import extract_text_from_bytes, gemini_classify, parse_gemini_result, split_claims
+from pipeline.comcheck_llama import (
+    LLAMA_BATCHER,
+    add_city_tier,
+    correct_conflicting_label,
+    extract_reasoning,
+    parse_classification,
+)
+from pipeline.policy_index import POLICY_INDEX
+from pipeline.travel_rules import evaluate_claims
+
+# === Configuration ===
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "64"))
+BULK_LLM_CONCURRENCY = int(os.getenv("BULK_LLM_CONCURRENCY", "8"))
+BULK_INFLIGHT_BATCHES = int(os.getenv("BULK_INFLIGHT_BATCHES", "2"))
+
+TEXT_COLUMNS = ("claim", "claim_text", "text", "description")
+
+# === Input parsing ===
+# A line, file or archive member that cannot be read becomes one error record in
+# the output stream; the rest of the upload is still processed.
+def _error_item(claim_id: str, error: Exception) -> Dict:
+    return {"claim_id": claim_id, "text": "", "error": f"❌ Could not read input: {type(error).__name__}: {error}"}
+
+def _guarded(items: Iterator[Dict], source: str) -> Iterator[Dict]:
+    try:
+        yield from items
+    except Exception as e:
+        yield _error_item(source, e)
+
+def _record_to_claim(record: Dict) -> str:
+    # Prefer an explicit free-text column; otherwise "key: value" pairs, which the
+    # rule parser understands directly.
+    for column in TEXT_COLUMNS:
+        value = record.get(column)
+        if value and str(value).strip():
+            return str(value).strip()
+    return ", ".join(f"{k}: {v}" for k, v in record.items() if k and v not in (None, ""))
+
+def _iter_csv(data: bytes, source: str) -> Iterator[Dict]:
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    for n, row in enumerate(reader, start=1):
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        text = _record_to_claim(row)
+        if text:
+            yield {"claim_id": row.get("claim_id") or f"{source}:{n}", "text": text}
+
+def _iter_jsonl(data: bytes, source: str) -> Iterator[Dict]:
+    for n, line in enumerate(data.decode("utf-8-sig").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield _error_item(f"{source}:{n}", e)
+            continue
+        if isinstance(record, str):
+            yield {"claim_id": f"{source}:{n}", "text": record}
+            continue
+        if not isinstance(record, dict):
+            yield _error_item(f"{source}:{n}", TypeError(f"expected an object or a string, got {type(record).__name__}"))
+            continue
+        record = {str(k).lower(): v for k, v in record.items()}
+        text = _record_to_claim(record)
+        if text:
+            yield {"claim_id": str(record.get("claim_id") or f"{source}:{n}"), "text": text}
+
+def _iter_pdf(data: bytes, source: str) -> Iterator[Dict]:
+    for n, claim in enumerate(split_claims(extract_text_from_bytes(data)), start=1):
+        yield {"claim_id": f"{source}#{n}", "text": claim}
+
+def iter_claims(filename: str, data: bytes) -> Iterator[Dict]:
+    name = (filename or "").lower()
+    if name.endswith(".zip"):
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+        except zipfile.BadZipFile as e:
+            yield _error_item(filename, e)
+            return
+        with archive:
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                try:
+                    content = archive.read(member)
+                except Exception as e:
+                    yield _error_item(member.filename, e)
+                    continue
+                yield from iter_claims(member.filename, content)
+    elif name.endswith(".csv"):
+        yield from _guarded(_iter_csv(data, filename), filename)
+    elif name.endswith(".jsonl") or name.endswith(".ndjson"):
+        yield from _guarded(_iter_jsonl(data, filename), filename)
+    elif name.endswith(".pdf"):
+        yield from _guarded(_iter_pdf(data, filename), filename)
+    else:
+        # Also reached by archive members such as __MACOSX/ metadata or stray notes.
+        yield _error_item(filename, ValueError("unsupported file type; expected .csv, .jsonl, .ndjson, .pdf or .zip"))
+
+def _batches(items: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# === LLM fallbacks for claims the rules leave open ===
+async def _classify_gemini(claims: List[str], policies: List[List[dict]], semaphore) -> List[tuple]:
+    async def one(claim, pols):
+        # One failed call only marks its own claim.
+        try:
+            async with semaphore:
+                text = await asyncio.to_thread(gemini_classify, claim, pols)
+            return parse_gemini_result(text)
+        except Exception as e:
+            return "Error", f"❌ Exception: {str(e)}"
+    return await asyncio.gather(*(one(c, p) for c, p in zip(claims, policies)))
+
+async def _classify_llama(claims: List[str], policies: List[List[dict]], semaphore) -> List[tuple]:
+    parsed = []
+    for text in await LLAMA_BATCHER.submit_many(claims):
+        classification, reasoning_text = parse_classification(text)
+        reasoning = extract_reasoning(reasoning_text)
+        parsed.append((correct_conflicting_label(classification, reasoning), reasoning))
+    return parsed
+
+LLM_BACKENDS = {"gemini": _classify_gemini, "tinyllama": _classify_llama, "tiny_lama": _classify_llama}
+
+# === Bulk pipeline ===
+def _input_error_result(item: Dict) -> Dict:
+    return {
+        "claim_id": item["claim_id"],
+        "claim": "",
+        "classification": "Error",
+        "reasoning": item["error"],
+        "matched_policies": [],
+        "rule_ids": [],
+        "decided_by": "input"
+    }
+
+async def _process_batch(batch: List[Dict], classify, semaphore, filename: str, user_id: str) -> Dict:
+    """Results in input order; unreadable inputs are reported but not classified or stored."""
+    readable = [item for item in batch if "error" not in item]
+    processed = await _process_claims(readable, classify, semaphore, filename, user_id) if readable else \
+        {"results": [], "policy_version": None}
+    results = iter(processed["results"])
+    return {
+        "results": [_input_error_result(item) if "error" in item else next(results) for item in batch],
+        "policy_version": processed["policy_version"],
+    }
+
+async def _process_claims(batch: List[Dict], classify, semaphore, filename: str, user_id: str) -> Dict:
+    raw_claims = [item["text"] for item in batch]
+    verdicts = evaluate_claims(raw_claims, POLICY_INDEX.snapshot.limits)
+    claims = [add_city_tier(raw) for raw in raw_claims]
+
+    # One batched policy lookup for everything the rules left open
+    escalated = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    matches, policy_version = POLICY_INDEX.search_many([claims[i] for i in escalated])
+    try:
+        llm_outputs = await classify([claims[i] for i in escalated], matches, semaphore)
+    except Exception as e:
+        llm_outputs = [("Error", f"❌ Exception: {str(e)}")] * len(escalated)
+    llm_by_index = dict(zip(escalated, zip(llm_outputs, matches)))
+
+    results, documents = [], []
+    for i, (item, claim, verdict) in enumerate(zip(batch, claims, verdicts)):
+        if verdict:
+            result = {"claim_id": item["claim_id"], "claim": claim, **verdict}
+        else:
+            (classification, reasoning), pols = llm_by_index[i]
+            result = {
+                "claim_id": item["claim_id"],
+                "claim": claim,
+                "classification": classification,
+                "reasoning": reasoning,
+                "matched_policies": [p["category"] for p in pols],
+                "rule_ids": [],
+                "decided_by": "llm"
+            }
+        results.append(result)
+        documents.append({
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+            "input_type": "bulk",
+            "source": filename,
+            "claim_id": result["claim_id"],
+            "claim_text": result["claim"],
+            "compliant": result["classification"].lower() == "compliant",
+            "reasoning": result["reasoning"],
+            "matched_policies": result["matched_policies"],
+            "rule_ids": result["rule_ids"],
+            "decided_by": result["decided_by"],
+            "policy_version": policy_version
+        })
+
+    await RESULT_WRITER.write_many(compliance_collection, documents)
+    return {"results": results, "policy_version": policy_version}
+
+async def run_bulk_compliance(filename: str, data: bytes, model: str = "gemini", user_id: str = None) -> AsyncIterator[Dict]:
+    """Yields one result per claim, batch by batch in input order, then a summary record.
+
+    Up to BULK_INFLIGHT_BATCHES batches are processed concurrently so parsing,
+    retrieval and DB writes of one batch overlap with LLM calls of another.
+    """
+    classify = LLM_BACKENDS.get(model)
+    if classify is None:
+        yield {"event": "error", "reasoning": f"Unsupported model: {model}"}
+        return
+
+    semaphore = asyncio.Semaphore(BULK_LLM_CONCURRENCY)
+    started = time.perf_counter()
+    stats = Counter()
+    policy_version = None
+    in_flight = deque()
+
+    async def drain_oldest():
+        nonlocal policy_version
+        done = await in_flight.popleft()
+        policy_version = done["policy_version"] or policy_version
+        for result in done["results"]:
+            stats["claims"] += 1
+            stats[result["decided_by"]] += 1
+            stats["errors"] += result["classification"] == "Error"
+            yield {"event": "result", **result}
+
+    try:
+        for batch in _batches(iter_claims(filename, data), BULK_BATCH_SIZE):
+            in_flight.append(asyncio.ensure_future(_process_batch(batch, classify, semaphore, filename, user_id)))
+            if len(in_flight) >= BULK_INFLIGHT_BATCHES:
+                async for event in drain_oldest():
+                    yield event
+        while in_flight:
+            async for event in drain_oldest():
+                yield event
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "event": "summary",
+        "claims": stats["claims"],
+        "decided_by_rules": stats["rules"],
+        "decided_by_llm": stats["llm"],
+        "errors": stats["errors"],
+        "unreadable_inputs": stats["input"],
+        "policy_version": policy_version,
+        "elapsed_s": round(elapsed, 3),
+        "claims_per_second": round(stats["claims"] / elapsed, 2) if elapsed > 0 else None,
+    }
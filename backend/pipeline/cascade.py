@@ -0,0 +1,194 @@
+import os
+import re
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from models.db import classification_collection
+from db.result_writer import RESULT_WRITER
+from pipeline.classify import classify_text_content, mask_sensitive_data, ocr_page, pdf_to_images
+from pipeline.classifytrain import BERT_BATCHER
+from utils.masking import MASKER
+from utils.metrics import stage
+
+# === Configuration ===
+BERT_CONFIDENCE_THRESHOLD = float(os.getenv("CASCADE_BERT_THRESHOLD", "0.85"))
+GEMINI_CONCURRENCY = int(os.getenv("CASCADE_GEMINI_CONCURRENCY", "4"))
+
+STAGES = ["keyword", "bert", "gemini"]
+
+# === Stage 1: keyword rules ===
+# Only phrases that settle the label on their own; weak cues such as a bare
+# "bill" are left to the model stages. Earlier rules win, as in fallback_label.
+KEYWORD_RULES: List[Tuple[str, List[str]]] = [
+    ("Tax Document", ["irs form 1040", "tax year", "filing status", "income tax return", "form 16"]),
+    ("Utility Bill", ["utility bill", "electricity bill", "water bill", "gas bill", "units consumed"]),
+    ("Invoice", ["tax invoice", "invoice no", "invoice number", "invoice date"]),
+    ("Contract", ["this agreement is made", "hereinafter referred to as", "in witness whereof"]),
+    ("Budget", ["budget estimate", "budgeted amount", "budget allocation"]),
+]
+
+# All phrases compiled into one alternation; the group index maps back to its rule.
+KEYWORD_PATTERN = re.compile(
+    "|".join(
+        f"(?P<r{i}>" + "|".join(r"\b" + re.escape(p).replace(r"\ ", r"\s+") + r"\b" for p in phrases) + ")"
+        for i, (_, phrases) in enumerate(KEYWORD_RULES)
+    ),
+    re.IGNORECASE,
+)
+
+def keyword_label(text: str) -> Optional[str]:
+    hits = {int(m.lastgroup[1:]) for m in KEYWORD_PATTERN.finditer(text)}
+    return KEYWORD_RULES[min(hits)][0] if hits else None
+
+# === Cumulative stage counters (process lifetime) ===
+CASCADE_STATS = Counter()
+
+def cascade_stats() -> dict:
+    total = CASCADE_STATS["pages"]
+    return {
+        "pages": total,
+        **{stage: CASCADE_STATS[stage] for stage in STAGES},
+        "hit_rates": {stage: round(CASCADE_STATS[stage] / total, 4) if total else 0.0 for stage in STAGES},
+    }
+
+# === Cascade ===
+async def classify_pages_cascade(page_texts: List[str]) -> Tuple[List[dict], dict]:
+    """Labels each page with the cheapest stage that is confident; returns per-page results and stage stats."""
+    results: List[Optional[dict]] = [None] * len(page_texts)
+
+    # Stage 1: keywords
+    pending = []
+    for i, text in enumerate(page_texts):
+        label = keyword_label(text)
+        if label:
+            results[i] = {"label": label, "stage": "keyword", "confidence": 1.0}
+        else:
+            pending.append(i)
+
+    # Stage 2: local BERT, accepted above the confidence threshold
+    if pending:
+        with stage("generate", model="bert"):
+            predictions = await BERT_BATCHER.submit_many([page_texts[i] for i in pending])
+        still_pending = []
+        for i, pred in zip(pending, predictions):
+            if pred["confidence"] >= BERT_CONFIDENCE_THRESHOLD:
+                results[i] = {"label": pred["label"], "stage": "bert", "confidence": pred["confidence"]}
+            else:
+                still_pending.append(i)
+        pending = still_pending
+
+    # Stage 3: Gemini for whatever is still ambiguous
+    if pending:
+        semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+
+        async def ask_gemini(i):
+            async with semaphore:
+                label = await asyncio.to_thread(classify_text_content, page_texts[i])
+            results[i] = {"label": label, "stage": "gemini", "confidence": None}
+
+        await asyncio.gather(*(ask_gemini(i) for i in pending))
+
+    counts = Counter(r["stage"] for r in results)
+    CASCADE_STATS["pages"] += len(results)
+    CASCADE_STATS.update(counts)
+    total = len(results)
+    stats = {
+        "pages": total,
+        **{stage: counts[stage] for stage in STAGES},
+        "hit_rates": {stage: round(counts[stage] / total, 4) if total else 0.0 for stage in STAGES},
+    }
+    return results, stats
+
+# === PDF / text entry points ===
+async def classify_pdf_cascade(file_bytes: bytes, user_id: str = None):
+    try:
+        images = await asyncio.to_thread(pdf_to_images, file_bytes)
+    except Exception as e:
+        print("[ERROR] PDF to Image failed:", e)
+        return {
+            "results": [{
+                "page": 0,
+                "label": "PDF conversion failed",
+                "text_preview": "",
+                "error": str(e)
+            }]
+        }
+
+    # A page OCR fails on is reported on its own, like classify_pdf_bytes does, and kept out of the cascade.
+    page_texts, errors = [], {}
+    for i, img in enumerate(images):
+        try:
+            page_texts.append(await asyncio.to_thread(ocr_page, img))
+        except Exception as e:
+            print(f"[OCR Error on Page {i+1}]: {e}")
+            page_texts.append("")
+            errors[i] = str(e)
+    text_pages = [i for i, t in enumerate(page_texts) if t]
+    labels, stats = await classify_pages_cascade([page_texts[i] for i in text_pages])
+    by_page = dict(zip(text_pages, labels))
+    masked_pages = dict(zip(text_pages, MASKER.mask_batch([page_texts[i] for i in text_pages], normalize=True)))
+
+    results = []
+    for i, text in enumerate(page_texts):
+        if i in errors:
+            results.append({
+                "page": i + 1,
+                "label": "Error",
+                "text_preview": "Could not process this page.",
+                "error": errors[i]
+            })
+            continue
+        if i not in by_page:
+            results.append({"page": i + 1, "label": "No Text Found", "text_preview": ""})
+            continue
+
+        masked = masked_pages[i]
+        outcome = by_page[i]
+        if user_id:
+            await RESULT_WRITER.write(classification_collection, {
+                "user_id": user_id,
+                "timestamp": datetime.utcnow(),
+                "input_type": "pdf",
+                "page": i + 1,
+                "label": outcome["label"],
+                "stage": outcome["stage"],
+                "masked_text": masked
+            })
+
+        results.append({
+            "page": i + 1,
+            "label": outcome["label"],
+            "stage": outcome["stage"],
+            "confidence": outcome["confidence"],
+            "text_preview": masked[:300]
+        })
+
+    return {"results": results, "cascade": stats}
+
+async def classify_text_cascade(text: str, user_id: str = None):
+    labels, stats = await classify_pages_cascade([text])
+    outcome = labels[0]
+    masked = mask_sensitive_data(text)
+
+    if user_id:
+        await RESULT_WRITER.write(classification_collection, {
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+            "input_type": "text",
+            "label": outcome["label"],
+            "stage": outcome["stage"],
+            "masked_text": masked
+        })
+
+    return {
+        "results": [{
+            "page": 1,
+            "label": outcome["label"],
+            "stage": outcome["stage"],
+            "confidence": outcome["confidence"],
+            "text_preview": masked[:300]
+        }],
+        "cascade": stats
+    }
@@ -1,14 +1,20 @@
 import os
 import re
 import io
+import asyncio
 import pytesseract
 from pdf2image import convert_from_bytes
 from datetime import datetime
 from PIL import Image
 import google.generativeai as genai
 from models.db import classification_collection
+from db.result_writer import RESULT_WRITER
+from utils.masking import MASKER
+from utils.metrics import stage
+from utils.router import ROUTERS
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Optional
 # === Configuration ===
 POPPLER_PATH = r"C:\Users\LALITHA\Downloads\Release-24.08.0-0\poppler-24.08.0\Library\bin"
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
@@ -30,23 +36,7 @@ LABELS = ["Invoice", "Bill", "Budget", "Tax Document", "Contract", "Utility Bill
 
 # === Sensitive Data Masking ===
 def mask_sensitive_data(text: str) -> str:
-    text = text.encode('ascii', 'ignore').decode('utf-8', 'ignore')
-    text = text.replace('\r', '').replace('\n', ' ')
-    text = re.sub(r'\s+', ' ', text).strip()
-
-    text = re.sub(r'\b\d{4}[\s\-]?\d{4}[\s\-]?\d{4}\b', 'XXXXX', text)  # Aadhaar
-    text = re.sub(r'\b\d{3}-\d{2}-\d{4}\b', 'XXX-XX-XXXX', text)        # SSN
-    text = re.sub(r'\+?\d{1,2}[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{4}', 'Phone Number: XXXXX', text)
-    text = re.sub(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}', 'EMAIL', text)  # Email
-
-    orgs = ['IRS', 'Infosys', 'TCS', 'Wipro', 'HDFC', 'ICICI', 'Deloitte']
-    for org in orgs:
-        text = re.sub(fr'\b{org}\b', '[ORG]', text, flags=re.IGNORECASE)
-
-    text = re.sub(r'(₹|\$|Rs\.?)\s?\d+[,.]?\d*', 'XXXXX', text)  # Currency
-    text = re.sub(r'Name\s*[:\-]?\s*[A-Z][a-z]+\s[A-Z][a-z]+', 'Name: XXXXX', text)
-
-    return text
+    return MASKER.mask(text, normalize=True)
 
 # === Fallback Classifier ===
 def fallback_label(text: str) -> str:
@@ -66,7 +56,8 @@ def fallback_label(text: str) -> str:
     return "Unclassified"
 
 # === Gemini Text Classification ===
-def classify_text_content(text: str) -> str:
+def gemini_label(text: str) -> Optional[str]:
+    """Gemini's label, or None when the call fails or returns something off-list."""
     prompt = f"""
 You are a document classification assistant.
 Classify the following text into one of these categories:
@@ -83,23 +74,38 @@ Page Text:
 {text}
 """
     try:
-        response = gemini.generate_content(prompt)
+        with stage("generate"):
+            response = gemini.generate_content(prompt)
         label = response.text.strip()
-
-        if label:
-            normalized = label.lower()
-            for valid_label in LABELS:
-                if normalized == valid_label.lower():
-                    return valid_label
-        return fallback_label(text)
     except Exception as e:
         print("[Gemini Error]", e)
-        return fallback_label(text)
+        return None
+
+    normalized = label.lower()
+    for valid_label in LABELS:
+        if normalized == valid_label.lower():
+            return valid_label
+    return None
+
+def classify_text_content(text: str) -> str:
+    return gemini_label(text) or fallback_label(text)
+
+# === OCR ===
+def ocr_page(img) -> str:
+    with stage("ocr"):
+        raw_text = pytesseract.image_to_string(img, config='--oem 3 --psm 6')
+    text = raw_text.encode('ascii', 'ignore').decode('utf-8', 'ignore')
+    text = text.replace('\r', '').replace('\n', ' ')
+    return re.sub(r'\s+', ' ', text).strip()
+
+def pdf_to_images(file_bytes: bytes):
+    with stage("extract"):
+        return convert_from_bytes(file_bytes, poppler_path=POPPLER_PATH)
 
 # === PDF Classification with Optional MongoDB Logging ===
 async def classify_pdf_bytes(file_bytes: bytes, user_id: str = None):
     try:
-        images = convert_from_bytes(file_bytes, poppler_path=POPPLER_PATH)
+        images = pdf_to_images(file_bytes)
     except Exception as e:
         print("[ERROR] PDF to Image failed:", e)
         return {
@@ -114,10 +120,7 @@ async def classify_pdf_bytes(file_bytes: bytes, user_id: str = None):
     results = []
     for i, img in enumerate(images):
         try:
-            raw_text = pytesseract.image_to_string(img, config='--oem 3 --psm 6')
-            text = raw_text.encode('ascii', 'ignore').decode('utf-8', 'ignore')
-            text = text.replace('\r', '').replace('\n', ' ')
-            text = re.sub(r'\s+', ' ', text).strip()
+            text = ocr_page(img)
 
             if not text:
                 results.append({"page": i + 1, "label": "No Text Found", "text_preview": ""})
@@ -134,7 +137,7 @@ async def classify_pdf_bytes(file_bytes: bytes, user_id: str = None):
 
             # Save to MongoDB if user_id is present
             if user_id:
-                await classification_collection.insert_one({
+                await RESULT_WRITER.write(classification_collection, {
                     "user_id": user_id,
                     "timestamp": datetime.utcnow(),
                     **result
@@ -156,3 +159,56 @@ async def classify_pdf_bytes(file_bytes: bytes, user_id: str = None):
             })
 
     return {"results": results}
+
+# === Routed classification (model="auto") ===
+async def classify_page_routed(text: str, page: int, user_id: str = None) -> dict:
+    """Gemini label, hedged with the local DistilBERT model when Gemini runs slow."""
+    from pipeline.classifytrain import BERT_BATCHER
+
+    async def from_gemini():
+        label = await asyncio.to_thread(gemini_label, text)
+        return {"label": label, "confidence": None} if label else None
+
+    prediction, routing = await ROUTERS["classify"].run(from_gemini, lambda: BERT_BATCHER.submit(text))
+    label = prediction["label"] if prediction else fallback_label(text)
+    confidence = prediction["confidence"] if prediction else None
+    masked = mask_sensitive_data(text)
+
+    if user_id:
+        await RESULT_WRITER.write(classification_collection, {
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+            "page": page,
+            "label": label,
+            "confidence": confidence,
+            "masked_text": masked,
+            "routing": routing
+        })
+
+    return {
+        "page": page,
+        "label": label,
+        "confidence": confidence,
+        "model_used": routing["winner"],
+        "text_preview": masked[:300]
+    }
+
+async def classify_text_routed(text: str, user_id: str = None):
+    return {"results": [await classify_page_routed(text, 1, user_id)]}
+
+async def classify_pdf_bytes_routed(file_bytes: bytes, user_id: str = None):
+    try:
+        images = await asyncio.to_thread(pdf_to_images, file_bytes)
+    except Exception as e:
+        print("[ERROR] PDF to Image failed:", e)
+        return {"results": [{"page": 0, "label": "PDF conversion failed", "text_preview": "", "error": str(e)}]}
+
+    results = []
+    for i, img in enumerate(images):
+        text = await asyncio.to_thread(ocr_page, img)
+        if not text:
+            results.append({"page": i + 1, "label": "No Text Found", "text_preview": ""})
+            continue
+        results.append(await classify_page_routed(text, i + 1, user_id))
+
+    return {"results": results}
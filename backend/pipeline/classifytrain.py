@@ -3,43 +3,129 @@ from pdf2image import convert_from_bytes
 import pytesseract
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from typing import Optional
-import re
+from typing import List, Optional
+import os
 from models.db import classification_collection  # ✅ NEW: MongoDB collection
+from db.result_writer import RESULT_WRITER
 from datetime import datetime
+from utils.batching import MicroBatcher
+from utils.masking import PII_MASKER
+from utils.metrics import stage
+from serving import registry
 
 # === Model setup ===
 MODEL_PATH = "document_type_classifier"
 POPPLER_PATH = r"C:\Users\LALITHA\Downloads\Release-24.08.0-0\poppler-24.08.0\Library\bin"
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 LABELS = ["Invoice", "Bill", "Budget", "Tax Document", "Contract"]
+MAX_LENGTH = 256
+BERT_MAX_BATCH = int(os.getenv("BERT_MAX_BATCH", "32"))
+BUCKET_WIDTH = 32  # tokens; pages whose lengths fall in the same band share a forward pass
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH).to(DEVICE)
-model.eval()
+def _load_bert():
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH).to(DEVICE)
+    model.eval()
+    return tokenizer, model
+
+registry.register("bert", _load_bert)
 
 def mask_pii(text: str) -> str:
-    text = re.sub(r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}\b', 'XXXXX', text)
-    text = re.sub(r'\b[A-Z]{5}[0-9]{4}[A-Z]\b', 'XXXXX', text)
-    text = re.sub(r'\b[6-9]\d{9}\b', 'XXXXX', text)
-    text = re.sub(r'\b\d{10}\b', 'XXXXX', text)
-    text = re.sub(r'\$\d{1,3}(?:,\d{3})*(?:\.\d{2})?', 'XXXXX', text)
-    text = re.sub(r'(Taxpayer Name:\s*)(.*)', r'\1XXXXX', text)
-    return text
+    return PII_MASKER.mask(text)
+
+def _length_buckets(lengths: List[int]) -> List[List[int]]:
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets, current, band = [], [], None
+    for i in order:
+        item_band = (lengths[i] - 1) // BUCKET_WIDTH
+        if current and (item_band != band or len(current) >= BERT_MAX_BATCH):
+            buckets.append(current)
+            current = []
+        current.append(i)
+        band = item_band
+    if current:
+        buckets.append(current)
+    return buckets
+
+@registry.served("classify_bert", batched=True, pool="bert")
+def classify_texts_with_model(texts: List[str]) -> List[dict]:
+    """Classifies many pages at once: sorted into length buckets, one padded forward pass per bucket."""
+    results = [{"label": "Unclassified (No text)", "confidence": 0.0} for _ in texts]
+    cleaned = [t.lower().replace("\n", " ").strip() for t in texts]
+    todo = [i for i, c in enumerate(cleaned) if c]
+    if not todo:
+        return results
+
+    tokenizer, model = registry.get("bert")
+
+    encoded = tokenizer([cleaned[i] for i in todo], truncation=True, max_length=MAX_LENGTH)
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+
+    for bucket in _length_buckets(lengths):
+        try:
+            features = [{key: encoded[key][j] for key in encoded.keys()} for j in bucket]
+            inputs = tokenizer.pad(features, padding="longest", return_tensors="pt").to(DEVICE)
+            with torch.inference_mode():
+                logits = model(**inputs).logits
+            confidences, preds = torch.softmax(logits, dim=-1).max(dim=-1)
+            for j, pred, conf in zip(bucket, preds.tolist(), confidences.tolist()):
+                results[todo[j]] = {"label": LABELS[pred], "confidence": round(conf, 4)}
+        except Exception as e:
+            print("⚠ Model inference error:", str(e))
+            for j in bucket:
+                results[todo[j]] = {"label": "Unclassified (Error)", "confidence": 0.0}
+    return results
 
 def classify_text_with_model(text):
-    clean_text = text.lower().replace("\n", " ").strip()
-    if not clean_text:
-        return "Unclassified (No text)"
+    return classify_texts_with_model([text])[0]["label"]
+
+# Pages from concurrent requests are merged into the same bucketed batches.
+BERT_BATCHER = MicroBatcher(
+    classify_texts_with_model,
+    max_batch_size=BERT_MAX_BATCH * 4,
+    max_wait_ms=float(os.getenv("BERT_BATCH_WAIT_MS", "10")),
+    name="bert",
+)
+
+async def classify_pdf_bytes_with_model(contents: bytes, user_id: Optional[str] = None):
     try:
-        inputs = tokenizer(clean_text, truncation=True, padding=True, max_length=256, return_tensors="pt").to(DEVICE)
-        with torch.no_grad():
-            outputs = model(**inputs)
-        pred = torch.argmax(outputs.logits, dim=1).item()
-        return LABELS[pred]
+        with stage("extract"):
+            images = convert_from_bytes(contents, poppler_path=POPPLER_PATH)
+        results = []
+
+        with stage("ocr"):
+            page_texts = [pytesseract.image_to_string(img) for img in images]
+        with stage("generate"):
+            predictions = await BERT_BATCHER.submit_many(page_texts)
+        with stage("mask"):
+            masked_pages = PII_MASKER.mask_batch([t.strip() for t in page_texts])
+
+        for i, (text, prediction, masked) in enumerate(zip(page_texts, predictions, masked_pages)):
+            label = prediction["label"]
+
+            # ✅ Store in MongoDB (masked text only; raw OCR stays in the response)
+            await RESULT_WRITER.write(classification_collection, {
+                "user_id": user_id or "unknown",
+                "timestamp": datetime.utcnow(),
+                "input_type": "pdf",
+                "page": i + 1,
+                "label": label,
+                "confidence": prediction["confidence"],
+                "masked_text": masked
+            })
+
+            results.append({
+                "page": i + 1,
+                "label": label,
+                "confidence": prediction["confidence"],
+                "ocr_text": text.strip(),
+                "masked_text": masked
+            })
+
+        return {"type": "pdf", "results": results}
+
     except Exception as e:
-        print("⚠ Model inference error:", str(e))
-        return "Unclassified (Error)"
+        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
 # ✅ Function to be called by main.py
 async def classify_file_from_train_model(
@@ -48,54 +134,27 @@ async def classify_file_from_train_model(
     user_id: Optional[str] = Form(None)
 ):
     if file:
-        try:
+        with stage("upload"):
             contents = await file.read()
-            images = convert_from_bytes(contents, poppler_path=POPPLER_PATH)
-            results = []
-
-            for i, img in enumerate(images):
-                text = pytesseract.image_to_string(img)
-                label = classify_text_with_model(text) if text.strip() else "Unclassified (No text)"
-                masked = mask_pii(text.strip())
-
-                # ✅ Store in MongoDB
-                await classification_collection.insert_one({
-                    "user_id": user_id or "unknown",
-                    "timestamp": datetime.utcnow(),
-                    "input_type": "pdf",
-                    "page": i + 1,
-                    "label": label,
-                    "ocr_text": text.strip(),
-                    "masked_text": masked
-                })
-
-                results.append({
-                    "page": i + 1,
-                    "label": label,
-                    "ocr_text": text.strip(),
-                    "masked_text": masked
-                })
-
-            return {"type": "pdf", "results": results}
-
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+        return await classify_pdf_bytes_with_model(contents, user_id=user_id)
 
     elif text:
-        label = classify_text_with_model(text)
+        with stage("generate"):
+            prediction = await BERT_BATCHER.submit(text)
+        label = prediction["label"]
         masked = mask_pii(text)
 
         # ✅ Store in MongoDB
-        await classification_collection.insert_one({
+        await RESULT_WRITER.write(classification_collection, {
             "user_id": user_id or "unknown",
             "timestamp": datetime.utcnow(),
             "input_type": "text",
             "label": label,
-            "ocr_text": text,
+            "confidence": prediction["confidence"],
             "masked_text": masked
         })
 
-        return {"type": "text", "label": label, "input": text, "masked": masked}
+        return {"type": "text", "label": label, "confidence": prediction["confidence"], "input": text, "masked": masked}
 
     else:
         raise HTTPException(status_code=400, detail="No input provided.")
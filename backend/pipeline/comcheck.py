@@ -1,19 +1,22 @@
 # backend/usecases/comcheck.py
 import os
 import json
-import faiss  
 import re
+import asyncio
 import fitz
-import torch
 import google.generativeai as genai
 from io import BytesIO
 from typing import List, Union
 from datetime import datetime
-from sentence_transformers import SentenceTransformer
 from models.db import compliance_collection
+from db.result_writer import RESULT_WRITER
 from dotenv import load_dotenv
 from pathlib import Path
-from pipeline.travel import TRAVEL_POLICIES
+from pipeline.travel import detect_city
+from pipeline.travel_rules import evaluate_claims
+from pipeline.policy_index import POLICY_INDEX
+from utils.metrics import stage
+from utils.router import ROUTERS
 
 
 
@@ -29,42 +32,23 @@ genai.configure(api_key=api_key)
 
 gemini = genai.GenerativeModel("gemini-1.5-flash")
 
-# Embedder and FAISS
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-EMBEDDER = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device=DEVICE)
-
-# Define TRAVEL_POLICIES (import from another file or paste inline)
-
-
-policy_texts = [p["policy"] for p in TRAVEL_POLICIES]
-policy_embeds = EMBEDDER.encode(policy_texts, convert_to_numpy=True, normalize_embeddings=True)
-INDEX = faiss.IndexFlatIP(policy_embeds.shape[1])
-INDEX.add(policy_embeds)
-
-CITY_TO_TIER = {
-    "Delhi": "Tier 1", "Mumbai": "Tier 1", "Bangalore": "Tier 1", "Hyderabad": "Tier 2",
-    "Pune": "Tier 2", "Chennai": "Tier 1", "Kolkata": "Tier 1", "Ahmedabad": "Tier 2",
-    "Indore": "Tier 2", "Jaipur": "Tier 2", "Coimbatore": "Tier 3", "Mysore": "Tier 3",
-    "Patna": "Tier 3", "Nagpur": "Tier 3", "Lucknow": "Tier 2", "Bhopal": "Tier 3", "Guwahati": "Tier 3"
-}
 
 def extract_text_from_bytes(pdf_bytes: bytes) -> str:
-    with fitz.open("pdf", pdf_bytes) as doc:
+    with stage("extract"), fitz.open("pdf", pdf_bytes) as doc:
         return " ".join(p.get_text() for p in doc if p.get_text()).strip()
 
 def split_claims(text: str) -> List[str]:
     return [f"Claim: {s.strip()}" for s in re.split(r"(?i)\bclaim\s*:", text) if s.strip()]
 
 def add_city_tier(claim: str) -> str:
-    for city, tier in CITY_TO_TIER.items():
-        if city.lower() in claim.lower():
-            return f"{claim}\n\nDetected city: {city} → {tier}."
+    detected = detect_city(claim)
+    if detected:
+        city, tier = detected
+        return f"{claim}\n\nDetected city: {city} → {tier}."
     return claim
 
 def top_k_policies(claim: str, k=2) -> List[dict]:
-    q_emb = EMBEDDER.encode([claim], convert_to_numpy=True, normalize_embeddings=True)
-    _, idx = INDEX.search(q_emb, k)
-    return [TRAVEL_POLICIES[i] for i in idx[0]]
+    return POLICY_INDEX.search(claim, k)[0]
 
 def gemini_classify(claim: str, policies: List[dict]) -> str:
     p1, p2 = policies
@@ -77,11 +61,41 @@ def gemini_classify(claim: str, policies: List[dict]) -> str:
         "• Compliance: <Compliant | Non‑Compliant>\n"
         "• Reasoning: <one concise sentence>"
     )
-    return gemini.generate_content(prompt).text.strip()
+    with stage("generate"):
+        return gemini.generate_content(prompt).text.strip()
+
+def parse_gemini_result(result_text: str):
+    lines = result_text.strip().splitlines()
+    classification_line = next((line for line in lines if "compliance" in line.lower()), "")
+    reasoning_line = next((line for line in lines if "reasoning" in line.lower()), "")
+
+    classification = "Non-Compliant" if "non-compliant" in classification_line.lower() else "Compliant"
+    reasoning = (
+        reasoning_line.split(":", 1)[1].strip()
+        if ":" in reasoning_line else "No reasoning provided."
+    )
+    return classification, reasoning
 
 # 💡 Final callable for FastAPI
 
-async def run_compliance_check_gemini(content: Union[bytes, str], user_id: str, is_raw_text: bool = False):
+async def classify_claim_hedged(claim: str, policies: List[dict]):
+    """Gemini verdict, hedged with TinyLlama when Gemini is slower than usual."""
+    from pipeline.comcheck_llama import LLAMA_BATCHER, correct_conflicting_label, extract_reasoning, parse_classification
+
+    async def from_gemini():
+        return parse_gemini_result(await asyncio.to_thread(gemini_classify, claim, policies))
+
+    async def from_llama():
+        classification, reasoning_text = parse_classification(await LLAMA_BATCHER.submit(claim))
+        reasoning = extract_reasoning(reasoning_text)
+        return correct_conflicting_label(classification, reasoning), reasoning
+
+    verdict, routing = await ROUTERS["compliance"].run(
+        from_gemini, from_llama, valid=lambda r: r is not None and r[0] in ("Compliant", "Non-Compliant")
+    )
+    return verdict or ("Error", "❌ No model produced a verdict."), routing
+
+async def run_compliance_check_gemini(content: Union[bytes, str], user_id: str, is_raw_text: bool = False, hedge: bool = False):
     try:
         # Step 1: Get plain text
         text = content if is_raw_text else extract_text_from_bytes(content)
@@ -89,42 +103,55 @@ async def run_compliance_check_gemini(content: Union[bytes, str], user_id: str,
         # Step 2: Split text into individual claims
         claims = split_claims(text)
 
+        # Step 3: Settle clear-cut claims with the deterministic rules
+        verdicts = evaluate_claims(claims, POLICY_INDEX.snapshot.limits)
+        claims = [add_city_tier(raw) for raw in claims]
+
+        # Step 4: One batched policy lookup for the claims the rules left open
+        escalated = [claim for claim, verdict in zip(claims, verdicts) if verdict is None]
+        matches, policy_version = POLICY_INDEX.search_many(escalated)
+        matches = iter(matches)
+
         results = []
 
-        for raw in claims:
-            claim = add_city_tier(raw)
-            top_pols = top_k_policies(claim)
-            result_text = gemini_classify(claim, top_pols)
-
-            lines = result_text.strip().splitlines()
-            classification_line = next((line for line in lines if "compliance" in line.lower()), "")
-            reasoning_line = next((line for line in lines if "reasoning" in line.lower()), "")
-
-            classification = "Non-Compliant" if "non-compliant" in classification_line.lower() else "Compliant"
-            reasoning = (
-                reasoning_line.split(":", 1)[1].strip()
-                if ":" in reasoning_line else "No reasoning provided."
-            )
-
-            result = {
-                "claim": claim,
-                "classification": classification,
-                "reasoning": reasoning,
-                "matched_policies": [p["category"] for p in top_pols]
-            }
-
-            await compliance_collection.insert_one({
+        for claim, verdict in zip(claims, verdicts):
+            if verdict:
+                result = {"claim": claim, **verdict}
+            else:
+                top_pols = next(matches)
+                routing = None
+                if hedge:
+                    (classification, reasoning), routing = await classify_claim_hedged(claim, top_pols)
+                else:
+                    classification, reasoning = parse_gemini_result(gemini_classify(claim, top_pols))
+
+                result = {
+                    "claim": claim,
+                    "classification": classification,
+                    "reasoning": reasoning,
+                    "matched_policies": [p["category"] for p in top_pols],
+                    "rule_ids": [],
+                    "decided_by": "llm"
+                }
+                if routing:
+                    result["routing"] = routing
+
+            await RESULT_WRITER.write(compliance_collection, {
                 "user_id": user_id,
                 "timestamp": datetime.utcnow(),
                 "claim_text": result["claim"],
                 "compliant": result["classification"].lower() == "compliant",
                 "reasoning": result["reasoning"],
-                "matched_policies": result["matched_policies"]
+                "matched_policies": result["matched_policies"],
+                "rule_ids": result["rule_ids"],
+                "decided_by": result["decided_by"],
+                "routing": result.get("routing"),
+                "policy_version": policy_version
             })
 
             results.append(result)
 
-        return {"results": results}
+        return {"results": results, "policy_version": policy_version}
 
     except Exception as e:
         import traceback
@@ -1,66 +1,75 @@
 import os
 import re
-import faiss
 import fitz
 import torch
 import sys
 import json
+import asyncio
 from pathlib import Path
-from typing import List, Union
+from typing import List, Optional, Union
 from datetime import datetime
 
 # ✅ Fix path so models/ and pipeline/ are importable
 backend_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(backend_root))
 
-from sentence_transformers import SentenceTransformer
 from models.db import compliance_collection
-from pipeline.travel import TRAVEL_POLICIES
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from db.result_writer import RESULT_WRITER
+from pipeline.travel import detect_city
+from pipeline.travel_rules import evaluate_claims
+from pipeline.policy_index import POLICY_INDEX
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    DynamicCache,
+    LogitsProcessor,
+    LogitsProcessorList,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
+)
+from utils.batching import MicroBatcher
+from utils.metrics import stage, record_cache
+from serving import registry
+from serving.scheduler import SCHEDULER
 
 # === Load TinyLLaMA fine-tuned model ===
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 MODEL_ID = "lalithadarisi/tinyllama-compliance-merged"
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, cache_dir="D:/hf_cache")
-model = AutoModelForCausalLM.from_pretrained(MODEL_ID, cache_dir="D:/hf_cache")
-model.to(DEVICE)
+def _load_tinyllama():
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, cache_dir="D:/hf_cache")
+    model = AutoModelForCausalLM.from_pretrained(MODEL_ID, cache_dir="D:/hf_cache")
+    model.to(DEVICE)
+    model.eval()
 
-print("✅ TinyLLaMA model loaded successfully on", DEVICE)
+    # Batched generation pads on the left so every claim ends right before "Classification:"
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
 
-# === FAISS policy index setup ===
-EMBEDDER = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device=DEVICE)
-policy_texts = [p["policy"] for p in TRAVEL_POLICIES]
-policy_embeds = EMBEDDER.encode(policy_texts, convert_to_numpy=True, normalize_embeddings=True)
-INDEX = faiss.IndexFlatIP(policy_embeds.shape[1])
-INDEX.add(policy_embeds)
+    print("✅ TinyLLaMA model loaded successfully on", DEVICE)
+    return tokenizer, model
 
-# === City-tier mapping ===
-CITY_TO_TIER = {
-    "Delhi": "Tier 1", "Mumbai": "Tier 1", "Bangalore": "Tier 1", "Hyderabad": "Tier 2",
-    "Pune": "Tier 2", "Chennai": "Tier 1", "Kolkata": "Tier 1", "Ahmedabad": "Tier 2",
-    "Indore": "Tier 2", "Jaipur": "Tier 2", "Coimbatore": "Tier 3", "Mysore": "Tier 3",
-    "Patna": "Tier 3", "Nagpur": "Tier 3", "Lucknow": "Tier 2", "Bhopal": "Tier 3", "Guwahati": "Tier 3"
-}
+registry.register("tinyllama", _load_tinyllama)
 
 # === Utility functions ===
 def extract_text_from_bytes(pdf_bytes: bytes) -> str:
-    with fitz.open("pdf", pdf_bytes) as doc:
+    with stage("extract"), fitz.open("pdf", pdf_bytes) as doc:
         return " ".join(p.get_text() for p in doc if p.get_text()).strip()
 
 def split_claims(text: str) -> List[str]:
     return [f"{s.strip()}" for s in re.split(r"(?i)\bclaim\s*:", text) if s.strip()]
 
 def add_city_tier(claim: str) -> str:
-    for city, tier in CITY_TO_TIER.items():
-        if city.lower() in claim.lower():
-            return f"{claim} (City Tier: {tier})"
+    detected = detect_city(claim)
+    if detected:
+        city, tier = detected
+        return f"{claim} (City Tier: {tier})"
     return claim
 
 def top_k_policies(claim: str, k=2) -> List[dict]:
-    q_emb = EMBEDDER.encode([claim], convert_to_numpy=True, normalize_embeddings=True)
-    _, idx = INDEX.search(q_emb, k)
-    return [TRAVEL_POLICIES[i] for i in idx[0]]
+    return POLICY_INDEX.search(claim, k)[0]
 
 def correct_conflicting_label(label: str, reasoning: str) -> str:
     if "non-compliant" in reasoning.lower() and label == "Compliant":
@@ -91,63 +100,351 @@ def extract_reasoning(text: str) -> str:
     return "No reasoning provided."
 
 # === Model inference ===
+MAX_NEW_TOKENS = 150
+LLAMA_MAX_BATCH = int(os.getenv("LLAMA_MAX_BATCH", "8"))
+LLAMA_BATCH_WAIT_MS = float(os.getenv("LLAMA_BATCH_WAIT_MS", "15"))
+CONSTRAIN_LABEL = os.getenv("LLAMA_CONSTRAIN_LABEL", "0") == "1"
+LABELS = ["Compliant", "Non-Compliant"]
+
+# Fixed instruction preamble shared by every claim; its KV cache is computed once.
+PROMPT_PREFIX = (
+    "You are a travel compliance expert. Review the claim and respond in the following format ONLY:\n\n"
+    "Classification: [Compliant / Non-Compliant]\n"
+    "Reasoning: <Concise explanation based strictly on travel policy>\n\n"
+)
+
+
+def build_claim_suffix(claim: str) -> str:
+    return f"Claim: {claim}\n\nClassification:"
+
+
+def _build_prefix_cache():
+    tokenizer, model = registry.get("tinyllama")
+    ids = tokenizer(PROMPT_PREFIX, return_tensors="pt").input_ids.to(DEVICE)
+    with torch.inference_mode():
+        out = model(input_ids=ids, use_cache=True)
+    past = out.past_key_values
+    legacy = past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+    return ids, legacy
+
+
+registry.register("tinyllama_prefix", _build_prefix_cache)
+USE_PREFIX_CACHE = os.getenv("LLAMA_PREFIX_CACHE", "1") == "1"
+
+
+def _expand_prefix_cache(prefix_kv, batch_size: int) -> DynamicCache:
+    # generate() appends to the cache in place, so each batch gets its own copy.
+    return DynamicCache.from_legacy_cache(tuple(
+        (k.expand(batch_size, -1, -1, -1).contiguous(), v.expand(batch_size, -1, -1, -1).contiguous())
+        for k, v in prefix_kv
+    ))
+
+
+# === Structured decoding ===
+# A response is complete once the label and one full Reasoning sentence are out.
+COMPLETE_RESPONSE_RE = re.compile(
+    r"classification\s*[:\-]*\s*(?:compliant|non-compliant)[\s\S]*?"
+    r"reasoning[\s:\-–.]*\S[^\n]*?(?:[.!?]\s|\n)",
+    re.IGNORECASE,
+)
+LABEL_RE = re.compile(r"classification\s*[:\-]*\s*(non-compliant|compliant)\b", re.IGNORECASE)
+
+
+def label_token_ids(tokenizer) -> List[List[int]]:
+    return [tokenizer.encode(label, add_special_tokens=False) for label in LABELS]
+
+
+def is_complete_response(text: str) -> bool:
+    return COMPLETE_RESPONSE_RE.search(text) is not None
+
+
+class ReasoningCompleteCriteria(StoppingCriteria):
+    """Stops each sequence as soon as its Classification + first Reasoning sentence are decoded."""
+
+    def __init__(self, tokenizer, prompt_len: int):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+
+    def __call__(self, input_ids, scores, **kwargs):
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_len:], skip_special_tokens=True)
+        done = [is_complete_response("Classification:" + t) for t in texts]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class LabelConstraintLogitsProcessor(LogitsProcessor):
+    """Restricts the first generated tokens to one of the label token sequences."""
+
+    def __init__(self, prompt_len: int, label_token_ids: List[List[int]]):
+        self.prompt_len = prompt_len
+        self.label_token_ids = label_token_ids
+        self.max_len = max(len(ids) for ids in label_token_ids)
+
+    def __call__(self, input_ids, scores):
+        step = input_ids.shape[1] - self.prompt_len
+        if step >= self.max_len:
+            return scores
+        mask = torch.zeros_like(scores)
+        for row in range(input_ids.shape[0]):
+            generated = input_ids[row, self.prompt_len:].tolist()
+            allowed = {
+                ids[step] for ids in self.label_token_ids
+                if len(ids) > step and ids[:step] == generated
+            }
+            if allowed:
+                mask[row] = float("-inf")
+                mask[row, list(allowed)] = 0
+        return scores + mask
+
+
+def _generate_batch(
+    claims: List[str],
+    use_prefix_cache: bool,
+    constrain_label: bool = CONSTRAIN_LABEL,
+    streamer: Optional[TextIteratorStreamer] = None,
+) -> List[str]:
+    tokenizer, model = registry.get("tinyllama")
+    batch_size = len(claims)
+    suffixes = [build_claim_suffix(c) for c in claims]
+
+    if use_prefix_cache:
+        prefix_ids, prefix_kv = registry.get("tinyllama_prefix")
+        enc = tokenizer(suffixes, return_tensors="pt", padding=True, add_special_tokens=False).to(DEVICE)
+        # [prefix][left pad][claim] — the mask lets position ids skip the padding gap.
+        input_ids = torch.cat([prefix_ids.expand(batch_size, -1), enc.input_ids], dim=1)
+        attention_mask = torch.cat(
+            [torch.ones_like(prefix_ids).expand(batch_size, -1), enc.attention_mask], dim=1
+        )
+        extra = {"past_key_values": _expand_prefix_cache(prefix_kv, batch_size)}
+    else:
+        enc = tokenizer([PROMPT_PREFIX + s for s in suffixes], return_tensors="pt", padding=True).to(DEVICE)
+        input_ids, attention_mask = enc.input_ids, enc.attention_mask
+        extra = {}
+
+    prompt_len = input_ids.shape[1]
+    if constrain_label:
+        extra["logits_processor"] = LogitsProcessorList(
+            [LabelConstraintLogitsProcessor(prompt_len, label_token_ids(tokenizer))]
+        )
+    if streamer is not None:
+        extra["streamer"] = streamer
+
+    with torch.inference_mode():
+        outputs = model.generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            max_new_tokens=MAX_NEW_TOKENS,
+            do_sample=False,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.pad_token_id,
+            stopping_criteria=StoppingCriteriaList([ReasoningCompleteCriteria(tokenizer, prompt_len)]),
+            **extra,
+        )
+    generated = tokenizer.batch_decode(outputs[:, prompt_len:], skip_special_tokens=True)
+    return [("Classification:" + g).strip() for g in generated]
+
+
+@registry.served("tinyllama_classify", batched=True, pool="tinyllama")
+def llama_classify_batch(claims: List[str]) -> List[str]:
+    global USE_PREFIX_CACHE
+    results = []
+    for i in range(0, len(claims), LLAMA_MAX_BATCH):
+        batch = claims[i:i + LLAMA_MAX_BATCH]
+        if USE_PREFIX_CACHE:
+            try:
+                results.extend(_generate_batch(batch, use_prefix_cache=True))
+                record_cache("llama_prefix_kv", True)
+                continue
+            except Exception as e:
+                print("⚠ Prefix-cached generation failed, falling back to full prompts:", e)
+                USE_PREFIX_CACHE = False
+        record_cache("llama_prefix_kv", False)
+        results.extend(_generate_batch(batch, use_prefix_cache=False))
+    return results
+
+
 def llama_classify(claim: str) -> str:
-    prompt = (
-        "You are a travel compliance expert. Review the claim and respond in the following format ONLY:\n\n"
-        "Classification: [Compliant / Non-Compliant]\n"
-        "Reasoning: <Concise explanation based strictly on travel policy>\n\n"
-        f"Claim: {claim}\n\n"
-        "Classification:"
-    )
-    inputs = tokenizer(prompt, return_tensors="pt").to(DEVICE)
-    outputs = model.generate(
-        **inputs,
-        max_new_tokens=150,
-        do_sample=False,
-        eos_token_id=tokenizer.eos_token_id,
-        pad_token_id=tokenizer.pad_token_id,
-    )
-    return tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
+    return llama_classify_batch([claim])[0]
 
 
-# === Main compliance check function ===
-async def run_compliance_check_llama(content: Union[bytes, str], user_id: str, is_raw_text: bool = False):
+class _ClaimStreamer(TextIteratorStreamer):
+    """Remembers whether any text went out, so a failed attempt can be retried invisibly."""
+
+    started = False
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        self.started = self.started or bool(text)
+        super().on_finalized_text(text, stream_end)
+
+    def restart(self):
+        self.token_cache, self.print_len, self.next_tokens_are_prompt = [], 0, True
+
+
+def _stream_generate(claim: str, constrain_label: bool, streamer: _ClaimStreamer) -> List[str]:
+    global USE_PREFIX_CACHE
     try:
-        text = content if is_raw_text else extract_text_from_bytes(content)
-        claims = split_claims(text)
+        if USE_PREFIX_CACHE:
+            try:
+                return _generate_batch([claim], True, constrain_label, streamer)
+            except Exception as e:
+                if streamer.started:
+                    raise
+                print("⚠ Prefix-cached generation failed, falling back to full prompts:", e)
+                USE_PREFIX_CACHE = False
+                streamer.restart()
+        return _generate_batch([claim], False, constrain_label, streamer)
+    finally:
+        # generate() only ends the stream when it succeeds; without this the consumer waits forever.
+        streamer.end()
 
-        results = []
 
-        for raw_claim in claims:
-            claim = add_city_tier(raw_claim)
-            top_pols = top_k_policies(claim)
-            result_text = llama_classify(claim)
+def stream_llama_classify(claim: str, constrain_label: bool = CONSTRAIN_LABEL):
+    """Yields decoded text pieces for one claim while generate() runs on the TinyLlama worker.
+
+    Raises the generation error, if any, once the stream ends.
+    """
+    if registry.remote() is not None:
+        # The sidecar returns whole responses; the label event then follows right after.
+        yield llama_classify_batch([claim])[0][len("Classification:"):]
+        return
+
+    tokenizer, _ = registry.get("tinyllama")
+    streamer = _ClaimStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    executor = SCHEDULER.executor("tinyllama")
+    # Either way generate() runs where batched generation runs, so a stream queues
+    # behind a batch instead of competing with it: the pinned tinyllama threads, or
+    # LLAMA_BATCHER's own thread when the scheduler is off.
+    submit = executor.submit if executor is not None else LLAMA_BATCHER.run_exclusive
+    worker = submit(_stream_generate, claim, constrain_label, streamer)
+    yield from streamer
+    worker.result()
+
+
+# Claims from concurrent reports are merged into shared generate() calls.
+LLAMA_BATCHER = MicroBatcher(
+    llama_classify_batch,
+    max_batch_size=LLAMA_MAX_BATCH,
+    max_wait_ms=LLAMA_BATCH_WAIT_MS,
+    name="tinyllama",
+)
+
+
+# === Streaming compliance check ===
+async def stream_compliance_check_llama(content: Union[bytes, str], user_id: str, is_raw_text: bool = False):
+    """Async generator of per-claim events; the label is emitted as soon as it is decoded."""
+    text = content if is_raw_text else extract_text_from_bytes(content)
+
+    raw_claims = split_claims(text)
+    for raw_claim, verdict in zip(raw_claims, evaluate_claims(raw_claims, POLICY_INDEX.snapshot.limits)):
+        claim = add_city_tier(raw_claim)
+        yield {"event": "claim", "claim": claim}
+
+        if verdict:
+            result = {"claim": claim, **verdict}
+            policy_version = POLICY_INDEX.snapshot.version
+        else:
+            top_pols, policy_version = POLICY_INDEX.search(claim)
+            pieces = stream_llama_classify(claim)
+            result_text = "Classification:"
+            label_sent = False
+            try:
+                while True:
+                    piece = await asyncio.to_thread(next, pieces, None)
+                    if piece is None:
+                        break
+                    result_text += piece
+                    if not label_sent:
+                        match = LABEL_RE.search(result_text)
+                        if match:
+                            label_sent = True
+                            label = "Non-Compliant" if match.group(1).lower() == "non-compliant" else "Compliant"
+                            yield {"event": "label", "claim": claim, "classification": label}
+            except Exception as e:
+                # Reported on the stream but not stored: the claim was never actually judged.
+                yield {"event": "result", "claim": claim, "classification": "Error",
+                       "reasoning": f"❌ Exception: {str(e)}", "matched_policies": [], "rule_ids": [],
+                       "decided_by": "llm", "policy_version": policy_version}
+                continue
 
-            # === Parse result ===
             classification, reasoning_text = parse_classification(result_text)
             reasoning = extract_reasoning(reasoning_text)
             classification = correct_conflicting_label(classification, reasoning)
-
             result = {
                 "claim": claim,
                 "classification": classification,
                 "reasoning": reasoning,
-                "matched_policies": [p["category"] for p in top_pols]
+                "matched_policies": [p["category"] for p in top_pols],
+                "rule_ids": [],
+                "decided_by": "llm"
             }
 
+        await RESULT_WRITER.write(compliance_collection, {
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+            "claim_text": result["claim"],
+            "compliant": result["classification"].lower() == "compliant",
+            "reasoning": result["reasoning"],
+            "matched_policies": result["matched_policies"],
+            "rule_ids": result["rule_ids"],
+            "decided_by": result["decided_by"],
+            "policy_version": policy_version
+        })
+
+        yield {"event": "result", **result, "policy_version": policy_version}
+
+
+# === Main compliance check function ===
+async def run_compliance_check_llama(content: Union[bytes, str], user_id: str, is_raw_text: bool = False):
+    try:
+        text = content if is_raw_text else extract_text_from_bytes(content)
+        claims = split_claims(text)
+
+        # Clear-cut claims are settled by the rules; only the rest reach TinyLlama.
+        verdicts = evaluate_claims(claims, POLICY_INDEX.snapshot.limits)
+        claims = [add_city_tier(raw_claim) for raw_claim in claims]
+        escalated = [claim for claim, verdict in zip(claims, verdicts) if verdict is None]
+        matches, policy_version = POLICY_INDEX.search_many(escalated)
+        matches = iter(matches)
+        with stage("generate"):
+            result_texts = iter(await LLAMA_BATCHER.submit_many(escalated))
+
+        results = []
+
+        for claim, verdict in zip(claims, verdicts):
+            if verdict:
+                result = {"claim": claim, **verdict}
+            else:
+                top_pols = next(matches)
+
+                # === Parse result ===
+                classification, reasoning_text = parse_classification(next(result_texts))
+                reasoning = extract_reasoning(reasoning_text)
+                classification = correct_conflicting_label(classification, reasoning)
+
+                result = {
+                    "claim": claim,
+                    "classification": classification,
+                    "reasoning": reasoning,
+                    "matched_policies": [p["category"] for p in top_pols],
+                    "rule_ids": [],
+                    "decided_by": "llm"
+                }
+
             # Store in DB
-            await compliance_collection.insert_one({
+            await RESULT_WRITER.write(compliance_collection, {
                 "user_id": user_id,
                 "timestamp": datetime.utcnow(),
                 "claim_text": result["claim"],
                 "compliant": result["classification"].lower() == "compliant",
                 "reasoning": result["reasoning"],
-                "matched_policies": result["matched_policies"]
+                "matched_policies": result["matched_policies"],
+                "rule_ids": result["rule_ids"],
+                "decided_by": result["decided_by"],
+                "policy_version": policy_version
             })
 
             results.append(result)
 
-        return {"results": results}
+        return {"results": results, "policy_version": policy_version}
 
     except Exception as e:
         import traceback
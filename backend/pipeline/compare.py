@@ -0,0 +1,146 @@
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Dict, List, Tuple
+
+from pipeline.summarize import PROMPTS, build_summary_prompt, generate_with_gemini, store_summary
+from utils.metrics import count_event, register_queue
+
+# === Multi-report summarization and comparison ===
+# Every document of a /summarize/compare request is summarized concurrently and
+# streamed back as soon as it finishes; one synthesis step then compares the
+# summaries. Extraction/retrieval runs on worker threads and Gemini calls are
+# awaited, each under a process-wide semaphore, so several comparison requests
+# share the same limits instead of multiplying them.
+COMPARE_MAX_DOCUMENTS = int(os.getenv("COMPARE_MAX_DOCUMENTS", "8"))
+COMPARE_PREP_CONCURRENCY = int(os.getenv("COMPARE_PREP_CONCURRENCY", "2"))
+COMPARE_LLM_CONCURRENCY = int(os.getenv("COMPARE_LLM_CONCURRENCY", "4"))
+# The synthesis prompt is sent as one request no longer than this, so the
+# instructions and every summary reach the model together; each summary gets an
+# equal share of what the template leaves.
+COMPARE_PROMPT_CHARS = int(os.getenv("COMPARE_PROMPT_CHARS", "12000"))
+
+COMPARISON_PROMPT = '''
+You are a financial analyst comparing the reports of several companies or periods.
+Below are independent summaries, one per report, each headed by its report name.
+
+Write a comparative analysis that:
+- Contrasts revenue, profitability, cash flow and balance sheet strength across the reports
+- Highlights where the reports disagree or move in opposite directions
+- Compares the main risks and strategic priorities
+- Ends with a short ranking or verdict, stating what it is based on
+
+Only use figures that appear in the summaries. Name the report each point comes from.
+
+{context}
+'''
+
+_prep_slots = asyncio.Semaphore(COMPARE_PREP_CONCURRENCY)
+_llm_slots = asyncio.Semaphore(COMPARE_LLM_CONCURRENCY)
+_waiting = {"prep": 0, "llm": 0}
+register_queue("compare_prep", lambda: _waiting["prep"])
+register_queue("compare_llm", lambda: _waiting["llm"])
+
+
+async def _acquire(kind: str, slots: asyncio.Semaphore):
+    _waiting[kind] += 1
+    try:
+        await slots.acquire()
+    finally:
+        _waiting[kind] -= 1
+
+
+async def _generate(prompt_parts: List[str]) -> str:
+    await _acquire("llm", _llm_slots)
+    try:
+        return (await generate_with_gemini(prompt_parts)).strip()
+    finally:
+        _llm_slots.release()
+
+
+async def _summarize_one(index: int, filename: str, data: bytes, summary_type: str, user_id: str) -> Dict:
+    started = time.perf_counter()
+    try:
+        await _acquire("prep", _prep_slots)
+        try:
+            prompt_parts, full_text = await asyncio.to_thread(build_summary_prompt, data, summary_type, False)
+        finally:
+            _prep_slots.release()
+        summary = await _generate(prompt_parts)
+        if not summary:
+            raise ValueError("⚠️ No summary generated.")
+    except Exception as e:
+        count_event("compare", "document_error")
+        return {"event": "document", "index": index, "filename": filename, "error": str(e)}
+
+    if user_id:
+        await store_summary(user_id, "gemini", summary_type, "pdf", full_text[:300], summary)
+    count_event("compare", "document")
+    return {
+        "event": "document",
+        "index": index,
+        "filename": filename,
+        "summary": summary,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def comparison_prompt(results: List[Dict], max_chars: int = COMPARE_PROMPT_CHARS) -> str:
+    headers = [f"### {r['filename']}\n" for r in results]
+    fixed = len(COMPARISON_PROMPT.format(context="")) + sum(map(len, headers)) + 2 * (len(results) - 1)
+    budget = max(0, (max_chars - fixed) // len(results))
+    sections = [header + r["summary"][:budget] for header, r in zip(headers, results)]
+    return COMPARISON_PROMPT.format(context="\n\n".join(sections))
+
+
+async def _compare(results: List[Dict], user_id: str) -> Dict:
+    try:
+        comparison = await _generate([comparison_prompt(results)])
+    except Exception as e:
+        count_event("compare", "comparison_error")
+        return {"event": "comparison", "error": str(e)}
+
+    if user_id and comparison:
+        await store_summary(user_id, "gemini", "comparison", "pdf",
+                            ", ".join(r["filename"] for r in results)[:300], comparison)
+    count_event("compare", "comparison")
+    return {"event": "comparison", "documents": [r["filename"] for r in results], "comparison": comparison}
+
+
+async def stream_comparison(documents: List[Tuple[str, bytes]], summary_type: str = "short",
+                            user_id: str = None) -> AsyncIterator[Dict]:
+    """Yields a `document` record per report in completion order, then `comparison` and `end`."""
+    if summary_type not in PROMPTS:
+        yield {"event": "error", "error": f"Unsupported summary type: {summary_type}"}
+        return
+    if not 2 <= len(documents) <= COMPARE_MAX_DOCUMENTS:
+        yield {"event": "error", "error": f"❌ Provide between 2 and {COMPARE_MAX_DOCUMENTS} PDF files to compare."}
+        return
+
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(_summarize_one(i, name, data, summary_type, user_id))
+             for i, (name, data) in enumerate(documents)]
+    summaries = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if "summary" in result:
+                summaries.append(result)
+            yield result
+    finally:
+        # The client went away: stop summarizing what nobody will read.
+        for task in tasks:
+            task.cancel()
+
+    if len(summaries) >= 2:
+        # Input order, not completion order, so the synthesis does not depend on timing.
+        yield await _compare(sorted(summaries, key=lambda r: r["index"]), user_id)
+    else:
+        yield {"event": "comparison", "error": "⚠️ Fewer than two documents were summarized; nothing to compare."}
+
+    yield {
+        "event": "end",
+        "documents": len(documents),
+        "summarized": len(summaries),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import faiss
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from pipeline.travel import POLICY_FILE
+from pipeline.travel_rules import RuleLimits
+from serving.registry import EMBEDDER
+from utils.metrics import stage, record_cache
+
+# === Shared, persisted travel-policy index ===
+# One embedder and one FAISS index for every compliance pipeline. Embeddings are
+# cached on disk by per-policy content hash, and the built index by whole-file
+# hash, so a restart with unchanged policies embeds nothing and an edit
+# re-embeds only the policies that changed. A changed file is rebuilt on a
+# background thread while requests keep using the current snapshot, and index
+# files older than the new one are removed once it is written. Several workers
+# may share INDEX_DIR, so every write goes through a per-process temp file.
+INDEX_DIR = Path(os.getenv("POLICY_INDEX_DIR", Path(__file__).resolve().parent.parent / "policy_index"))
+RELOAD_CHECK_SECONDS = float(os.getenv("POLICY_RELOAD_CHECK_SECONDS", "5"))
+
+
+def policy_hash(policy: dict) -> str:
+    return hashlib.sha256(f"{policy['category']}\n{policy['policy']}".encode("utf-8")).hexdigest()
+
+
+def _write_atomically(path: Path, write):
+    """Calls write(tmp) on a uniquely named temp file next to path, then moves it into place."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+
+
+class PolicySnapshot:
+    """Immutable view of one policy-file version; swapped in as a whole on reload."""
+
+    def __init__(self, version: str, file_hash: str, policies: List[dict], index, limits: RuleLimits):
+        self.version = version
+        self.file_hash = file_hash
+        self.policies = policies
+        self.index = index
+        self.limits = limits
+
+
+class PolicyIndex:
+    def __init__(self, policy_file: Path = POLICY_FILE, index_dir: Path = INDEX_DIR):
+        self.policy_file = Path(policy_file)
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._vectors: Dict[str, np.ndarray] = self._load_vector_cache()
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        self.reloads = 0
+        self.embedded = 0
+        self._snapshot = self._build()
+
+    # --- persistence ---
+    @property
+    def _vector_cache_path(self) -> Path:
+        return self.index_dir / "policy_vectors.npz"
+
+    def _load_vector_cache(self) -> Dict[str, np.ndarray]:
+        if not self._vector_cache_path.exists():
+            return {}
+        cache = np.load(self._vector_cache_path)
+        return dict(zip(cache["hashes"].tolist(), cache["vectors"]))
+
+    def _save_vector_cache(self):
+        hashes = list(self._vectors)
+        vectors = np.stack([self._vectors[h] for h in hashes])
+
+        def write(tmp):
+            # A file object keeps np.savez from appending ".npz" to the temp name.
+            with open(tmp, "wb") as f:
+                np.savez(f, hashes=np.array(hashes), vectors=vectors)
+
+        _write_atomically(self._vector_cache_path, write)
+
+    # --- build ---
+    def _build(self) -> PolicySnapshot:
+        mtime = self.policy_file.stat().st_mtime
+        raw = self.policy_file.read_bytes()
+        file_hash = hashlib.sha256(raw).hexdigest()
+        data = json.loads(raw.decode("utf-8"))
+        policies = data["policies"]
+        version = f"{data.get('version', 0)}+{file_hash[:12]}"
+        limits = RuleLimits.from_policy(data)
+        # Only a file that parsed counts as seen; a broken edit is retried on the next check.
+        self._mtime = mtime
+
+        index_path = self.index_dir / f"index-{file_hash[:16]}.faiss"
+        if index_path.exists():
+            index = faiss.read_index(str(index_path))
+            if index.ntotal == len(policies):
+                record_cache("policy_index", True)
+                self._remove_stale_indexes(index_path)
+                return PolicySnapshot(version, file_hash, policies, index, limits)
+
+        hashes = [policy_hash(p) for p in policies]
+        missing = [i for i, h in enumerate(hashes) if h not in self._vectors]
+        record_cache("policy_index", False)
+        if missing:
+            vectors = EMBEDDER.encode(
+                [policies[i]["policy"] for i in missing], convert_to_numpy=True, normalize_embeddings=True
+            )
+            for i, vec in zip(missing, vectors):
+                self._vectors[hashes[i]] = vec.astype(np.float32)
+            self.embedded += len(missing)
+            self._save_vector_cache()
+
+        matrix = np.stack([self._vectors[h] for h in hashes]).astype(np.float32)
+        index = faiss.IndexFlatIP(matrix.shape[1])
+        index.add(matrix)
+        _write_atomically(index_path, lambda tmp: faiss.write_index(index, tmp))
+        self._remove_stale_indexes(index_path)
+        print(f"📚 Policy index v{version}: {len(policies)} policies, {len(missing)} re-embedded")
+        return PolicySnapshot(version, file_hash, policies, index, limits)
+
+    def _remove_stale_indexes(self, current: Path):
+        # Another worker may already have written the index of a newer policy file;
+        # only indexes older than ours are stale.
+        try:
+            current_mtime = current.stat().st_mtime
+        except FileNotFoundError:
+            return
+        for path in self.index_dir.glob("index-*.faiss"):
+            if path == current:
+                continue
+            try:
+                if path.stat().st_mtime < current_mtime:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠ Could not remove old policy index {path.name}: {e}")
+
+    # --- hot reload ---
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_SECONDS:
+            return
+        self._last_check = now
+        try:
+            changed = self.policy_file.stat().st_mtime != self._mtime
+        except FileNotFoundError:
+            return
+        # Re-embedding must not block the caller (often the event loop): rebuild on a
+        # thread and keep serving the current snapshot until it is swapped in.
+        if changed and self._lock.acquire(blocking=False):
+            threading.Thread(target=self._reload, name="policy_reload", daemon=True).start()
+
+    def _reload(self):
+        try:
+            snapshot = self._build()
+            if snapshot.file_hash != self._snapshot.file_hash:
+                self._snapshot = snapshot
+                self.reloads += 1
+        except Exception as e:
+            print("⚠ Policy reload failed, keeping previous version:", e)
+        finally:
+            self._lock.release()
+
+    @property
+    def snapshot(self) -> PolicySnapshot:
+        self.maybe_reload()
+        return self._snapshot
+
+    # --- search ---
+    def search_many(self, claims: List[str], k: int = 2) -> Tuple[List[List[dict]], str]:
+        snapshot = self.snapshot
+        if not claims:
+            return [], snapshot.version
+        with stage("embed"):
+            q_emb = EMBEDDER.encode(claims, convert_to_numpy=True, normalize_embeddings=True)
+        with stage("retrieve"):
+            _, idx = snapshot.index.search(q_emb, k)
+        return [[snapshot.policies[i] for i in row if i >= 0] for row in idx], snapshot.version
+
+    def search(self, claim: str, k: int = 2) -> Tuple[List[dict], str]:
+        matches, version = self.search_many([claim], k)
+        return matches[0], version
+
+
+POLICY_INDEX = PolicyIndex()
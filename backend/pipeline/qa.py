@@ -1,26 +1,31 @@
 import os
 import io
+import asyncio
 from PyPDF2 import PdfReader
-from sentence_transformers import SentenceTransformer
+from serving.registry import EMBEDDER
 from dotenv import load_dotenv
 import faiss
 import numpy as np
 import google.generativeai as genai
-from collections import deque
 from sklearn.metrics.pairwise import cosine_similarity
 from datetime import datetime
 from models.db import qa_collection  # ✅ MongoDB
+from db.result_writer import RESULT_WRITER
+from utils.answer_cache import QA_ANSWER_CACHE
+from utils.conversation import create_conversation_store
+from utils.metrics import stage
+from utils.router import ROUTERS
 
 # ---------- Setup ----------
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 # Load models
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+embedding_model = EMBEDDER
 gemini_model = genai.GenerativeModel('gemini-1.5-flash')
 
-# Short-Term Memory
-memory = deque(maxlen=7)
+# Short-Term Memory, per session
+CONVERSATIONS = create_conversation_store()
 
 # ---------- PDF Text Extraction ----------
 def extract_text_from_pdf_bytes(pdf_bytes):
@@ -53,8 +58,9 @@ def create_faiss_index(chunks):
     index.add(np.array(embeddings))
     return index, chunks
 
-def retrieve_relevant_chunks(query, index, chunks, top_k=3, relevance_threshold=0.5):
-    query_embedding = embedding_model.encode([query])
+def retrieve_relevant_chunks(query, index, chunks, top_k=3, relevance_threshold=0.5, query_embedding=None):
+    if query_embedding is None:
+        query_embedding = embedding_model.encode([query])
     D, I = index.search(np.array(query_embedding), top_k)
 
     relevant_chunks = []
@@ -67,13 +73,10 @@ def retrieve_relevant_chunks(query, index, chunks, top_k=3, relevance_threshold=
     return relevant_chunks
 
 # ---------- Gemini Answering ----------
-def ask_question_with_rag(query, index, chunks):
-    retrieved = retrieve_relevant_chunks(query, index, chunks)
+def generate_answer(query, retrieved, memory_context=""):
     context = "\n\n".join(retrieved).strip()
     use_context = len(retrieved) > 0
 
-    memory_context = "\n".join([f"User: {q}\nAI: {a}" for q, a in memory])
-
     prompt = f"""
 You are a helpful and knowledgeable financial assistant AI.
 
@@ -81,64 +84,156 @@ Context from document:
 {context if use_context else "No relevant context found in uploaded documents."}
 
 Previous Conversation:
-{memory_context}
+{memory_context or "None."}
 
 User: {query}
 AI:"""
 
     try:
-        response = gemini_model.generate_content(prompt)
-        answer = response.text.strip()
+        with stage("generate"):
+            response = gemini_model.generate_content(prompt)
+        return response.text.strip()
     except Exception as e:
-        answer = f"[❌ Gemini Error] {str(e)}"
-
-    memory.append((query, answer))
-    return answer, retrieved  # ✅ also return chunks used
+        return f"[❌ Gemini Error] {str(e)}"
+
+def ask_question_with_rag(query, index, chunks, memory_context=""):
+    with stage("retrieve"):
+        retrieved = retrieve_relevant_chunks(query, index, chunks)
+    return generate_answer(query, retrieved, memory_context), retrieved  # ✅ also return chunks used
+
+def answer_with_cache(query, doc, memory_context=""):
+    """Returns (answer, chunks used, cached); reuses an answer to a near-identical question.
+
+    Answers given with conversation history depend on it ("and the year before?"),
+    so those questions neither read nor fill the cache.
+    """
+    index, chunks = doc.payload
+    with stage("embed"):
+        query_embedding = embedding_model.encode([query])
+    with stage("retrieve"):
+        retrieved = retrieve_relevant_chunks(query, index, chunks, query_embedding=query_embedding)
+
+    cacheable = not memory_context
+    cached = QA_ANSWER_CACHE.lookup(doc, query_embedding[0], retrieved) if cacheable else None
+    if cached is not None:
+        return cached, retrieved, True
+
+    answer = generate_answer(query, retrieved, memory_context)
+    if cacheable and not answer.startswith("[❌"):
+        QA_ANSWER_CACHE.store(doc, query_embedding[0], retrieved, answer)
+    return answer, retrieved, False
+
+def index_text(text):
+    with stage("chunk"):
+        chunks = chunk_text(text)
+    with stage("index"):
+        return create_faiss_index(chunks)
 
 # ---------- Final Exported Functions ----------
 
-async def run_qa_gemini(pdf_bytes: bytes, question: str, user_id: str = None) -> str:
+async def answer_in_session(question: str, doc, session_id: str = None):
+    # Without a session id the question is answered statelessly.
+    if not session_id:
+        return answer_with_cache(question, doc)
+    session = await CONVERSATIONS.get(session_id)
+    answer, retrieved, cached = answer_with_cache(question, doc, CONVERSATIONS.render(session))
+    await CONVERSATIONS.append(session, question, answer)
+    return answer, retrieved, cached
+
+def _index_pdf(pdf_bytes: bytes):
+    with stage("extract"):
+        text = extract_text_from_pdf_bytes(io.BytesIO(pdf_bytes))
+    return index_text(text)
+
+async def run_qa_gemini(pdf_bytes: bytes, question: str, user_id: str = None, session_id: str = None) -> dict:
     try:
-        pdf_file_like = io.BytesIO(pdf_bytes)
-        text = extract_text_from_pdf_bytes(pdf_file_like)
-        chunks = chunk_text(text)
-        index, chunk_store = create_faiss_index(chunks)
-
-        answer, context_used = ask_question_with_rag(question, index, chunk_store)
+        doc = QA_ANSWER_CACHE.document("gemini", pdf_bytes, lambda: _index_pdf(pdf_bytes))
+        answer, context_used, cached = await answer_in_session(question, doc, session_id or user_id)
 
         if user_id:
-            await qa_collection.insert_one({
+            await RESULT_WRITER.write(qa_collection, {
                 "user_id": user_id,
                 "timestamp": datetime.utcnow(),
                 "input_type": "pdf",
                 "question": question,
                 "context_used": context_used,
-                "answer": answer
+                "answer": answer,
+                "cached": cached
             })
 
-        return answer
+        return {"answer": answer, "cached": cached}
 
     except Exception as e:
-        return f"[❌ QA Error]: {str(e)}"
+        return {"answer": f"[❌ QA Error]: {str(e)}", "cached": False}
 
-async def run_qa_from_text_gemini(context: str, question: str, user_id: str = None) -> str:
+async def run_qa_from_text_gemini(context: str, question: str, user_id: str = None, session_id: str = None) -> dict:
     try:
-        chunks = chunk_text(context)
-        index, chunk_store = create_faiss_index(chunks)
-
-        answer, context_used = ask_question_with_rag(question, index, chunk_store)
+        doc = QA_ANSWER_CACHE.document("gemini", context, lambda: index_text(context))
+        answer, context_used, cached = await answer_in_session(question, doc, session_id or user_id)
 
         if user_id:
-            await qa_collection.insert_one({
+            await RESULT_WRITER.write(qa_collection, {
                 "user_id": user_id,
                 "timestamp": datetime.utcnow(),
                 "input_type": "text",
                 "question": question,
                 "context_used": context_used,
-                "answer": answer
+                "answer": answer,
+                "cached": cached
+            })
+
+        return {"answer": answer, "cached": cached}
+
+    except Exception as e:
+        return {"answer": f"[❌ QA (text) Error]: {str(e)}", "cached": False}
+
+# ---------- Routed QA (model="auto") ----------
+def _gemini_answer_valid(result) -> bool:
+    return result is not None and not result[0].startswith("[❌")
+
+def _t5_answer_valid(result) -> bool:
+    # ask_t5_with_context reports failures as "❌ Error generating answer: ..."
+    return result is not None and bool(result[0].strip()) and not result[0].startswith("❌")
+
+async def run_qa_routed(question: str, pdf_bytes: bytes = None, context: str = None,
+                        user_id: str = None, session_id: str = None) -> dict:
+    """Gemini RAG, hedged with local T5-small when Gemini runs slower than usual."""
+    from pipeline.t5small import answer_from_text
+
+    try:
+        if pdf_bytes is not None:
+            with stage("extract"):
+                context = await asyncio.to_thread(extract_text_from_pdf_bytes, io.BytesIO(pdf_bytes))
+        session_key = session_id or user_id
+        session = await CONVERSATIONS.get(session_key) if session_key else None
+
+        async def from_gemini():
+            chunks = chunk_text(context)
+            index, chunk_store = await asyncio.to_thread(create_faiss_index, chunks)
+            history = CONVERSATIONS.render(session) if session else ""
+            return await asyncio.to_thread(ask_question_with_rag, question, index, chunk_store, history)
+
+        result, routing = await ROUTERS["qa"].run(
+            from_gemini, lambda: asyncio.to_thread(answer_from_text, context, question),
+            valid=_gemini_answer_valid, fallback_valid=_t5_answer_valid
+        )
+        answer, context_used = result or ("[❌ QA Error]: no model produced an answer", [])
+        if session is not None:
+            await CONVERSATIONS.append(session, question, answer)
+
+        if user_id:
+            await RESULT_WRITER.write(qa_collection, {
+                "user_id": user_id,
+                "timestamp": datetime.utcnow(),
+                "input_type": "pdf" if pdf_bytes is not None else "text",
+                "model": routing["winner"],
+                "question": question,
+                "context_used": context_used,
+                "answer": answer,
+                "routing": routing
             })
 
-        return answer
+        return {"answer": answer, "model_used": routing["winner"], "routing": routing}
 
     except Exception as e:
-        return f"[❌ QA (text) Error]: {str(e)}"
+        return {"answer": f"[❌ QA Error]: {str(e)}", "model_used": None}
@@ -1,16 +1,21 @@
 #summarize.py
+import io
 import os
 import re
 import faiss
 import numpy as np
 import PyPDF2
 import time
-from sentence_transformers import SentenceTransformer
+from serving.registry import EMBEDDER
 import google.generativeai as genai
 from dotenv import load_dotenv
 from pathlib import Path
 from models.db import summarization_collection
+from db.result_writer import RESULT_WRITER
 from datetime import datetime
+from utils.metrics import stage
+from utils.sections import SUMMARY_SECTIONS, locate_sections, pages_for
+from utils.financial_tables import financial_figures, is_table_debris
 # === Load API Key ===
 backend_dir = Path(__file__).resolve().parent.parent
 env_path = backend_dir / ".env"
@@ -23,7 +28,7 @@ if not api_key:
 genai.configure(api_key=api_key)
 
 # === Models ===
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+embedding_model = EMBEDDER
 gemini_model = genai.GenerativeModel("gemini-1.5-flash")
 
 # === Text cleaning ===
@@ -32,10 +37,10 @@ def clean_text(text):
     return text.strip()
 
 # === PDF extraction ===
-def extract_text_from_pdf(pdf_path):
-    reader = PyPDF2.PdfReader(pdf_path)
+def extract_text_from_pdf(pdf_path, pages=None):
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_path) if isinstance(pdf_path, bytes) else pdf_path)
     all_text = ""
-    for page in reader.pages:
+    for page in (reader.pages if pages is None else (reader.pages[i] for i in pages)):
         page_text = page.extract_text()
         if page_text:
             all_text += page_text
@@ -132,6 +137,8 @@ You are a professional finance analyst. Write a precise, structured summary focu
 - Mentioning missing or unavailable data
 - Overly technical jargon
 
+When a "Structured figures" table is included, take numbers, growth rates and margins from it exactly as given; they were computed from the financial statements.
+
 Present the information in clear, concise paragraphs using plain English. The summary should give a reader a strong understanding of the company's financial health based only on the extracted content.
 
 Extracted Financial Content:
@@ -160,32 +167,68 @@ def split_prompt(text, max_len=12000):
     return [text[i:i + max_len] for i in range(0, len(text), max_len)]
 
 # === Summarization logic ===
-async def generate_summary(input_data, summary_type="detailed", model="gemini", is_text=False,user_id: str=None):
-    if is_text:
-        full_text = clean_text(input_data)
-    else:
-        full_text = extract_text_from_pdf(input_data)
-
-    chunks = split_into_chunks(full_text)
+def build_summary_prompt(input_data, summary_type="detailed", is_text=False):
+    """Extraction and retrieval for one document; returns (prompt parts, extracted text).
+
+    `input_data` is raw text, a PDF path or PDF bytes. Synchronous, so callers
+    processing several documents can run it on worker threads.
+    """
+    pages, sections = None, {}
+    if not is_text and summary_type in SUMMARY_SECTIONS:
+        # Targeted summaries only read the pages of their sections.
+        with stage("locate"):
+            sections = locate_sections(input_data)
+        pages = pages_for(sections, SUMMARY_SECTIONS[summary_type])
+
+    figures = ""
+    if not is_text and summary_type == "financial_only":
+        with stage("tables"):
+            try:
+                figures = financial_figures(input_data, pages_for(sections, ("financial_statements",)))
+            except Exception as e:
+                print("⚠ Table extraction failed, using text only:", e)
+
+    with stage("extract"):
+        if is_text:
+            full_text = clean_text(input_data)
+        else:
+            try:
+                full_text = extract_text_from_pdf(input_data, pages)
+            except ValueError:
+                if pages is None:
+                    raise
+                full_text = extract_text_from_pdf(input_data)
+
+    with stage("chunk"):
+        chunks = split_into_chunks(full_text)
     if not chunks:
         raise ValueError("⚠️ No usable chunks found.")
 
-    index, _ = build_faiss_index(chunks)
+    with stage("index"):
+        index, _ = build_faiss_index(chunks)
 
     query_text = QUERY_MAP.get(summary_type, "company summary")
-    query_embedding = embedding_model.encode([query_text])
+    with stage("embed"):
+        query_embedding = embedding_model.encode([query_text])
 
     k_value = 60 if summary_type == "detailed" else 5
-    D, I = index.search(np.array(query_embedding), k=k_value)
-    selected_chunks = [chunks[i] for i in I[0]]
-    context = "\n\n".join(selected_chunks)
+    with stage("retrieve"):
+        D, I = index.search(np.array(query_embedding), k=k_value)
+    selected_chunks = [chunks[i] for i in I[0] if i >= 0]
+    if figures:
+        # The parsed figures replace the flattened table text.
+        narrative = [c for c in selected_chunks if not is_table_debris(c)]
+        context = figures + "\n\nNarrative excerpts:\n" + "\n\n".join(narrative)
+    else:
+        context = "\n\n".join(selected_chunks)
 
     prompt_template = PROMPTS.get(summary_type, PROMPTS["detailed"])
     final_prompt = prompt_template.format(context=context)
-    prompt_parts = split_prompt(final_prompt)
+    return split_prompt(final_prompt), full_text
 
+async def generate_with_gemini(prompt_parts) -> str:
     result = ""
-    if model == "gemini":
+    with stage("generate"):
         for part in prompt_parts:
             response = await gemini_model.generate_content_async(
                 part,
@@ -193,6 +236,25 @@ async def generate_summary(input_data, summary_type="detailed", model="gemini",
             )
             if response.text:
                 result += response.text.strip() + "\n\n"
+    return result
+
+async def store_summary(user_id: str, model: str, summary_type: str, input_type: str, input_excerpt: str, summary: str):
+    await RESULT_WRITER.write(summarization_collection, {
+        "user_id": user_id,
+        "model": model,
+        "summary_type": summary_type,
+        "input_type": input_type,
+        "input_excerpt": input_excerpt,
+        "timestamp": datetime.utcnow(),
+        "summary": summary
+    })
+
+async def generate_summary(input_data, summary_type="detailed", model="gemini", is_text=False,user_id: str=None):
+    prompt_parts, full_text = build_summary_prompt(input_data, summary_type, is_text)
+
+    result = ""
+    if model == "gemini":
+        result = await generate_with_gemini(prompt_parts)
 
     elif model == "t5":
         result = "T5 summary logic not implemented yet."
@@ -202,22 +264,13 @@ async def generate_summary(input_data, summary_type="detailed", model="gemini",
 
     if not result.strip():
         return "⚠️ No summary generated."
-    print("📦 Saving summary for user:", user_id)
 
     # ✅ Store in MongoDB if user_id is provided
     if user_id:
         input_type = "text" if is_text else "pdf"
         input_excerpt = input_data[:300] if is_text else full_text[:300]
 
-        await summarization_collection.insert_one({
-            "user_id": user_id,
-            "model": model,
-            "summary_type": summary_type,
-            "input_type": input_type,
-            "input_excerpt": input_excerpt,
-            "timestamp": datetime.utcnow(),
-            "summary": result.strip()
-        })
+        await store_summary(user_id, model, summary_type, input_type, input_excerpt, result.strip())
 
     return result.strip()
 
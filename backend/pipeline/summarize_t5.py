@@ -4,22 +4,28 @@ import numpy as np
 import faiss
 from typing import List
 from transformers import T5Tokenizer, T5ForConditionalGeneration
-from sentence_transformers import SentenceTransformer
 import PyPDF2
 from models.db import summarization_collection
+from db.result_writer import RESULT_WRITER
 from datetime import datetime
+from utils.metrics import stage
+from utils.sections import locate_sections, pages_for
+from serving import registry
+from serving.registry import EMBEDDER
 # === Load models ===
+# The tokenizer is small and used for chunking everywhere; the model loads on first use.
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 tokenizer = T5Tokenizer.from_pretrained("t5-base")
-model = T5ForConditionalGeneration.from_pretrained("t5-base").to(device)
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+embedding_model = EMBEDDER
+
+registry.register("t5_base", lambda: T5ForConditionalGeneration.from_pretrained("t5-base").to(device))
 
 # === Step 1: Extract text from PDF ===
-def extract_text_from_pdf(pdf_path: str) -> str:
+def extract_text_from_pdf(pdf_path: str, pages: List[int] = None) -> str:
     text = ""
     with open(pdf_path, "rb") as file:
         reader = PyPDF2.PdfReader(file)
-        for page in reader.pages:
+        for page in (reader.pages if pages is None else (reader.pages[i] for i in pages)):
             extracted = page.extract_text()
             if extracted:
                 text += extracted + "\n"
@@ -54,45 +60,81 @@ def retrieve_relevant_chunks(query: str, chunks: List[str], index, embeddings, t
     return [chunks[i] for i in I[0]]
 
 # === Step 5: Section-wise summarization using T5 ===
+# Each query with the report sections that answer it; PDFs only embed those pages.
+SECTION_QUERIES = [
+    ("summarize the cash flow and capital expenditures information", ("financial_statements", "mdna")),
+    ("summarize internal controls over financial reporting", ("controls",)),
+    ("summarize income tax and foreign tax liabilities", ("financial_statements",)),
+    ("summarize the consolidated financial statements and auditor report", ("financial_statements", "auditor_report")),
+]
+
+@registry.served("t5_base_summarize", pool="t5")
+def generate_section_summary(prompt: str) -> str:
+    model = registry.get("t5_base")
+    inputs = tokenizer(prompt, return_tensors="pt", truncation=True, padding="longest", max_length=512).to(device)
+    summary_ids = model.generate(inputs["input_ids"], max_length=512, num_beams=4, length_penalty=2.0, early_stopping=True)
+    return tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+
+def summarize_query(query: str, chunks: List[str], index, embeddings) -> str:
+    with stage("retrieve"):
+        relevant_chunks = retrieve_relevant_chunks(query, chunks, index, embeddings, top_k=15)
+    sub_summaries = []
+    for i in range(0, len(relevant_chunks), 5):
+        group = " ".join(relevant_chunks[i:i+5])
+        prompt = query + ": " + group.replace("\n", " ")
+        with stage("generate"):
+            sub_summary = generate_section_summary(prompt)
+        sub_summaries.append(sub_summary)
+    return f"### {query.capitalize()}\n" + "\n".join(sub_summaries) + "\n\n"
+
 def structured_summary_with_sections(chunks: List[str], queries: List[str]) -> str:
-    index, embeddings = build_faiss_index(chunks)
+    with stage("index"):
+        index, embeddings = build_faiss_index(chunks)
     full_summary = ""
 
     for query in queries:
-        relevant_chunks = retrieve_relevant_chunks(query, chunks, index, embeddings, top_k=15)
-        sub_summaries = []
-        for i in range(0, len(relevant_chunks), 5):
-            group = " ".join(relevant_chunks[i:i+5])
-            prompt = query + ": " + group.replace("\n", " ")
-            inputs = tokenizer(prompt, return_tensors="pt", truncation=True, padding="longest", max_length=512).to(device)
-            summary_ids = model.generate(inputs["input_ids"], max_length=512, num_beams=4, length_penalty=2.0, early_stopping=True)
-            sub_summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-            sub_summaries.append(sub_summary)
-        full_summary += f"### {query.capitalize()}\n" + "\n".join(sub_summaries) + "\n\n"
+        full_summary += summarize_query(query, chunks, index, embeddings)
 
     return full_summary
 
-# === Main pipeline function ===
-async def summarize_pdf_sectionwise(pdf_path: str, user_id: str = None, model: str = "t5") -> str:
-    full_text = extract_text_from_pdf(pdf_path)
-    chunks = split_text(full_text)
+def structured_summary_from_pdf(pdf_path: str):
+    """Summarizes each section query from its own pages; returns (summary, excerpt)."""
+    with stage("locate"):
+        sections = locate_sections(pdf_path)
 
-    queries = [
-        "summarize the cash flow and capital expenditures information",
-        "summarize internal controls over financial reporting",
-        "summarize income tax and foreign tax liabilities",
-        "summarize the consolidated financial statements and auditor report"
-    ]
+    # Queries sharing the same pages share one index; unlocated sections use the whole report.
+    corpora = {}
+    full_summary = ""
+    for query, wanted in SECTION_QUERIES:
+        pages = pages_for(sections, wanted)
+        key = tuple(pages) if pages else None
+        if key not in corpora:
+            with stage("extract"):
+                text = extract_text_from_pdf(pdf_path, pages)
+                if pages is not None and not text.strip():
+                    text = extract_text_from_pdf(pdf_path)
+            with stage("chunk"):
+                chunks = split_text(text)
+            with stage("index"):
+                index, embeddings = build_faiss_index(chunks)
+            corpora[key] = (text, chunks, index, embeddings)
+        _, chunks, index, embeddings = corpora[key]
+        full_summary += summarize_query(query, chunks, index, embeddings)
+
+    excerpt = next(iter(corpora.values()))[0][:300]
+    return full_summary, excerpt
 
-    summary = structured_summary_with_sections(chunks, queries)
+# === Main pipeline function ===
+async def summarize_pdf_sectionwise(pdf_path: str, user_id: str = None, model: str = "t5") -> str:
+    summary, excerpt = structured_summary_from_pdf(pdf_path)
 
     # ✅ Store in MongoDB
     if user_id:
-        await summarization_collection.insert_one({
+        await RESULT_WRITER.write(summarization_collection, {
             "user_id": user_id,
             "model": model,
             "input_type": "pdf",
-            "input_excerpt": full_text[:300],
+            "input_excerpt": excerpt,
             "timestamp": datetime.utcnow(),
             "summary": summary
         })
@@ -100,24 +142,14 @@ async def summarize_pdf_sectionwise(pdf_path: str, user_id: str = None, model: s
     return summary
 
 async def summarize_text_sectionwise(text: str, user_id: str = None, model: str = "t5") -> str:
-    print("🧩 Splitting input text into chunks...")
-    chunks = split_text(text)
-
-    print("📚 Running RAG + T5 summarization for multiple sections...")
-
-    queries = [
-        "summarize the cash flow and capital expenditures information",
-        "summarize internal controls over financial reporting",
-        "summarize income tax and foreign tax liabilities",
-        "summarize the consolidated financial statements and auditor report"
-    ]
+    with stage("chunk"):
+        chunks = split_text(text)
 
-    summary = structured_summary_with_sections(chunks, queries)
-    print("📦 Saving summary for user:", user_id)
+    summary = structured_summary_with_sections(chunks, [query for query, _ in SECTION_QUERIES])
 
     # ✅ Store in MongoDB
     if user_id:
-        await summarization_collection.insert_one({
+        await RESULT_WRITER.write(summarization_collection, {
             "user_id": user_id,
             "model": model,
             "input_type": "text",
@@ -3,23 +3,31 @@ from io import BytesIO
 from pathlib import Path
 from dotenv import load_dotenv
 from PyPDF2 import PdfReader
-from sentence_transformers import SentenceTransformer
 from transformers import T5ForConditionalGeneration, T5Tokenizer
 import torch
 import faiss
 from datetime import datetime
 from models.db import qa_collection  # ✅ your friend's style
+from db.result_writer import RESULT_WRITER
+from utils.answer_cache import QA_ANSWER_CACHE
+from utils.metrics import stage
+from serving import registry
+from serving.registry import EMBEDDER
 
 # ─── Load .env ───
 env_path = Path(__file__).resolve().parents[1] / ".env"
 load_dotenv(dotenv_path=env_path)
 
-# ─── Load Fine-Tuned T5 QA Model ───
-model = T5ForConditionalGeneration.from_pretrained("valhalla/t5-small-qa-qg-hl")
-tokenizer = T5Tokenizer.from_pretrained("valhalla/t5-small-qa-qg-hl")
+# ─── Fine-Tuned T5 QA Model (loaded on first use) ───
+def _load_t5_small():
+    model = T5ForConditionalGeneration.from_pretrained("valhalla/t5-small-qa-qg-hl")
+    tokenizer = T5Tokenizer.from_pretrained("valhalla/t5-small-qa-qg-hl")
+    return tokenizer, model
+
+registry.register("t5_small", _load_t5_small)
 
 # ─── Sentence Embedding Model ───
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+embedder = EMBEDDER
 
 # ─── PDF Text Extraction ───
 def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
@@ -42,14 +50,17 @@ def create_faiss_index(chunks):
     index.add(vectors)
     return {"index": index, "chunks": chunks, "vectors": vectors}
 
-def retrieve_top_chunks(question: str, db, top_k=3):
-    q_vec = embedder.encode([question])
+def retrieve_top_chunks(question: str, db, top_k=3, q_vec=None):
+    if q_vec is None:
+        q_vec = embedder.encode([question])
     _, I = db["index"].search(q_vec, top_k)
     return "\n".join([db["chunks"][i] for i in I[0]])
 
 # ─── T5 Answer Generation ───
+@registry.served("t5_small_qa", pool="t5")
 def ask_t5_with_context(question: str, context: str) -> str:
     try:
+        tokenizer, model = registry.get("t5_small")
         prompt = f"question: {question} context: {context}"
         inputs = tokenizer(prompt, return_tensors="pt", truncation=True)
         outputs = model.generate(inputs["input_ids"], max_length=256)
@@ -57,49 +68,83 @@ def ask_t5_with_context(question: str, context: str) -> str:
     except Exception as e:
         return f"❌ Error generating answer: {str(e)}"
 
-# ─── From PDF ───
-async def run_qa_pdf_t5(pdf_bytes: bytes, question: str, user_id: str = None) -> str:
-    try:
-        text = extract_text_from_pdf_bytes(pdf_bytes)
+def index_text(text: str):
+    with stage("chunk"):
         chunks = chunk_text(text)
-        db = create_faiss_index(chunks)
+    with stage("index"):
+        return create_faiss_index(chunks)
+
+def answer_from_text(text: str, question: str):
+    """Chunk, index, retrieve and answer; returns (answer, context used)."""
+    db = index_text(text)
+    with stage("retrieve"):
         top_chunks = retrieve_top_chunks(question, db)
+    with stage("generate"):
+        answer = ask_t5_with_context(question, top_chunks)
+    return answer, top_chunks
+
+def answer_with_cache(question: str, doc):
+    """Returns (answer, context used, cached); reuses an answer to a near-identical question."""
+    with stage("embed"):
+        q_vec = embedder.encode([question])
+    with stage("retrieve"):
+        top_chunks = retrieve_top_chunks(question, doc.payload, q_vec=q_vec)
+
+    cached = QA_ANSWER_CACHE.lookup(doc, q_vec[0], top_chunks)
+    if cached is not None:
+        return cached, top_chunks, True
+
+    with stage("generate"):
         answer = ask_t5_with_context(question, top_chunks)
+    if not answer.startswith("❌"):
+        QA_ANSWER_CACHE.store(doc, q_vec[0], top_chunks, answer)
+    return answer, top_chunks, False
+
+def _index_pdf(pdf_bytes: bytes):
+    with stage("extract"):
+        text = extract_text_from_pdf_bytes(pdf_bytes)
+    return index_text(text)
+
+# ─── From PDF ───
+async def run_qa_pdf_t5(pdf_bytes: bytes, question: str, user_id: str = None) -> dict:
+    try:
+        doc = QA_ANSWER_CACHE.document("t5_small", pdf_bytes, lambda: _index_pdf(pdf_bytes))
+        answer, top_chunks, cached = answer_with_cache(question, doc)
 
         # ─── MongoDB Logging ───
         if user_id:
-            await qa_collection.insert_one({
+            await RESULT_WRITER.write(qa_collection, {
                 "user_id": user_id,
                 "timestamp": datetime.utcnow(),
                 "input_type": "pdf",
                 "question": question,
                 "context_used": top_chunks,
-                "answer": answer
+                "answer": answer,
+                "cached": cached
             })
 
-        return answer
+        return {"answer": answer, "cached": cached}
     except Exception as e:
-        return f"❌ Error during Q&A (PDF): {str(e)}"
+        return {"answer": f"❌ Error during Q&A (PDF): {str(e)}", "cached": False}
 
 # ─── From Raw Text ───
-async def run_qa_text_t5(text: str, question: str, user_id: str = None) -> str:
+async def run_qa_text_t5(text: str, question: str, user_id: str = None) -> dict:
     try:
-        chunks = chunk_text(text)
-        db = create_faiss_index(chunks)
-        top_chunks = retrieve_top_chunks(question, db)
-        answer = ask_t5_with_context(question, top_chunks)
+        doc = QA_ANSWER_CACHE.document("t5_small", text, lambda: index_text(text))
+        answer, top_chunks, cached = answer_with_cache(question, doc)
 
         # ─── MongoDB Logging ───
         if user_id:
-            await qa_collection.insert_one({
+            await RESULT_WRITER.write(qa_collection, {
                 "user_id": user_id,
                 "timestamp": datetime.utcnow(),
                 "input_type": "text",
                 "question": question,
                 "context_used": top_chunks,
-                "answer": answer
+                "answer": answer,
+                "cached": cached
             })
 
-        return answer
+        return {"answer": answer, "cached": cached}
     except Exception as e:
-        return f"❌ Error during Q&A (Text): {str(e)}"
\ No newline at end of file
+        return {"answer": f"❌ Error during Q&A (Text): {str(e)}", "cached": False}
@@ -0,0 +1,346 @@
+import re
+import numpy as np
+from typing import Dict, List, Optional
+
+from pipeline.travel import detect_city, load_policy_file
+from utils.metrics import stage
+
+# === Deterministic travel-policy rules ===
+# Claims whose outcome follows mechanically from the numeric limits in the
+# policy file are settled here; everything else returns None and is escalated to
+# the LLM compliance check.
+
+GRADES = ["Management Executive", "Executive/Faculty", "Non-Executive"]
+TIERS = ["Tier 1", "Tier 2", "Tier 3"]
+CATEGORIES = ["Air Travel", "Accommodation", "Meals", "Rail Travel", "Transportation", "Other"]
+
+
+
+class RuleLimits:
+    """The numeric limits of one policy-file version, shaped for the rules."""
+
+    def __init__(self, hotel_caps: np.ndarray, meal_caps: np.ndarray, min_days_in_advance: int):
+        self.hotel_caps = hotel_caps  # per night, rows = GRADES, cols = TIERS
+        self.meal_caps = meal_caps  # per day, per TIERS
+        self.min_days_in_advance = min_days_in_advance
+
+    @classmethod
+    def from_policy(cls, data: dict) -> "RuleLimits":
+        limits = data["limits"]
+        hotel = [[limits["hotel_caps"][grade][tier] for tier in TIERS] for grade in GRADES]
+        meal = [limits["meal_caps"][tier] for tier in TIERS]
+        return cls(np.array(hotel, dtype=float), np.array(meal, dtype=float), int(limits["min_days_in_advance"]))
+
+    @property
+    def terms(self) -> Dict[str, str]:
+        """Values the rule descriptions are formatted with."""
+        meals = " / ".join(f"₹{cap:g} ({tier})" for cap, tier in zip(self.meal_caps, TIERS))
+        return {"meal_caps": meals, "min_days_in_advance": str(self.min_days_in_advance)}
+
+
+_file_limits = None
+
+def file_limits() -> RuleLimits:
+    """Limits of the policy file as first read; callers serving requests pass the live snapshot's."""
+    global _file_limits
+    if _file_limits is None:
+        _file_limits = RuleLimits.from_policy(load_policy_file())
+    return _file_limits
+
+# Categories whose policy is fully expressed by the rules below; a claim there is
+# Compliant only if every rule that applies could be checked and passed. Anything a
+# rule cannot settle (a missing field, an unrecognised booking method, an exception
+# backed by a justification) goes to the LLM.
+DECIDABLE = {"Air Travel", "Accommodation", "Meals"}
+
+# === Claim parsing ===
+FIELD_ALIASES = {
+    "employee_grade": "employee_grade", "grade": "employee_grade",
+    "city": "city", "destination": "city",
+    "city_tier": "city_tier", "tier": "city_tier",
+    "expense_type": "category", "category": "category", "type": "category",
+    "amount": "amount", "claim_amount": "amount", "total": "amount",
+    "days_in_advance": "days_in_advance",
+    "receipt_attached": "receipt_attached", "receipt": "receipt_attached",
+    "approval_status": "approval_status", "approved": "approval_status",
+    "mode_of_transport": "mode_of_transport", "class": "mode_of_transport",
+    "booking_method": "booking_method",
+    "justification_text": "justification_text", "justification": "justification_text",
+    "nights": "nights", "travel_duration_days": "days", "days": "days",
+}
+FIELD_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted(FIELD_ALIASES, key=len, reverse=True)) + r")\s*[:=]\s*([^,;\n]+)",
+    re.IGNORECASE,
+)
+# Thousands separators (5,000 / 1,00,000) are part of the number, so amounts are read
+# before FIELD_PATTERN splits values on commas.
+_AMOUNT_VALUE = r"(\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+AMOUNT_PATTERN = re.compile(r"(?:₹|rs\.?|inr)\s*" + _AMOUNT_VALUE, re.IGNORECASE)
+AMOUNT_FIELD_PATTERN = re.compile(
+    r"\b(?:amount|claim_amount|total)\s*[:=]\s*(?:₹|rs\.?|inr)?\s*" + _AMOUNT_VALUE, re.IGNORECASE
+)
+NUMBER_PATTERN = re.compile(r"[\d,]*\.?\d+")
+TRUE_WORDS = {"true", "yes", "y", "1", "attached", "approved"}
+FALSE_WORDS = {"false", "no", "n", "0", "missing", "not attached", "pending", "rejected"}
+
+CATEGORY_KEYWORDS = [
+    ("Air Travel", re.compile(r"\b(air|flight|airfare|airline)\b", re.IGNORECASE)),
+    ("Accommodation", re.compile(r"\b(hotel|accommodation|lodging)\b", re.IGNORECASE)),
+    ("Meals", re.compile(r"\b(meal|meals|food|lunch|dinner|breakfast)\b", re.IGNORECASE)),
+    ("Rail Travel", re.compile(r"\b(rail|train)\b", re.IGNORECASE)),
+    ("Transportation", re.compile(r"\b(taxi|cab|auto|car rental)\b", re.IGNORECASE)),
+]
+PREMIUM_CLASS = re.compile(r"\b(business|first)\s*class\b", re.IGNORECASE)
+APPROVED_BOOKING = re.compile(
+    r"\b(corporate|company)\s+(portal|travel\s+desk)|\bapproved\s+(travel\s+)?(agent|agency|platform|portal|vendor)"
+    r"|\btravel\s+desk\b|\baccounts\s+department\b",
+    re.IGNORECASE,
+)
+UNAPPROVED_BOOKING = re.compile(
+    r"\b(cash|counter|walk[\s-]?in|self[\s-]?booked|personal|direct(ly)?|own|unapproved|third[\s-]?party)\b",
+    re.IGNORECASE,
+)
+FINE_DINING = re.compile(r"\b(fine[\s-]?dining|banquet|five[\s-]?star\s+restaurant)\b", re.IGNORECASE)
+NON_REIMBURSABLE = re.compile(
+    r"\b(personal entertainment|in-flight purchases?|hotel tips?|club memberships?)\b",
+    re.IGNORECASE,
+)
+
+def _to_bool(value: str) -> Optional[bool]:
+    value = value.strip().lower()
+    if value in TRUE_WORDS:
+        return True
+    if value in FALSE_WORDS:
+        return False
+    return None
+
+def _to_number(value: str) -> Optional[float]:
+    match = NUMBER_PATTERN.search(value)
+    return float(match.group().replace(",", "")) if match else None
+
+def _to_booking(value: str) -> Optional[bool]:
+    if APPROVED_BOOKING.search(value):
+        return True
+    if UNAPPROVED_BOOKING.search(value):
+        return False
+    return None
+
+def _to_grade(value: str) -> Optional[str]:
+    value = value.lower()
+    if "non" in value:
+        return "Non-Executive"
+    if "management" in value:
+        return "Management Executive"
+    if "executive" in value or "faculty" in value:
+        return "Executive/Faculty"
+    return None
+
+def _to_category(value: str) -> Optional[str]:
+    for category, pattern in CATEGORY_KEYWORDS:
+        if pattern.search(value):
+            return category
+    return None
+
+def parse_claim(text: str) -> Dict:
+    """Extracts the structured fields the rules need; missing fields stay None."""
+    fields = {}
+    for key, value in FIELD_PATTERN.findall(text):
+        fields.setdefault(FIELD_ALIASES[key.lower()], value.strip())
+
+    claim = {
+        "employee_grade": _to_grade(fields["employee_grade"]) if "employee_grade" in fields else None,
+        "city_tier": None,
+        "category": _to_category(fields.get("category", "")) or _to_category(text) or "Other",
+        "amount": None,
+        "days_in_advance": _to_number(fields["days_in_advance"]) if "days_in_advance" in fields else None,
+        "nights": _to_number(fields["nights"]) if "nights" in fields else None,
+        "days": _to_number(fields["days"]) if "days" in fields else None,
+        "receipt_attached": _to_bool(fields["receipt_attached"]) if "receipt_attached" in fields else None,
+        "approval_status": _to_bool(fields["approval_status"]) if "approval_status" in fields else None,
+        "approved_booking": _to_booking(fields["booking_method"]) if "booking_method" in fields else None,
+        "justified": bool(fields.get("justification_text", "").strip(" \"'")),
+        "fine_dining": bool(FINE_DINING.search(text)),
+        "premium_class": bool(PREMIUM_CLASS.search(fields.get("mode_of_transport", "") or text)),
+        "non_reimbursable": bool(NON_REIMBURSABLE.search(text)),
+    }
+
+    match = AMOUNT_FIELD_PATTERN.search(text) or AMOUNT_PATTERN.search(text)
+    if match:
+        claim["amount"] = float(match.group(1).replace(",", ""))
+
+    tier = fields.get("city_tier", "")
+    tier_match = re.search(r"[123]", tier)
+    if tier_match:
+        claim["city_tier"] = f"Tier {tier_match.group()}"
+    else:
+        detected = detect_city(fields.get("city", "") or text)
+        claim["city_tier"] = detected[1] if detected else None
+    return claim
+
+# === Columnar view ===
+def _columns(claims: List[Dict]) -> Dict[str, np.ndarray]:
+    def index_of(values, key):
+        return np.array([values.index(c[key]) if c[key] in values else -1 for c in claims], dtype=int)
+
+    def floats(key):
+        return np.array([np.nan if c[key] is None else c[key] for c in claims], dtype=float)
+
+    def tristate(key):
+        return np.array([-1 if c[key] is None else int(c[key]) for c in claims], dtype=int)
+
+    return {
+        "grade": index_of(GRADES, "employee_grade"),
+        "tier": index_of(TIERS, "city_tier"),
+        "category": index_of(CATEGORIES, "category"),
+        "amount": floats("amount"),
+        "days_in_advance": floats("days_in_advance"),
+        "nights": floats("nights"),
+        "days": floats("days"),
+        "receipt": tristate("receipt_attached"),
+        "approval": tristate("approval_status"),
+        "booking": tristate("approved_booking"),
+        "justified": np.array([c["justified"] for c in claims], dtype=bool),
+        "fine_dining": np.array([c["fine_dining"] for c in claims], dtype=bool),
+        "premium_class": np.array([c["premium_class"] for c in claims], dtype=bool),
+        "non_reimbursable": np.array([c["non_reimbursable"] for c in claims], dtype=bool),
+    }
+
+def _is(col, category):
+    return col["category"] == CATEGORIES.index(category)
+
+def _capped(col, applies, caps, units):
+    # amount ≤ cap is a pass even for one unit; over the cap needs a known unit count.
+    amount = col["amount"]
+    known_cap = caps >= 0
+    per_unit = np.where(np.isnan(units), amount, amount / np.maximum(units, 1))
+    ok = per_unit <= caps
+    known = applies & known_cap & ~np.isnan(amount) & (ok | ~np.isnan(units))
+    return applies, known, ok
+
+def _unless_approved(col, applies, known, ok):
+    # Over the limit is still fine with pre-approval; unknown approval leaves it open.
+    excused = col["approval"] == 1
+    known = known & (ok | (col["approval"] >= 0))
+    return applies, known, ok | excused
+
+def _hotel_cap(col, limits):
+    applies = _is(col, "Accommodation")
+    valid = (col["grade"] >= 0) & (col["tier"] >= 0)
+    caps = np.where(valid, limits.hotel_caps[np.clip(col["grade"], 0, 2), np.clip(col["tier"], 0, 2)], -1.0)
+    return _capped(col, applies, caps, col["nights"])
+
+def _hotel_booking(col, limits):
+    # Approved platform, or the stay was explicitly approved.
+    applies = _is(col, "Accommodation")
+    ok = (col["booking"] == 1) | (col["approval"] == 1)
+    known = ok | ((col["booking"] == 0) & (col["approval"] == 0))
+    return applies, known, ok
+
+def _meal_cap(col, limits):
+    applies = _is(col, "Meals")
+    caps = np.where(col["tier"] >= 0, limits.meal_caps[np.clip(col["tier"], 0, 2)], -1.0)
+    return _unless_approved(col, *_capped(col, applies, caps, col["days"]))
+
+def _meal_fine_dining(col, limits):
+    applies = _is(col, "Meals") & col["fine_dining"]
+    return applies, col["approval"] >= 0, col["approval"] == 1
+
+def _receipt(col, limits):
+    # A missing receipt is allowed with a justification and prior approval.
+    applies = np.ones(len(col["receipt"]), dtype=bool)
+    ok = (col["receipt"] == 1) | (col["justified"] & (col["approval"] == 1))
+    pending = col["justified"] & (col["approval"] < 0)
+    return applies, ok | ((col["receipt"] == 0) & ~pending), ok
+
+def _air_grade(col, limits):
+    applies = _is(col, "Air Travel")
+    return applies, col["grade"] >= 0, col["grade"] == GRADES.index("Management Executive")
+
+def _air_approval(col, limits):
+    applies = _is(col, "Air Travel")
+    return applies, col["approval"] >= 0, col["approval"] == 1
+
+def _air_advance(col, limits):
+    applies = _is(col, "Air Travel")
+    days = col["days_in_advance"]
+    return applies, ~np.isnan(days), days >= limits.min_days_in_advance
+
+def _air_booking(col, limits):
+    # Unrecognised methods and documented exceptions are left to the LLM.
+    applies = _is(col, "Air Travel")
+    known = (col["booking"] == 1) | ((col["booking"] == 0) & ~col["justified"])
+    return applies, known, col["booking"] == 1
+
+def _air_class(col, limits):
+    applies = _is(col, "Air Travel")
+    return applies, np.ones_like(applies), ~col["premium_class"]
+
+def _non_reimbursable(col, limits):
+    # Only a positive keyword hit is conclusive; absence proves nothing.
+    applies = col["non_reimbursable"]
+    return applies, applies, ~applies
+
+# (rule id, policy category, description, evaluator); descriptions are formatted with RuleLimits.terms
+RULES = [
+    ("RCPT-01", "Receipts and Approvals",
+     "receipts must be attached (receipt_attached: true), or be excused by a justification and prior approval", _receipt),
+    ("NRE-01", "Non-Reimbursable Expenses", "expense type is never reimbursed", _non_reimbursable),
+    ("ACC-01", "Accommodation", "hotel cost per night must be within the grade × city-tier cap", _hotel_cap),
+    ("ACC-02", "Accommodation", "hotels must be booked via approved platforms or explicitly approved", _hotel_booking),
+    ("MEAL-01", "Meals", "daily food allowance is {meal_caps} unless pre-approved", _meal_cap),
+    ("MEAL-02", "Meals", "fine dining requires pre-approval (approval_status: true)", _meal_fine_dining),
+    ("AIR-01", "Air Travel", "air travel is permitted only for Management Executives", _air_grade),
+    ("AIR-02", "Air Travel", "air travel must be pre-approved (approval_status: true)", _air_approval),
+    ("AIR-03", "Air Travel", "flights must be booked at least {min_days_in_advance} days in advance", _air_advance),
+    ("AIR-04", "Air Travel", "Business and First Class are not permitted", _air_class),
+    ("AIR-05", "Booking Process and Approval", "flights must be booked through an approved travel agent or the corporate portal",
+     _air_booking),
+]
+
+def evaluate_claims(claims: List[str], limits: Optional[RuleLimits] = None) -> List[Optional[Dict]]:
+    """Returns a verdict per claim, or None where the rules cannot settle it."""
+    if not claims:
+        return []
+    with stage("rules"):
+        return _evaluate_claims(claims, limits or file_limits())
+
+def _evaluate_claims(claims: List[str], limits: RuleLimits) -> List[Optional[Dict]]:
+    parsed = [parse_claim(c) for c in claims]
+    col = _columns(parsed)
+
+    n = len(claims)
+    violated = np.zeros((len(RULES), n), dtype=bool)
+    passed = np.zeros((len(RULES), n), dtype=bool)
+    unresolved = np.zeros(n, dtype=bool)
+    for r, (_, _, _, evaluate) in enumerate(RULES):
+        applies, known, ok = evaluate(col, limits)
+        violated[r] = applies & known & ~ok
+        passed[r] = applies & known & ok
+        unresolved |= applies & ~known
+
+    decidable = np.isin(col["category"], [CATEGORIES.index(c) for c in DECIDABLE])
+    non_compliant = violated.any(axis=0)
+    compliant = ~non_compliant & ~unresolved & decidable
+
+    terms = limits.terms
+    verdicts: List[Optional[Dict]] = []
+    for i in range(n):
+        if non_compliant[i]:
+            cited = [RULES[r] for r in np.flatnonzero(violated[:, i])]
+            classification = "Non-Compliant"
+            reasoning = "Violates " + "; ".join(f"{rid}: {desc.format(**terms)}" for rid, _, desc, _ in cited) + "."
+        elif compliant[i]:
+            cited = [RULES[r] for r in np.flatnonzero(passed[:, i])]
+            classification = "Compliant"
+            reasoning = "Satisfies " + "; ".join(f"{rid}: {desc.format(**terms)}" for rid, _, desc, _ in cited) + "."
+        else:
+            verdicts.append(None)
+            continue
+        verdicts.append({
+            "classification": classification,
+            "reasoning": reasoning,
+            "rule_ids": [rid for rid, _, _, _ in cited],
+            "matched_policies": list(dict.fromkeys(category for _, category, _, _ in cited)),
+            "decided_by": "rules",
+        })
+    return verdicts
@@ -0,0 +1,71 @@
+import os
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+
+from jobs.manager import job_manager, JOB_UPLOAD_FOLDER
+from jobs.tasks import TASKS
+
+router = APIRouter()
+
+# Summaries and classifications of large PDFs take minutes; these endpoints
+# return a job id immediately and let the client poll for progress.
+
+
+def _public(job: dict) -> dict:
+    return {k: v for k, v in job.items() if k not in ("params", "result")}
+
+
+@router.post("/{kind}")
+async def submit_job(
+    kind: str,
+    file: UploadFile = File(None),
+    text: str = Form(None),
+    summary_type: str = Form("detailed"),
+    model: str = Form(None),
+    priority: int = Form(0),
+    user_id: str = Form(None)
+):
+    if kind not in TASKS:
+        raise HTTPException(status_code=404, detail=f"Unknown job type: {kind}")
+    if file is None and not text:
+        raise HTTPException(status_code=400, detail="No input provided")
+
+    job_id = job_manager.new_job_id()
+    params = {"summary_type": summary_type, "model": model or ("gemini" if kind == "summarize" else "bert")}
+    if file is not None:
+        file_path = os.path.join(JOB_UPLOAD_FOLDER, f"{job_id}_{os.path.basename(file.filename)}")
+        with open(file_path, "wb") as f:
+            f.write(await file.read())
+        params["file_path"] = file_path
+    else:
+        params["text"] = text
+
+    job = await job_manager.submit(kind, params, priority=priority, user_id=user_id, job_id=job_id)
+    return _public(job)
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _public(job)
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job.get("error") or "Job failed")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str):
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _public(job)
@@ -1,10 +1,15 @@
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, UploadFile, Form
+from fastapi import APIRouter, HTTPException, UploadFile, Form, Response
+from typing import Optional
 from models.user import UserRegister, UserLogin
-from db.mongodb import user_db
+from models.db import users_collection
 from passlib.context import CryptContext
-from models.db import compliance_collection, summarization_collection,classification_collection,qa_collection 
+from pymongo.errors import DuplicateKeyError
 from utils.pdf_parser import extract_claim_from_pdf
+from db.history import HISTORY_COLLECTIONS, fetch_history_page, fetch_history_record, stream_timeline
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+import json
 import os
 import tempfile
 
@@ -13,19 +18,22 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 @router.post("/register")
 async def register_user(user: UserRegister):
-    if await user_db.users.find_one({"email": user.email}):
+    if await users_collection.find_one({"email": user.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
     hashed = pwd_context.hash(user.password)
-    await user_db.users.insert_one({
-        "email": user.email,
-        "hashed_password": hashed
-    })
+    try:
+        await users_collection.insert_one({
+            "email": user.email,
+            "hashed_password": hashed
+        })
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     return {"message": "User registered successfully"}
 
 
 @router.post("/login")
 async def login_user(user: UserLogin):
-    user_data = await user_db.users.find_one({"email": user.email})
+    user_data = await users_collection.find_one({"email": user.email})
     if not user_data:
         raise HTTPException(status_code=400, detail="Invalid credentials")
     
@@ -39,37 +47,72 @@ async def login_user(user: UserLogin):
     }
 
 
-@router.get("/history/{user_id}")
-async def get_user_history(user_id: str):
-    print(f"🔍 Looking up compliance history for user_id: {user_id}")
-    results = await compliance_collection.find({"user_id": user_id}).to_list(100)
-    for r in results:
-        r["_id"] = str(r["_id"])
-    print(f"✅ Fetched {len(results)} compliance records.")
+async def _history_page(kind: str, user_id: str, response: Response, cursor: Optional[str], limit: Optional[int]):
+    print(f"🔍 Looking up {kind} history for user_id: {user_id}")
+    try:
+        results, next_cursor = await fetch_history_page(kind, user_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The body stays a plain list for existing clients; the next page is in a header.
+    # Without cursor or limit the rows are full records, as before pagination.
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    print(f"✅ Fetched {len(results)} {kind} records.")
     return results
 
 
+@router.get("/history/{user_id}")
+async def get_user_history(user_id: str, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return await _history_page("compliance", user_id, response, cursor, limit)
+
+
 @router.get("/history/summarization/{user_id}")
-async def get_summarization_history(user_id: str):
-    print(f"🔍 Looking up summarization history for user_id: {user_id}")
-    results = await summarization_collection.find({"user_id": user_id}).to_list(100)
-    for r in results:
-        r["_id"] = str(r["_id"])
-    print(f"✅ Fetched {len(results)} summarization records.")
-    return results
+async def get_summarization_history(user_id: str, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return await _history_page("summarization", user_id, response, cursor, limit)
+
+
 @router.get("/history/classification/{user_id}")
-async def get_classification_history(user_id: str):
-    print(f"🔍 Looking up classification history for user_id: {user_id}")
-    results = await classification_collection.find({"user_id": user_id}).to_list(100)
-    for r in results:
-        r["_id"] = str(r["_id"])
-    print(f"✅ Fetched {len(results)} classification records.")
-    return results
+async def get_classification_history(user_id: str, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return await _history_page("classification", user_id, response, cursor, limit)
+
+
 @router.get("/history/qa/{user_id}")
-async def get_qa_history(user_id: str):
-    print(f"🔍 Looking up Q/A history for user_id: {user_id}")
-    results = await qa_collection.find({"user_id": user_id}).to_list(100)
-    for r in results:
-        r["_id"] = str(r["_id"])
-    print(f"✅ Fetched {len(results)} Q/A records.")
-    return results
+async def get_qa_history(user_id: str, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None):
+    return await _history_page("qa", user_id, response, cursor, limit)
+
+
+@router.get("/history/{kind}/{user_id}/{record_id}")
+async def get_history_record(kind: str, user_id: str, record_id: str):
+    if kind not in HISTORY_COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown history type: {kind}")
+    record = await fetch_history_record(kind, user_id, record_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Record not found")
+    return record
+
+
+@router.get("/timeline/{user_id}")
+async def get_timeline(
+    user_id: str,
+    kinds: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    kind_list = [k.strip() for k in kinds.split(",") if k.strip()] if kinds else None
+    unknown = [k for k in kind_list or [] if k not in HISTORY_COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown history type: {', '.join(unknown)}")
+    try:
+        timeline = stream_timeline(user_id, kind_list, cursor, since, until, limit)
+        first = await timeline.__anext__()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson():
+        yield json.dumps(first, default=str) + "\n"
+        async for event in timeline:
+            yield json.dumps(event, default=str) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
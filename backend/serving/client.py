@@ -0,0 +1,62 @@
+import os
+import socket
+import threading
+
+from serving.protocol import decode_value, encode_value, pack, recv_message
+
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "300"))
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+class ModelClient:
+    """Blocking client with one connection per calling thread.
+
+    Pipelines call models synchronously, from the event loop or from batcher and
+    to_thread workers, so each thread keeps its own socket and has at most one
+    request in flight on it.
+    """
+
+    def __init__(self, path: str, timeout: float = MODEL_SERVER_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def call(self, op: str, args: list, kwargs: dict):
+        for attempt in range(2):
+            # Encoded per attempt: the server may have attached (and unlinked) the shared
+            # arrays of a request whose connection then dropped.
+            message = pack({"op": op, "args": encode_value(args), "kwargs": encode_value(kwargs)})
+            try:
+                sock = self._connection()
+                sock.sendall(message)
+                reply = recv_message(sock)
+                break
+            except socket.timeout:
+                self._drop()
+                raise
+            except OSError:
+                # A restarted server leaves dead connections behind; reconnect once.
+                self._drop()
+                if attempt:
+                    raise
+        if "error" in reply:
+            raise ModelServerError(f"{op}: {reply['error']}")
+        return decode_value(reply["result"])
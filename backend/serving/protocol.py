@@ -0,0 +1,100 @@
+import os
+import json
+import uuid
+import time
+import base64
+import struct
+import tempfile
+
+import numpy as np
+
+# === Model server wire format ===
+# Each message is a 4-byte big-endian length followed by a JSON body. NumPy
+# arrays of at least MODEL_SERVER_SHM_MIN_BYTES travel through shared memory: the
+# sender writes a file under SHM_DIR (tmpfs on Linux) and the receiver maps it
+# copy-on-write and unlinks it, so the array is never copied through the socket.
+# Smaller arrays are inlined as base64.
+SHM_DIR = os.getenv("MODEL_SERVER_SHM_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+SHM_MIN_BYTES = int(os.getenv("MODEL_SERVER_SHM_MIN_BYTES", "65536"))
+SHM_PREFIX = "financegpt-array-"
+
+HEADER = struct.Struct("!I")
+
+
+def _share(array: np.ndarray) -> dict:
+    array = np.ascontiguousarray(array)
+    spec = {"dtype": array.dtype.str, "shape": list(array.shape)}
+    if array.nbytes < SHM_MIN_BYTES:
+        return {**spec, "data": base64.b64encode(array.tobytes()).decode("ascii")}
+    path = os.path.join(SHM_DIR, f"{SHM_PREFIX}{uuid.uuid4().hex}")
+    array.tofile(path)
+    return {**spec, "path": path}
+
+
+def _attach(spec: dict) -> np.ndarray:
+    dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+    if "data" in spec:
+        return np.frombuffer(base64.b64decode(spec["data"]), dtype=dtype).reshape(shape).copy()
+    mapped = np.memmap(spec["path"], dtype=dtype, mode="c", shape=shape)
+    # The mapping outlives the name; unlinking now means nothing is left behind.
+    os.unlink(spec["path"])
+    return mapped.view(np.ndarray)
+
+
+def encode_value(value):
+    if isinstance(value, np.ndarray):
+        return {"__ndarray__": _share(value)}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: encode_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    return value
+
+
+def decode_value(value):
+    if isinstance(value, dict):
+        if "__ndarray__" in value:
+            return _attach(value["__ndarray__"])
+        return {k: decode_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    return value
+
+
+def pack(message: dict) -> bytes:
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+
+async def read_message(reader) -> dict:
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return json.loads(await reader.readexactly(length))
+
+
+def recv_message(sock) -> dict:
+    (length,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    return json.loads(_recv_exact(sock, length))
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        part = sock.recv(n - len(buf))
+        if not part:
+            raise ConnectionError("model server closed the connection")
+        buf += part
+    return bytes(buf)
+
+
+def remove_stale_arrays(max_age_seconds: float = 600):
+    """Deletes shared arrays whose receiver died before attaching them."""
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(SHM_DIR):
+        path = os.path.join(SHM_DIR, name)
+        try:
+            if name.startswith(SHM_PREFIX) and os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+        except OSError:
+            continue
@@ -0,0 +1,118 @@
+import os
+import threading
+import functools
+from typing import Any, Callable, Dict, List, Optional
+
+from serving.scheduler import SCHEDULER
+
+# === Local model registry ===
+# Every local model is registered with a loader and loaded at most once per
+# process, on first use. Inference entry points are registered as named ops with
+# `served`: they run in-process by default, or are forwarded to the model server
+# sidecar when MODEL_SERVER_SOCKET is set, so API workers never load a model.
+# Local calls run on the CPU pool of their op (see serving/scheduler.py).
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET")
+
+_loaders: Dict[str, Callable[[], Any]] = {}
+_models: Dict[str, Any] = {}
+_load_locks: Dict[str, threading.Lock] = {}
+_lock = threading.Lock()
+
+# op name -> (local function, batched, CPU pool); batched ops take a list and return one result per item.
+OPS: Dict[str, tuple] = {}
+
+_serving = False
+_client = None
+
+
+def register(name: str, loader: Callable[[], Any]):
+    with _lock:
+        _loaders[name] = loader
+        _load_locks.setdefault(name, threading.Lock())
+
+
+def get(name: str) -> Any:
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _load_locks[name]:
+        if name not in _models:
+            _models[name] = _loaders[name]()
+        return _models[name]
+
+
+def registered() -> List[str]:
+    return sorted(_loaders)
+
+
+def loaded() -> List[str]:
+    return sorted(_models)
+
+
+def serve_locally():
+    """Called by the model server: ops always run in this process."""
+    global _serving
+    _serving = True
+
+
+def remote():
+    global _client
+    if _serving or not MODEL_SERVER_SOCKET:
+        return None
+    if _client is None:
+        from serving.client import ModelClient
+        with _lock:
+            if _client is None:
+                _client = ModelClient(MODEL_SERVER_SOCKET)
+    return _client
+
+
+def served(op: str, batched: bool = False, pool: Optional[str] = None):
+    def wrap(fn):
+        OPS[op] = (fn, batched, pool)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            client = remote()
+            if client is None:
+                return SCHEDULER.call(pool, fn, *args, **kwargs)
+            return client.call(op, list(args), kwargs)
+        return call
+    return wrap
+
+
+def status() -> dict:
+    client = remote()
+    if client is None:
+        return {"mode": "local", "loaded": loaded(), "cpu": SCHEDULER.snapshot()}
+    return {"mode": "sidecar", "socket": MODEL_SERVER_SOCKET, **client.call("ping", [], {})}
+
+
+# === Shared sentence embedder ===
+def _load_minilm():
+    import torch
+    from sentence_transformers import SentenceTransformer
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device=device)
+
+
+register("minilm", _load_minilm)
+
+
+@served("embed", batched=True, pool="minilm")
+def embed_texts(texts: List[str], **kwargs):
+    kwargs["convert_to_numpy"] = True
+    kwargs.setdefault("show_progress_bar", False)
+    return get("minilm").encode(list(texts), **kwargs)
+
+
+class Embedder:
+    """Stands in for SentenceTransformer.encode; every pipeline shares one MiniLM."""
+
+    def encode(self, sentences, **kwargs):
+        single = isinstance(sentences, str)
+        vectors = embed_texts([sentences] if single else list(sentences), **kwargs)
+        return vectors[0] if single else vectors
+
+
+EMBEDDER = Embedder()
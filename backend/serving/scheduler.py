@@ -0,0 +1,190 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# === CPU partitioning for model pools ===
+# Every torch model uses every core by default, so a TinyLlama generate, a T5
+# beam search and a BERT batch running together oversubscribe the CPU and all
+# slow down. Each model pool instead owns a core set: its calls run on a small
+# executor whose threads are pinned to those cores (on Linux sched_setaffinity
+# with pid 0 applies to the calling thread) and cap torch's intra-op threads
+# at cores / workers. Inter-op threads are process-wide and set once.
+#
+# CPU_POOLS overrides the automatic weighted split, e.g.
+#     CPU_POOLS="tinyllama=0-5;t5=6-9;bert=10,11;minilm=12-13/2"
+# ("/N" runs N workers, each with an equal share of the pool's cores). Pools are
+# per process: with several API or job workers, run the model server sidecar so
+# one process owns the models and the partition.
+#
+# Off by default: a pool only ever uses its own cores, so an idle server or a
+# single user runs each model on a fraction of the CPU. Partitioning pays off
+# only under sustained mixed load; turn it on (CPU_SCHEDULER=1) after
+# benchmarks.bench_cpu_pools shows a gain on the target machine. The automatic
+# split is also skipped when some pool would get a single core
+# (POOL_MIN_CORES), since that starves a lone request the most.
+CPU_SCHEDULER = os.getenv("CPU_SCHEDULER", "0") == "1"
+CPU_POOLS = os.getenv("CPU_POOLS", "")
+CPU_INTEROP_THREADS = int(os.getenv("CPU_INTEROP_THREADS", "1"))
+# Share of the cores each pool gets when CPU_POOLS is not set.
+POOL_WEIGHTS = {"tinyllama": 4, "t5": 3, "bert": 2, "minilm": 1}
+POOL_MIN_CORES = int(os.getenv("POOL_MIN_CORES", "2"))
+
+_thread = threading.local()
+_interop_set = False
+_interop_lock = threading.Lock()
+
+
+def available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cores(text: str) -> List[int]:
+    cores = set()
+    for part in text.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cores.update(range(int(start), int(end) + 1))
+        elif part:
+            cores.add(int(part))
+    return sorted(cores)
+
+
+def parse_pools(spec: str) -> Dict[str, tuple]:
+    """'name=cores[/workers];...' -> {name: (cores, workers)}."""
+    pools = {}
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        name, _, value = entry.partition("=")
+        cores, _, workers = value.partition("/")
+        pools[name.strip()] = (parse_cores(cores), int(workers) if workers.strip() else 1)
+    return pools
+
+
+def auto_partition(cores: List[int], weights: Dict[str, int]) -> Dict[str, List[int]]:
+    """Contiguous core ranges proportional to the weights, at least one core per pool."""
+    names = list(weights)
+    if len(cores) < len(names):
+        # Not enough cores to separate every pool; spread them so each pool still has one.
+        return {name: [cores[i % len(cores)]] for i, name in enumerate(names)}
+    total = sum(weights.values())
+    counts = {name: max(1, int(len(cores) * weights[name] / total)) for name in names}
+    while sum(counts.values()) < len(cores):
+        # Leftovers go to whichever pool is furthest below its share.
+        name = max(names, key=lambda n: weights[n] / total * len(cores) - counts[n])
+        counts[name] += 1
+    while sum(counts.values()) > len(cores):
+        name = max((n for n in names if counts[n] > 1), key=lambda n: counts[n])
+        counts[name] -= 1
+    partition, start = {}, 0
+    for name in names:
+        partition[name] = cores[start:start + counts[name]]
+        start += counts[name]
+    return partition
+
+
+def _set_interop_threads(threads: int):
+    global _interop_set
+    with _interop_lock:
+        if _interop_set:
+            return
+        _interop_set = True
+        try:
+            import torch
+            torch.set_num_interop_threads(threads)
+        except ImportError:
+            pass
+        except RuntimeError:
+            # Inter-op work already ran in this process; keep torch's setting.
+            pass
+
+
+class CorePool:
+    def __init__(self, name: str, cores: List[int], workers: int = 1):
+        self.name = name
+        self.cores = cores
+        self.workers = max(1, workers)
+        self.intra_threads = max(1, len(cores) // self.workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _init_thread(self):
+        _thread.pool = self.name
+        _set_interop_threads(CPU_INTEROP_THREADS)
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.cores)
+            except OSError as e:
+                print(f"⚠ Could not pin {self.name} pool to cores {self.cores}: {e}")
+        try:
+            import torch
+            torch.set_num_threads(self.intra_threads)
+        except ImportError:
+            pass
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use and again in a forked child, whose threads did not survive the fork.
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"cpu_{self.name}",
+                                                        initializer=self._init_thread)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        if getattr(_thread, "pool", None) == self.name:
+            return fn(*args, **kwargs)  # nested call from one of our own threads
+        return self.executor.submit(fn, *args, **kwargs).result()
+
+    def snapshot(self) -> dict:
+        return {"cores": self.cores, "workers": self.workers, "intra_threads": self.intra_threads}
+
+
+class CpuScheduler:
+    """Runs model calls on the executor of their pool; unknown pools run inline."""
+
+    def __init__(self, spec: str = CPU_POOLS, weights: Dict[str, int] = POOL_WEIGHTS,
+                 cores: Optional[List[int]] = None, enabled: bool = CPU_SCHEDULER):
+        self.enabled = enabled
+        self.cores = cores if cores is not None else available_cores()
+        if spec.strip():
+            pools = parse_pools(spec)
+        else:
+            pools = {name: (pool_cores, 1) for name, pool_cores in auto_partition(self.cores, weights).items()}
+            smallest = min(len(pool_cores) for pool_cores, _ in pools.values())
+            if self.enabled and smallest < POOL_MIN_CORES:
+                print(f"⚠ CPU pools disabled: {len(self.cores)} cores leave a pool with {smallest} "
+                      f"(POOL_MIN_CORES={POOL_MIN_CORES}); set CPU_POOLS to partition anyway")
+                self.enabled = False
+        self.pools = {name: CorePool(name, pool_cores, workers) for name, (pool_cores, workers) in pools.items()}
+
+    def pool(self, name: Optional[str]) -> Optional[CorePool]:
+        return self.pools.get(name) if self.enabled and name else None
+
+    def call(self, pool: Optional[str], fn: Callable, *args, **kwargs) -> Any:
+        target = self.pool(pool)
+        if target is None:
+            return fn(*args, **kwargs)
+        return target.call(fn, *args, **kwargs)
+
+    def executor(self, pool: Optional[str]) -> Optional[ThreadPoolExecutor]:
+        target = self.pool(pool)
+        return target.executor if target is not None else None
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "cores": len(self.cores),
+            "interop_threads": CPU_INTEROP_THREADS,
+            "pools": {name: pool.snapshot() for name, pool in self.pools.items()},
+        }
+
+
+SCHEDULER = CpuScheduler()
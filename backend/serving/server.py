@@ -0,0 +1,153 @@
+"""Model server sidecar: one process owns every local model for all API workers.
+
+Run from backend/:
+    python -m serving.server --socket /run/financegpt/models.sock --preload
+then start the API (any number of uvicorn workers) and job workers with
+MODEL_SERVER_SOCKET set to the same path. Without that variable every process
+loads the models it uses itself, as before.
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+backend_root = Path(__file__).resolve().parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.append(str(backend_root))
+
+from serving import registry
+from serving.protocol import decode_value, encode_value, pack, read_message, remove_stale_arrays
+from serving.scheduler import SCHEDULER
+from utils.batching import MicroBatcher
+
+# Importing these registers their models and ops.
+PIPELINE_MODULES = [
+    "pipeline.classifytrain",
+    "pipeline.t5small",
+    "pipeline.summarize_t5",
+    "pipeline.comcheck_llama",
+]
+MODEL_SERVER_MAX_BATCH = int(os.getenv("MODEL_SERVER_MAX_BATCH", "64"))
+MODEL_SERVER_BATCH_WAIT_MS = float(os.getenv("MODEL_SERVER_BATCH_WAIT_MS", "5"))
+SHM_SWEEP_SECONDS = float(os.getenv("MODEL_SERVER_SHM_SWEEP_SECONDS", "300"))
+
+
+class ModelServer:
+    """Batched ops merge items from concurrent requests across all workers into one
+    call; other ops run on the executor of their CPU pool, sized and pinned by
+    the scheduler, so models on different pools never compete for cores."""
+
+    def __init__(self, max_batch: int = MODEL_SERVER_MAX_BATCH, max_wait_ms: float = MODEL_SERVER_BATCH_WAIT_MS):
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._batchers = {}
+        self._executors = {}
+        self._stats = {}
+        self.started = time.time()
+
+    def _batcher(self, op: str, kwargs: dict) -> MicroBatcher:
+        # Items can only share a call when their keyword arguments match.
+        key = (op, json.dumps(kwargs, sort_keys=True))
+        if key not in self._batchers:
+            fn, _, pool = registry.OPS[op]
+            self._batchers[key] = MicroBatcher(
+                lambda items: fn(items, **kwargs),
+                max_batch_size=self.max_batch,
+                max_wait_ms=self.max_wait_ms,
+                name=f"server_{op}",
+                executor=self._executor(op, pool),
+            )
+        return self._batchers[key]
+
+    def _executor(self, op: str, pool: str) -> ThreadPoolExecutor:
+        executor = SCHEDULER.executor(pool)
+        if executor is None:
+            # No CPU pool for this op: one thread, so the model still never runs two passes at once.
+            if op not in self._executors:
+                self._executors[op] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"server_{op}")
+            executor = self._executors[op]
+        return executor
+
+    async def run_op(self, op: str, args: list, kwargs: dict):
+        fn, batched, pool = registry.OPS[op]
+        if batched:
+            results = await self._batcher(op, kwargs).submit_many(list(args[0]))
+            if results and all(hasattr(r, "shape") for r in results):
+                import numpy as np
+                return np.stack(results)
+            return results
+        return await asyncio.get_running_loop().run_in_executor(self._executor(op, pool), lambda: fn(*args, **kwargs))
+
+    async def dispatch(self, message: dict) -> dict:
+        op = message.get("op")
+        if op == "ping":
+            return {"result": {"loaded": registry.loaded(), "ops": sorted(registry.OPS),
+                               "uptime_s": round(time.time() - self.started), "calls": self._stats,
+                               "cpu": SCHEDULER.snapshot()}}
+        if op not in registry.OPS:
+            return {"error": f"unknown op {op!r}"}
+        try:
+            result = await self.run_op(op, decode_value(message.get("args", [])), decode_value(message.get("kwargs", {})))
+            self._stats[op] = self._stats.get(op, 0) + 1
+            return {"result": encode_value(result)}
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                writer.write(pack(await self.dispatch(message)))
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+async def sweep_stale_arrays():
+    """Arrays orphaned by a client that died mid-request accumulate in tmpfs while the server runs."""
+    while True:
+        await asyncio.sleep(SHM_SWEEP_SECONDS)
+        await asyncio.to_thread(remove_stale_arrays)
+
+
+async def serve(path: str, preload: bool):
+    registry.serve_locally()
+    for module in PIPELINE_MODULES:
+        importlib.import_module(module)
+    if preload:
+        for name in registry.registered():
+            print(f"⏳ Loading {name}")
+            registry.get(name)
+
+    remove_stale_arrays()
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(ModelServer().handle, path=path)
+    os.chmod(path, 0o660)
+    print(f"✅ Model server listening on {path} ({', '.join(sorted(registry.OPS))})")
+    sweeper = asyncio.create_task(sweep_stale_arrays())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        sweeper.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=registry.MODEL_SERVER_SOCKET or "/tmp/financegpt-models.sock")
+    parser.add_argument("--preload", action="store_true", help="load every model before accepting connections")
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket, args.preload))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from utils.financial_tables import METRICS, compute_kpis, match_metric, normalize_label, parse_number, parse_table
+
+
+def row(kpis, metric):
+    return kpis["values"][METRICS.index(metric)]
+
+
+def ratio(kpis, label):
+    return next(values for name, values, _ in kpis["ratios"] if name == label)
+
+
+def test_parse_number():
+    assert parse_number("(1,234)") == -1234.0
+    assert parse_number("−45") == -45.0
+    assert parse_number("$ 1,234.5") == 1234.5
+    assert parse_number("₹500") == 500.0
+    assert parse_number("Rs. 1,000") == 1000.0
+    assert parse_number("-") == 0.0
+    assert parse_number("—") == 0.0
+    assert np.isnan(parse_number("n/a"))
+    assert np.isnan(parse_number(""))
+    assert np.isnan(parse_number(None))
+
+
+def test_labels_drop_note_references():
+    assert normalize_label("Revenue 3.1") == "Revenue"
+    assert normalize_label("Total assets (Note 12)") == "Total assets"
+    assert normalize_label("  Net income:  ") == "Net income"
+
+
+def test_match_metric():
+    assert match_metric("Revenue from operations") == "revenue"
+    assert match_metric("Total stockholders' equity") == "total_equity"
+    assert match_metric("Purchases of property and equipment") == "capex"
+    assert match_metric("Gross profit") == "gross_profit"
+    assert match_metric("Basic earnings per share") is None
+    assert match_metric("Other expenses") is None
+
+
+def test_parse_table_joins_split_cells_and_skips_note_column():
+    rows = [
+        ["", "Note", "2024", "", "2023"],
+        ["Revenue", "3", "$", "1,000", "800"],
+        ["Cost of revenue", "4", "(600)", "", "(500)"],
+        ["Net income", "5", "$", "150", "(20)"],
+        ["Basic earnings per share", "", "1.5", "", "0.2"],
+    ]
+    table = parse_table(rows)
+    assert table["periods"] == ["2024", "2023"]
+    assert set(table["metrics"]) == {"revenue", "cost_of_revenue", "net_income"}
+    np.testing.assert_array_equal(table["metrics"]["revenue"], [1000, 800])
+    # Outflows are kept as magnitudes; other negatives keep their sign.
+    np.testing.assert_array_equal(table["metrics"]["cost_of_revenue"], [600, 500])
+    np.testing.assert_array_equal(table["metrics"]["net_income"], [150, -20])
+
+
+def test_parse_table_reads_fiscal_year_headers():
+    table = parse_table([["Particulars", "FY 2024-25", "FY 2023-24"], ["Revenue from operations", "1,200", "1,000"]])
+    assert table["periods"] == ["2024", "2023"]
+    assert parse_table([["Particulars", "Amount"], ["Revenue", "1"]]) is None
+
+
+def test_compute_kpis_merges_tables():
+    current = {"periods": ["2024", "2023"], "metrics": {
+        "revenue": np.array([1000.0, 800.0]),
+        "cost_of_revenue": np.array([600.0, 500.0]),
+        "net_income": np.array([150.0, -20.0]),
+    }}
+    earlier = {"periods": ["2023", "2022"], "metrics": {
+        "revenue": np.array([999.0, 640.0]),
+        "total_equity": np.array([1000.0, 900.0]),
+    }}
+    kpis = compute_kpis([current, earlier])
+    assert kpis["periods"] == ["2024", "2023", "2022"]
+    # The first table to report a figure wins; the second only fills gaps.
+    np.testing.assert_array_equal(row(kpis, "revenue"), [1000, 800, 640])
+    np.testing.assert_array_equal(row(kpis, "total_equity")[1:], [1000, 900])
+    assert np.isnan(row(kpis, "total_equity")[0])
+
+
+def test_compute_kpis_growth_and_margins():
+    kpis = compute_kpis([{"periods": ["2024", "2023", "2022"], "metrics": {
+        "revenue": np.array([1000.0, 800.0, 640.0]),
+        "cost_of_revenue": np.array([600.0, 500.0, 400.0]),
+        "net_income": np.array([150.0, -20.0, np.nan]),
+        "total_equity": np.array([1000.0, 1000.0, 900.0]),
+    }}])
+    yoy = kpis["yoy"]
+    np.testing.assert_allclose(yoy[METRICS.index("revenue")], [0.25, 0.25])
+    # Relative to the magnitude of the earlier period, so a loss turning into a profit is growth.
+    assert yoy[METRICS.index("net_income")][0] == pytest.approx(8.5)
+    np.testing.assert_allclose(ratio(kpis, "Gross margin"), [0.4, 0.375, 0.375])
+    np.testing.assert_allclose(ratio(kpis, "Net margin")[:2], [0.15, -0.025])
+    np.testing.assert_allclose(ratio(kpis, "Return on equity")[:2], [0.15, -0.02])
+
+
+def test_compute_kpis_without_periods():
+    assert compute_kpis([]) is None
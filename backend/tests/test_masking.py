@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from benchmarks.bench_masking import legacy_mask_pii, legacy_mask_sensitive_data, synthetic_page
+from utils.masking import MASKER, PII_MASKER
+
+EDGE_CASES = [
+    "PAN-ABCDE1234F",
+    "Aadhaar-1234 5678 9012",
+    "Mob-9876543210",
+    "Refund -$1,200.00",
+    "x$5",
+    "Taxpayer Name: John Doe\nAddress follows",
+    "Rs. 1234 5678 9012",
+    "$1234 5678 9012",
+    "$9876543210",
+    "Rs.5123 456 7890 paid",
+    "SSN 123-45-6789, call +91 98765 43210",
+    "Contact: ravi.kumar@example.com, Name: Ravi Kumar, Infosys",
+    "Line one\r\nline two\rthree",
+]
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_sensitive_matches_legacy(text):
+    assert MASKER.mask(text, normalize=True) == legacy_mask_sensitive_data(text)
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_pii_matches_legacy(text):
+    assert PII_MASKER.mask(text) == legacy_mask_pii(text)
+
+
+def test_phone_replacements_unchanged():
+    assert MASKER.mask("Call 91 987 654 3210", normalize=True) == "Call Phone Number: XXXXX"
+    assert PII_MASKER.mask("Mob 9876543210") == "Mob XXXXX"
+
+
+def test_synthetic_pages_match_legacy():
+    rng = random.Random(0)
+    pages = [synthetic_page(rng) for _ in range(200)]
+    assert [MASKER.mask(p, normalize=True) for p in pages] == [legacy_mask_sensitive_data(p) for p in pages]
+    assert [PII_MASKER.mask(p) for p in pages] == [legacy_mask_pii(p) for p in pages]
+
+
+def test_mask_batch_matches_per_page():
+    rng = random.Random(1)
+    pages = [synthetic_page(rng) for _ in range(20)] + EDGE_CASES
+    assert MASKER.mask_batch(pages, normalize=True) == [legacy_mask_sensitive_data(p) for p in pages]
+    assert PII_MASKER.mask_batch(pages) == [legacy_mask_pii(p) for p in pages]
@@ -0,0 +1,45 @@
+import asyncio
+
+from utils.router import HedgedRouter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def router():
+    r = HedgedRouter("test", "remote", "local")
+    r.deadline = lambda: 0.01
+    return r
+
+
+def test_failed_fallback_does_not_beat_a_slow_primary():
+    async def slow_primary():
+        await asyncio.sleep(0.1)
+        return ("remote answer", [])
+
+    async def failing_fallback():
+        return ("❌ Error generating answer: boom", [])
+
+    result, decision = run(router().run(
+        slow_primary, failing_fallback,
+        valid=lambda r: r is not None, fallback_valid=lambda r: not r[0].startswith("❌"),
+    ))
+    assert result == ("remote answer", [])
+    assert decision["winner"] == "remote"
+    assert decision["hedged"]
+
+
+def test_valid_fallback_wins_after_the_deadline():
+    async def slow_primary():
+        await asyncio.sleep(0.2)
+        return "remote"
+
+    async def fallback():
+        return "local"
+
+    r = router()
+    result, decision = run(r.run(slow_primary, fallback))
+    assert (result, decision["winner"]) == ("local", "local")
+    # The cancelled primary still leaves a lower-bound latency sample.
+    assert r.stats["remote"]._recent()[0][1] is None
@@ -0,0 +1,70 @@
+from utils.sections import _from_headings, _from_outline, pages_for
+
+CONTENTS = ("Table of Contents\nItem 1A. Risk Factors 5\nItem 7. Management's Discussion and Analysis 9\n"
+            "Item 8. Financial Statements 12")
+
+
+def test_outline_ranges_end_at_the_next_entry_of_the_same_level():
+    toc = [
+        [1, "Part I", 2],
+        [2, "Item 1A. Risk Factors", 3],
+        [2, "Item 1B. Unresolved Staff Comments", 7],
+        [1, "Part II", 8],
+        [2, "Item 7. Management's Discussion and Analysis", 9],
+        [2, "Item 8. Financial Statements and Supplementary Data", 12],
+        [3, "Report of Independent Registered Public Accounting Firm", 12],
+        [3, "Consolidated Balance Sheets", 14],
+        [2, "Item 9A. Controls and Procedures", 20],
+        [2, "Exhibits", 99],  # beyond the last page
+    ]
+    assert _from_outline(toc, 25) == {
+        "risk_factors": (2, 6),
+        "mdna": (8, 11),
+        "financial_statements": (11, 19),
+        "auditor_report": (11, 13),
+        "controls": (19, 25),
+    }
+
+
+def test_outline_keeps_the_first_entry_and_at_least_one_page():
+    assert _from_outline([[1, "Risk Factors", 5], [1, "Risk Factors (continued)", 5]], 5) == {"risk_factors": (4, 5)}
+
+
+def test_headings_skip_contents_and_follow_running_headers():
+    pages = [
+        CONTENTS,
+        "Item 1A. Risk Factors\nOur business is subject to many risks.",
+        "Risk Factors\nCompetition may reduce our margins.",
+        "Risk Factors (continued)\nRegulation may change.",
+        "Item 1B. Unresolved Staff Comments\nNone.",
+    ]
+    # The section ends on the page that opens the next item, which it may share.
+    assert _from_headings(pages) == {"risk_factors": (1, 5)}
+
+
+def test_nested_auditor_report_ends_at_the_statements():
+    pages = [
+        "Item 8. Financial Statements\n",
+        "Report of Independent Registered Public Accounting Firm\nOpinion on the financial statements",
+        "Report of Independent Registered Public Accounting Firm\nBasis for opinion",
+        "Consolidated Balance Sheets\nTotal assets 1,000",
+        "Notes to Consolidated Financial Statements\n",
+        "Item 9A. Controls and Procedures\n",
+    ]
+    assert _from_headings(pages) == {
+        "financial_statements": (0, 6),
+        "auditor_report": (1, 4),
+        "controls": (5, 6),
+    }
+
+
+def test_body_text_is_not_a_heading():
+    assert _from_headings(["risk factors are described below in detail\n"]) == {}
+
+
+def test_pages_for():
+    sections = {"financial_statements": (10, 13), "mdna": (4, 6), "risk_factors": (11, 12)}
+    assert pages_for(sections, ("financial_statements", "mdna")) == [4, 5, 10, 11, 12]
+    assert pages_for(sections, ("risk_factors", "financial_statements")) == [10, 11, 12]
+    assert pages_for(sections, ("controls",)) is None
+    assert pages_for(sections, None) is None
@@ -0,0 +1,95 @@
+from pipeline.travel import load_policy_file
+from pipeline.travel_rules import RuleLimits, evaluate_claims, parse_claim
+
+
+def claim(**fields):
+    return ", ".join(f"{key}: {value}" for key, value in fields.items())
+
+
+AIR = dict(category="Air Travel", employee_grade="Management Executive", amount="₹12,500",
+           days_in_advance=20, approval_status="true", receipt_attached="true", mode_of_transport="Economy")
+
+
+def verdict(text):
+    [result] = evaluate_claims([text])
+    return result
+
+
+def test_comma_formatted_amounts():
+    assert parse_claim("amount: ₹5,000, nights: 1")["amount"] == 5000.0
+    assert parse_claim("amount: 1,00,000.50; category: Meals")["amount"] == 100000.5
+    assert parse_claim("Hotel in Delhi for Rs. 7,250 total")["amount"] == 7250.0
+    assert parse_claim("amount=4200, days: 2")["amount"] == 4200.0
+
+
+def test_comma_formatted_hotel_over_cap():
+    text = claim(category="Accommodation", employee_grade="Non-Executive", city="Delhi", amount="₹5,000",
+                 nights=1, receipt_attached="true", booking_method="Corporate Portal")
+    result = verdict(text)
+    assert result["classification"] == "Non-Compliant"
+    assert "ACC-01" in result["rule_ids"]
+
+
+def test_air_booked_through_portal_is_compliant():
+    result = verdict(claim(**AIR, booking_method="Corporate Portal"))
+    assert result["classification"] == "Compliant"
+    assert "AIR-05" in result["rule_ids"]
+
+
+def test_air_cash_at_counter_is_non_compliant():
+    result = verdict(claim(**AIR, booking_method="Cash at counter"))
+    assert result["classification"] == "Non-Compliant"
+    assert result["rule_ids"] == ["AIR-05"]
+
+
+def test_air_booking_left_to_llm_when_unclear():
+    assert verdict(claim(**AIR)) is None
+    assert verdict(claim(**AIR, booking_method="Travel agency")) is None
+    assert verdict(claim(**AIR, booking_method="Cash at counter", justification_text="portal outage")) is None
+
+
+def test_hotel_booking_needs_platform_or_approval():
+    base = dict(category="Accommodation", employee_grade="Management Executive", city="Pune", amount="₹2,000",
+                nights=1, receipt_attached="true")
+    assert verdict(claim(**base, booking_method="Walk-in", approval_status="false"))["rule_ids"] == ["ACC-02"]
+    assert verdict(claim(**base, booking_method="Walk-in", approval_status="true"))["classification"] == "Compliant"
+
+
+def test_meals_over_cap_need_pre_approval():
+    base = dict(category="Meals", city="Mumbai", amount="₹1,500", days=2, receipt_attached="true")
+    assert verdict(claim(**base, approval_status="false"))["rule_ids"] == ["MEAL-01"]
+    assert verdict(claim(**base, approval_status="true"))["classification"] == "Compliant"
+    assert verdict(claim(**base)) is None
+
+
+def test_fine_dining_needs_pre_approval():
+    base = dict(category="Meals", city="Mumbai", amount="₹600", days=2, receipt_attached="true",
+                description="Fine dining with client")
+    assert verdict(claim(**base, approval_status="false"))["rule_ids"] == ["MEAL-02"]
+    assert verdict(claim(**base)) is None
+
+
+def test_missing_receipt_excused_by_justification_and_approval():
+    base = dict(AIR, booking_method="Corporate Portal", receipt_attached="false")
+    assert verdict(claim(**base))["rule_ids"] == ["RCPT-01"]
+    assert verdict(claim(**base, justification_text="receipt lost in transit"))["classification"] == "Compliant"
+    pending = dict(base, approval_status="unknown")
+    assert verdict(claim(**pending, justification_text="receipt lost in transit")) is None
+
+
+def test_limits_come_from_the_policy_file():
+    data = load_policy_file()
+    data["limits"]["min_days_in_advance"] = 30
+    data["limits"]["hotel_caps"]["Non-Executive"]["Tier 1"] = 6000
+    limits = RuleLimits.from_policy(data)
+
+    late = claim(**AIR, booking_method="Corporate Portal")
+    assert verdict(late)["classification"] == "Compliant"
+    [result] = evaluate_claims([late], limits)
+    assert result["rule_ids"] == ["AIR-03"]
+    assert "at least 30 days" in result["reasoning"]
+
+    hotel = claim(category="Accommodation", employee_grade="Non-Executive", city="Delhi", amount="₹5,000",
+                  nights=1, receipt_attached="true", booking_method="Corporate Portal")
+    [result] = evaluate_claims([hotel], limits)
+    assert result["classification"] == "Compliant"
@@ -0,0 +1,123 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+from utils.metrics import record_cache
+
+# === Semantic QA answer cache ===
+# Per document (keyed by model + content hash) we keep the built retrieval index
+# and the answers already given, each with its normalized question embedding and
+# a fingerprint of the context it was generated from. A new question reuses an
+# answer when its embedding is at least QA_CACHE_SIMILARITY cosine-similar to a
+# cached question AND retrieval returned exactly the same context, so a
+# rephrased question that lands on different passages is still answered fresh.
+QA_CACHE_SIMILARITY = float(os.getenv("QA_CACHE_SIMILARITY", "0.9"))
+QA_CACHE_MAX_DOCUMENTS = int(os.getenv("QA_CACHE_MAX_DOCUMENTS", "128"))
+QA_CACHE_MAX_ANSWERS = int(os.getenv("QA_CACHE_MAX_ANSWERS", "64"))
+QA_CACHE_TTL_SECONDS = float(os.getenv("QA_CACHE_TTL_SECONDS", "3600"))
+
+
+def context_fingerprint(context) -> str:
+    if isinstance(context, (list, tuple)):
+        context = "\x1e".join(context)
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+class CachedAnswer:
+    __slots__ = ("vector", "fingerprint", "answer")
+
+    def __init__(self, vector: np.ndarray, fingerprint: str, answer: str):
+        self.vector = vector
+        self.fingerprint = fingerprint
+        self.answer = answer
+
+
+class CachedDocument:
+    """Retrieval payload for one document plus the answers given against it."""
+
+    def __init__(self, key: str, payload: Any):
+        self.key = key
+        self.payload = payload
+        self.answers: List[CachedAnswer] = []
+        self.created_at = time.monotonic()
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    def __init__(self, similarity: float = QA_CACHE_SIMILARITY, max_documents: int = QA_CACHE_MAX_DOCUMENTS,
+                 max_answers: int = QA_CACHE_MAX_ANSWERS, ttl_seconds: float = QA_CACHE_TTL_SECONDS):
+        self.similarity = similarity
+        self.max_documents = max_documents
+        self.max_answers = max_answers
+        self.ttl_seconds = ttl_seconds
+        self._documents: "OrderedDict[str, CachedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def document_key(namespace: str, content) -> str:
+        data = content if isinstance(content, bytes) else str(content).encode("utf-8")
+        return f"{namespace}:{hashlib.sha256(data).hexdigest()}"
+
+    def document(self, namespace: str, content, build: Callable[[], Any]) -> CachedDocument:
+        """Cached document for this content, building its retrieval payload on a miss."""
+        key = self.document_key(namespace, content)
+        with self._lock:
+            doc = self._documents.get(key)
+            if doc is not None and time.monotonic() - doc.created_at > self.ttl_seconds:
+                del self._documents[key]
+                doc = None
+            if doc is not None:
+                self._documents.move_to_end(key)
+        record_cache("qa_document", doc is not None)
+        if doc is not None:
+            return doc
+
+        doc = CachedDocument(key, build())
+        with self._lock:
+            self._documents[key] = doc
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return doc
+
+    def lookup(self, doc: CachedDocument, question_vector, context) -> Optional[str]:
+        fingerprint = context_fingerprint(context)
+        query = _normalize(question_vector)
+        with self._lock:
+            candidates = [a for a in doc.answers if a.fingerprint == fingerprint]
+            best = None
+            if candidates:
+                scores = np.stack([a.vector for a in candidates]) @ query
+                i = int(np.argmax(scores))
+                if scores[i] >= self.similarity:
+                    best = candidates[i]
+                    # Most recently used answers survive eviction longest.
+                    doc.answers.remove(best)
+                    doc.answers.append(best)
+        record_cache("qa_answer", best is not None)
+        return best.answer if best is not None else None
+
+    def store(self, doc: CachedDocument, question_vector, context, answer: str):
+        with self._lock:
+            doc.answers.append(CachedAnswer(_normalize(question_vector), context_fingerprint(context), answer))
+            del doc.answers[:-self.max_answers]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "answers": sum(len(d.answers) for d in self._documents.values()),
+                "similarity": self.similarity,
+            }
+
+
+QA_ANSWER_CACHE = SemanticAnswerCache()
@@ -0,0 +1,82 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from utils.metrics import observe_stage, register_queue
+
+
+# === Async micro-batcher ===
+# Collects items submitted by concurrent requests for a short window and hands
+# them to a synchronous batch function (model forward / generate) running on a
+# dedicated worker thread, so one forward pass serves many callers.
+class MicroBatcher:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher",
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # A CPU pool's executor when given, so the batch runs on that pool's pinned threads.
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        register_queue(f"batcher_{name}", lambda: self.queue_depth)
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def submit_many(self, items: List[Any]) -> List[Any]:
+        return await asyncio.gather(*(self.submit(item) for item in items))
+
+    def run_exclusive(self, fn: Callable, *args) -> Future:
+        """Runs fn on the batch worker thread, so it never overlaps a batch call."""
+        return self._executor.submit(fn, *args)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(item, fut) for item, fut in batch if not fut.cancelled()]
+            if not batch:
+                continue
+            try:
+                started = loop.time()
+                outputs = await loop.run_in_executor(
+                    self._executor, self.batch_fn, [item for item, _ in batch]
+                )
+                observe_stage("batch_forward", loop.time() - started, endpoint="batcher", model=self.name)
+                for (_, fut), out in zip(batch, outputs):
+                    if not fut.done():
+                        fut.set_result(out)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
@@ -0,0 +1,154 @@
+import os
+import time
+import threading
+from datetime import datetime
+from collections import OrderedDict, deque
+
+# === Per-session conversation memory ===
+# Sessions live in an LRU keyed by session id, expire after QA_MEMORY_TTL_SECONDS
+# idle, and are evicted oldest-first once the process-wide byte cap or session
+# cap is reached. Each prompt gets the newest turns that fit QA_MEMORY_TOKEN_BUDGET;
+# turns pushed out of the window are folded into a short running summary.
+QA_MEMORY_MAX_SESSIONS = int(os.getenv("QA_MEMORY_MAX_SESSIONS", "5000"))
+QA_MEMORY_MAX_BYTES = int(os.getenv("QA_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+QA_MEMORY_TTL_SECONDS = float(os.getenv("QA_MEMORY_TTL_SECONDS", "3600"))
+QA_MEMORY_TOKEN_BUDGET = int(os.getenv("QA_MEMORY_TOKEN_BUDGET", "800"))
+QA_MEMORY_SUMMARY_TOKENS = int(os.getenv("QA_MEMORY_SUMMARY_TOKENS", "200"))
+QA_MEMORY_STORE = os.getenv("QA_MEMORY_STORE", "memory").lower()
+
+
+def estimate_tokens(text: str) -> int:
+    # Gemini has no local tokenizer; ~4 characters per token is close enough for budgeting.
+    return len(text) // 4 + 1
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def compress_turn(question: str, answer: str) -> str:
+    return f"- Asked: {_clip(question, 120)} → {_clip(answer, 200)}"
+
+
+class Session:
+    __slots__ = ("session_id", "summary", "turns", "updated_at", "size")
+
+    def __init__(self, session_id: str, summary: str = "", turns=None):
+        self.session_id = session_id
+        self.summary = summary
+        self.turns = deque(turns or [])
+        self.updated_at = time.monotonic()
+        self.size = 0
+        self.resize()
+
+    def resize(self):
+        self.size = len(self.summary) + sum(len(q) + len(a) for q, a in self.turns)
+
+    def to_document(self) -> dict:
+        return {"summary": self.summary, "turns": [list(t) for t in self.turns]}
+
+
+class ConversationStore:
+    def __init__(self, max_sessions: int = QA_MEMORY_MAX_SESSIONS, max_bytes: int = QA_MEMORY_MAX_BYTES,
+                 ttl_seconds: float = QA_MEMORY_TTL_SECONDS, token_budget: int = QA_MEMORY_TOKEN_BUDGET,
+                 summary_tokens: int = QA_MEMORY_SUMMARY_TOKENS, collection=None):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.collection = collection
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    # --- eviction ---
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        # The LRU end holds the least recently used sessions, so expired ones come first.
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            over_cap = len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+            if oldest.updated_at >= cutoff and not over_cap:
+                break
+            self._drop(oldest.session_id)
+
+    # --- access ---
+    async def get(self, session_id: str) -> Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and time.monotonic() - session.updated_at > self.ttl_seconds:
+                self._drop(session_id)
+                session = None
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+
+        doc = await self.collection.find_one({"_id": session_id}) if self.collection is not None else None
+        session = Session(session_id, doc["summary"], [tuple(t) for t in doc["turns"]]) if doc else Session(session_id)
+        with self._lock:
+            if session_id in self._sessions:  # loaded concurrently by another request
+                return self._sessions[session_id]
+            self._sessions[session_id] = session
+            self._bytes += session.size
+            self._evict()
+        return session
+
+    def render(self, session: Session) -> str:
+        """Running summary plus the newest turns that fit the token budget."""
+        lines, used = [], estimate_tokens(session.summary)
+        for question, answer in reversed(session.turns):
+            turn = f"User: {question}\nAI: {answer}"
+            used += estimate_tokens(turn)
+            if used > self.token_budget and lines:
+                break
+            lines.append(turn)
+        history = "\n".join(reversed(lines))
+        if session.summary:
+            history = f"Summary of earlier conversation:\n{session.summary}\n\n{history}"
+        return history
+
+    async def append(self, session: Session, question: str, answer: str):
+        with self._lock:
+            before = session.size
+            session.turns.append((question, answer))
+            self._compact(session)
+            session.updated_at = time.monotonic()
+            session.resize()
+            if session.session_id in self._sessions:
+                self._bytes += session.size - before
+                self._sessions.move_to_end(session.session_id)
+            self._evict()
+
+        if self.collection is not None:
+            await self.collection.update_one(
+                {"_id": session.session_id},
+                {"$set": {**session.to_document(), "updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+
+    def _compact(self, session: Session):
+        # Fold the oldest turns into the summary until the verbatim turns fit the budget.
+        while len(session.turns) > 1 and sum(estimate_tokens(q + a) for q, a in session.turns) > self.token_budget:
+            question, answer = session.turns.popleft()
+            lines = (session.summary.splitlines() if session.summary else []) + [compress_turn(question, answer)]
+            while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+                lines.pop(0)
+            session.summary = "\n".join(lines)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "bytes": self._bytes}
+
+
+def create_conversation_store() -> ConversationStore:
+    if QA_MEMORY_STORE == "mongo":
+        from db.mongodb import mongo, MONGO_APP_DB
+        collection = mongo.collection(MONGO_APP_DB, "qa_sessions")
+        mongo.register_index(collection, "updated_at", name="idle_ttl", expireAfterSeconds=int(QA_MEMORY_TTL_SECONDS))
+        return ConversationStore(collection=collection)
+    return ConversationStore()
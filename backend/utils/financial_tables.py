@@ -0,0 +1,223 @@
+import re
+from typing import List, Optional
+
+import numpy as np
+
+from utils.metrics import count_event
+
+# === Statement tables → structured figures ===
+# Financial statements lose their layout in flattened PDF text, so the
+# financial_only summary reads them as tables instead: PyMuPDF table detection on
+# the statement pages, cells parsed into a metrics × periods float matrix, and
+# growth, margins and cash-flow figures computed locally with NumPy. The LLM gets
+# a few dozen lines of figures in place of the mangled table text.
+TABLE_MAX_PAGES = 40
+YEAR_RE = re.compile(r"\b(?:FY\s*)?((?:19|20)\d{2})(?:\s*[-–/]\s*\d{2,4})?\b", re.IGNORECASE)
+UNITS_RE = re.compile(r"\b(?:in|amounts?\s+in)\s+(?:[$₹€£]|rs\.?|inr|usd|eur)?\s*(thousands|millions|billions|crores?|lakhs?)\b",
+                      re.IGNORECASE)
+STATEMENT_PAGE_RE = re.compile(
+    r"balance\s+sheets?|statements?\s+of\s+(operations|income|profit\s+and\s+loss|cash\s+flows?)|cash\s+flow\s+statement",
+    re.IGNORECASE,
+)
+
+# First matching pattern wins, so the more specific labels come first.
+METRIC_PATTERNS = {
+    "revenue": r"^(total\s+)?(net\s+)?(revenues?|sales)(\s+from\s+operations)?(,?\s*net)?$|^revenue\s+from\s+operations",
+    "cost_of_revenue": r"^(total\s+)?cost\s+of\s+(revenues?|sales|goods\s+sold|materials\s+consumed)",
+    "gross_profit": r"^gross\s+(profit|margin)$",
+    "operating_income": r"^(total\s+)?(operating\s+(income|profit)|income\s+from\s+operations)(\s*\(loss\))?$",
+    "net_income": r"^(net\s+(income|profit|earnings)|profit\s+(for\s+the\s+(year|period)|after\s+tax))",
+    "total_assets": r"^total\s+assets$",
+    "total_liabilities": r"^total\s+liabilities$",
+    "total_equity": r"^total\s+(stockholders['’]?\s+|shareholders['’]?\s+)?equity$",
+    "operating_cash_flow": r"^net\s+cash.*\boperating\s+activities",
+    "investing_cash_flow": r"^net\s+cash.*\binvesting\s+activities",
+    "financing_cash_flow": r"^net\s+cash.*\bfinancing\s+activities",
+    "capex": r"^(purchases?\s+of|payments?\s+for|acquisitions?\s+of|additions\s+to)\s+(property|plant|fixed\s+assets|"
+             r"tangible|capital\s+assets)|^capital\s+expenditures?",
+}
+METRIC_LABELS = {
+    "revenue": "Revenue", "cost_of_revenue": "Cost of revenue", "gross_profit": "Gross profit",
+    "operating_income": "Operating income", "net_income": "Net income", "total_assets": "Total assets",
+    "total_liabilities": "Total liabilities", "total_equity": "Total equity",
+    "operating_cash_flow": "Operating cash flow", "investing_cash_flow": "Investing cash flow",
+    "financing_cash_flow": "Financing cash flow", "capex": "Capital expenditure",
+}
+METRICS = list(METRIC_PATTERNS)
+# Reported as negatives by some statements and positives by others; kept as magnitudes.
+OUTFLOW_METRICS = {"cost_of_revenue", "capex"}
+
+_METRIC_RES = {name: re.compile(p, re.IGNORECASE) for name, p in METRIC_PATTERNS.items()}
+_NUMBER_RE = re.compile(r"^\(?-?\d[\d,]*(\.\d+)?\)?$")
+_DASHES = {"-", "—", "–", "−"}
+
+
+def parse_number(text: Optional[str]) -> float:
+    """Statement cell → float; parentheses are negatives, dashes are nil, anything else NaN."""
+    if not text:
+        return np.nan
+    cell = re.sub(r"[$₹€£%\s]|rs\.?|inr", "", text.strip(), flags=re.IGNORECASE).replace("−", "-")
+    if cell in _DASHES:
+        return 0.0
+    if not _NUMBER_RE.match(cell):
+        return np.nan
+    negative = cell.startswith("(") or cell.startswith("-")
+    value = float(cell.strip("()-").replace(",", ""))
+    return -value if negative else value
+
+
+def normalize_label(text: str) -> str:
+    label = re.sub(r"\s+", " ", text or "").strip(" :.")
+    # Drop trailing note references such as "Revenue 3.1" or "Total assets (Note 12)".
+    return re.sub(r"\s*(\(?note\s*[\d.]+\)?|\s\d+(\.\d+)?)$", "", label, flags=re.IGNORECASE)
+
+
+def match_metric(label: str) -> Optional[str]:
+    if not label or len(label) > 90 or "per share" in label.lower():
+        return None
+    for name, pattern in _METRIC_RES.items():
+        if pattern.search(label):
+            return name
+    return None
+
+
+def parse_table(rows: List[List[Optional[str]]]) -> Optional[dict]:
+    """Year columns and metric rows of one detected table, or None if it has neither."""
+    header_row, year_cols = None, []
+    for r, row in enumerate(rows[:3]):
+        cols = [(c, YEAR_RE.search(cell or "")) for c, cell in enumerate(row)]
+        cols = [(c, m.group(1)) for c, m in cols if m and c > 0]
+        if len(cols) > len(year_cols):
+            header_row, year_cols = r, cols
+    if not year_cols:
+        return None
+
+    periods = [year for _, year in year_cols]
+    # A figure can be split over several cells ("$", "1,234", ")"); each period owns the cells up to the next one.
+    spans = [(c, year_cols[i + 1][0] if i + 1 < len(year_cols) else None) for i, (c, _) in enumerate(year_cols)]
+    metrics = {}
+    for row in rows[header_row + 1:]:
+        name = match_metric(normalize_label(" ".join(cell or "" for cell in row[:year_cols[0][0]])))
+        if name is None or name in metrics:
+            continue
+        values = np.array([parse_number("".join(cell or "" for cell in row[start:end])) for start, end in spans])
+        if np.isfinite(values).any():
+            metrics[name] = np.abs(values) if name in OUTFLOW_METRICS else values
+    return {"periods": periods, "metrics": metrics} if metrics else None
+
+
+def _statement_pages(doc) -> List[int]:
+    return [i for i, page in enumerate(doc) if STATEMENT_PAGE_RE.search(page.get_text("text"))][:TABLE_MAX_PAGES]
+
+
+def extract_tables(pdf, pages: Optional[List[int]] = None) -> dict:
+    """Parsed tables and the stated units from the statement pages of a PDF path or bytes."""
+    import fitz  # only needed here; the parsing and KPI maths work on plain cell text
+
+    tables, units = [], None
+    with (fitz.open("pdf", pdf) if isinstance(pdf, bytes) else fitz.open(pdf)) as doc:
+        if not hasattr(doc[0], "find_tables"):
+            return {"tables": [], "units": None}  # PyMuPDF < 1.23
+        for page_no in (pages if pages is not None else _statement_pages(doc))[:TABLE_MAX_PAGES]:
+            page = doc[page_no]
+            if units is None:
+                found = UNITS_RE.search(page.get_text("text"))
+                units = found.group(1).lower() if found else None
+            for table in page.find_tables().tables:
+                parsed = parse_table(table.extract())
+                if parsed:
+                    tables.append(parsed)
+    return {"tables": tables, "units": units}
+
+
+def compute_kpis(tables: List[dict]) -> Optional[dict]:
+    """Merges all tables into one metrics × periods matrix (latest period first) and derives KPIs."""
+    periods = sorted({p for t in tables for p in t["periods"]}, reverse=True)
+    if not periods:
+        return None
+    column = {p: i for i, p in enumerate(periods)}
+    values = np.full((len(METRICS), len(periods)), np.nan)
+    for table in tables:
+        cols = [column[p] for p in table["periods"]]
+        for name, row in table["metrics"].items():
+            i = METRICS.index(name)
+            # The first statement that reports a figure wins (consolidated before standalone).
+            fill = np.isnan(values[i, cols])
+            values[i, np.array(cols)[fill]] = row[fill]
+
+    m = {name: values[i] for i, name in enumerate(METRICS)}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Change against the previous period, relative to its magnitude so losses narrowing read as growth.
+        yoy = (values[:, :-1] - values[:, 1:]) / np.abs(values[:, 1:])
+        revenue = m["revenue"]
+        gross = np.where(np.isnan(m["gross_profit"]), revenue - m["cost_of_revenue"], m["gross_profit"])
+        # (label, values, shown as percent or as a multiple)
+        ratios = [
+            ("Gross margin", gross / revenue, "%"),
+            ("Operating margin", m["operating_income"] / revenue, "%"),
+            ("Net margin", m["net_income"] / revenue, "%"),
+            ("Return on equity", m["net_income"] / m["total_equity"], "%"),
+            ("Liabilities / equity", m["total_liabilities"] / m["total_equity"], "x"),
+            ("Cash conversion (OCF / net income)", m["operating_cash_flow"] / m["net_income"], "x"),
+        ]
+    cash_flows = {
+        "Free cash flow (OCF − capex)": m["operating_cash_flow"] - m["capex"],
+        "Net change in cash": m["operating_cash_flow"] + m["investing_cash_flow"] + m["financing_cash_flow"],
+    }
+    return {"periods": periods, "values": values, "yoy": yoy, "ratios": ratios, "cash_flows": cash_flows}
+
+
+def _amount(v: float) -> str:
+    return f"{v:,.1f}" if np.isfinite(v) else "n/a"
+
+
+def _percent(v: float, signed: bool = False) -> str:
+    if not np.isfinite(v):
+        return "n/a"
+    return f"{v * 100:+.1f}%" if signed else f"{v * 100:.1f}%"
+
+
+def _multiple(v: float) -> str:
+    return f"{v:.2f}x" if np.isfinite(v) else "n/a"
+
+
+def format_figures(kpis: dict, units: Optional[str] = None, max_periods: int = 3) -> str:
+    periods = kpis["periods"][:max_periods]
+    n = len(periods)
+    unit_note = f"; amounts in {units}" if units else ""
+    lines = [f"Structured figures (parsed from the financial statement tables{unit_note}):",
+             "Metric | " + " | ".join(periods) + (" | YoY" if n > 1 else "")]
+    for i, name in enumerate(METRICS):
+        row = kpis["values"][i, :n]
+        if not np.isfinite(row).any():
+            continue
+        cells = [_amount(v) for v in row]
+        if n > 1:
+            cells.append(_percent(kpis["yoy"][i, 0], signed=True))
+        lines.append(f"{METRIC_LABELS[name]} | " + " | ".join(cells))
+    for label, row in kpis["cash_flows"].items():
+        if np.isfinite(row[:n]).any():
+            lines.append(f"{label} | " + " | ".join(_amount(v) for v in row[:n]))
+    ratio_lines = [f"{label} | " + " | ".join(_percent(v) if kind == "%" else _multiple(v) for v in row[:n])
+                   for label, row, kind in kpis["ratios"] if np.isfinite(row[:n]).any()]
+    if ratio_lines:
+        lines += ["Ratio | " + " | ".join(periods)] + ratio_lines
+    return "\n".join(lines) if len(lines) > 2 else ""
+
+
+def financial_figures(pdf, pages: Optional[List[int]] = None) -> str:
+    """Compact figures block for the prompt; empty when no statement table could be parsed."""
+    extracted = extract_tables(pdf, pages)
+    kpis = compute_kpis(extracted["tables"])
+    figures = format_figures(kpis, extracted["units"]) if kpis else ""
+    count_event("financial_tables", "parsed" if figures else "not_found")
+    return figures
+
+
+def is_table_debris(chunk: str, threshold: float = 0.35) -> bool:
+    """Flattened table text: mostly numbers. Dropped from the prompt once figures are available."""
+    tokens = chunk.split()
+    if not tokens:
+        return False
+    numeric = sum(1 for t in tokens if _NUMBER_RE.match(t.strip("$₹€£%,;:")) or t in _DASHES)
+    return numeric / len(tokens) >= threshold
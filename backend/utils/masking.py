@@ -0,0 +1,100 @@
+import os
+import re
+from typing import Callable, Iterable, List, Tuple, Union
+
+# === PII masking rules ===
+# (name, pattern, replacement). A rule set is compiled into one alternation and
+# applied in a single left-to-right scan; where two rules could match at the same
+# position the earlier one wins, so rules keep the order in which the original
+# per-rule re.sub passes ran. Patterns and replacement strings are the ones those
+# passes used, so masked output is unchanged.
+Replacement = Union[str, Callable[[str], str]]
+
+DEFAULT_ORGS = ['IRS', 'Infosys', 'TCS', 'Wipro', 'HDFC', 'ICICI', 'Deloitte']
+
+def _keep_label(placeholder: str) -> Callable[[str], str]:
+    # "Taxpayer Name: John Doe" -> "Taxpayer Name: XXXXX", keeping the spacing after the colon
+    def replace(match_text: str) -> str:
+        label, _, rest = match_text.partition(':')
+        return f"{label}:{rest[:len(rest) - len(rest.lstrip())]}{placeholder}"
+    return replace
+
+# A currency symbol can sit right before an ID number. The per-rule passes masked the
+# ID first, so currency rules step aside when the digits after the symbol are one.
+def _not_followed_by(*patterns: str) -> str:
+    return '(?!' + '|'.join(patterns) + ')'
+
+_AADHAAR = r'\b\d{4}[\s\-]?\d{4}[\s\-]?\d{4}\b'
+_PHONE = r'\+?\d{1,2}[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{4}'
+
+# Gemini classifier and cascade (mask_sensitive_data); applied to normalized text.
+SENSITIVE_RULES: List[Tuple[str, str, Replacement]] = [
+    ("aadhaar", _AADHAAR, 'XXXXX'),
+    ("ssn", r'\b\d{3}-\d{2}-\d{4}\b', 'XXX-XX-XXXX'),
+    ("phone", _PHONE, 'Phone Number: XXXXX'),
+    ("email", r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}', 'EMAIL'),
+    ("currency", r'(?:₹|\$|Rs\.?)\s?' + _not_followed_by(_AADHAAR, r'\d{3}-\d{2}-\d{4}\b', _PHONE) + r'\d+[,.]?\d*', 'XXXXX'),
+    ("name", r'Name\s*[:\-]?\s*[A-Z][a-z]+\s[A-Z][a-z]+', 'Name: XXXXX'),
+]
+
+# BERT classifier (mask_pii); applied to raw OCR text, so values end at the line break.
+PII_RULES: List[Tuple[str, str, Replacement]] = [
+    ("aadhaar", _AADHAAR, 'XXXXX'),
+    ("pan", r'\b[A-Z]{5}[0-9]{4}[A-Z]\b', 'XXXXX'),
+    ("phone", r'\b\d{10}\b', 'XXXXX'),
+    ("currency", r'\$' + _not_followed_by(_AADHAAR, r'\d{10}\b') + r'\d{1,3}(?:,\d{3})*(?:\.\d{2})?', 'XXXXX'),
+    ("taxpayer_name", r'Taxpayer Name:\s*[^\n\x00]*', _keep_label('XXXXX')),
+]
+
+_WHITESPACE = re.compile(r'\s+')
+_PAGE_SEPARATOR = '\x00'
+
+class MaskingEngine:
+    """Single-pass PII masker for one rule set."""
+
+    def __init__(self, rules: List[Tuple[str, str, Replacement]], orgs: Iterable[str] = ()):
+        rules = list(rules)
+        orgs = [o for o in orgs if o]
+        if orgs:
+            # The org pass ran just before the currency pass.
+            org_pattern = r'(?i:\b(?:' + '|'.join(re.escape(o) for o in orgs) + r')\b)'
+            at = next((i for i, (name, _, _) in enumerate(rules) if name == "currency"), len(rules))
+            rules.insert(at, ("org", org_pattern, '[ORG]'))
+
+        self.rules = rules
+        self._replacements = {name: repl for name, _, repl in rules}
+        alternatives = '|'.join(f'(?P<{name}>{pattern})' for name, pattern, _ in rules)
+        self.pattern = re.compile(alternatives)
+
+    def _replace(self, match: re.Match) -> str:
+        repl = self._replacements[match.lastgroup]
+        return repl(match.group()) if callable(repl) else repl
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = text.encode('ascii', 'ignore').decode('utf-8', 'ignore').replace('\r', '')
+        return _WHITESPACE.sub(' ', text).strip()
+
+    def mask(self, text: str, normalize: bool = False) -> str:
+        if normalize:
+            text = self.normalize(text)
+        return self.pattern.sub(self._replace, text)
+
+    def mask_batch(self, texts: List[str], normalize: bool = False) -> List[str]:
+        # Pages are joined on a separator no rule can match, masked in one scan, then split back.
+        if not texts:
+            return []
+        pages = [t.replace(_PAGE_SEPARATOR, ' ') for t in texts]
+        if normalize:
+            pages = [self.normalize(p) for p in pages]
+        masked = self.pattern.sub(self._replace, _PAGE_SEPARATOR.join(pages))
+        return masked.split(_PAGE_SEPARATOR)
+
+def _orgs_from_env() -> List[str]:
+    configured = os.getenv("MASK_ORGS")
+    if configured is None:
+        return DEFAULT_ORGS
+    return [o.strip() for o in configured.split(',') if o.strip()]
+
+MASKER = MaskingEngine(SENSITIVE_RULES, orgs=_orgs_from_env())
+PII_MASKER = MaskingEngine(PII_RULES)
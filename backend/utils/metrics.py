@@ -0,0 +1,183 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# === Stage metrics ===
+# Every pipeline wraps its stages (upload, extract, ocr, chunk, embed, index,
+# retrieve, generate, db_write) in `stage(...)`. The endpoint and model labels
+# come from the request context set by the HTTP middleware and `set_model`, so
+# pipeline code never has to pass them around. Exported in Prometheus text format
+# on /metrics; prometheus_client is used when installed, otherwise a small
+# built-in registry renders the same series.
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_endpoint = contextvars.ContextVar("metrics_endpoint", default="-")
+_model = contextvars.ContextVar("metrics_model", default="-")
+
+
+# --- fallback registry ---
+def _label_str(names, values) -> str:
+    return ",".join(f'{n}="{v}"' for n, v in zip(names, values))
+
+
+class _Histogram:
+    def __init__(self, name, doc, labelnames, buckets=LATENCY_BUCKETS):
+        self.name, self.doc, self.labelnames, self.buckets = name, doc, labelnames, tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.setdefault(labels, [[0] * len(self.buckets), 0, 0.0])
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            for labels, (counts, total, acc) in self._series.items():
+                base = _label_str(self.labelnames, labels)
+                cumulative = 0
+                for le, n in zip(self.buckets, counts):
+                    cumulative += n
+                    yield f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}'
+                yield f'{self.name}_bucket{{{base},le="+Inf"}} {total}'
+                yield f"{self.name}_count{{{base}}} {total}"
+                yield f"{self.name}_sum{{{base}}} {acc}"
+
+
+class _Counter:
+    def __init__(self, name, doc, labelnames):
+        self.name, self.doc, self.labelnames = name, doc, labelnames
+        self._series: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for labels, value in self._series.items():
+                yield f"{self.name}_total{{{_label_str(self.labelnames, labels)}}} {value}"
+
+
+# --- metric definitions ---
+if prometheus_client is not None:
+    _stage_hist = prometheus_client.Histogram(
+        "financegpt_stage_seconds", "Time spent in one pipeline stage.",
+        ["endpoint", "model", "stage"], buckets=LATENCY_BUCKETS)
+    _request_hist = prometheus_client.Histogram(
+        "financegpt_request_seconds", "End-to-end HTTP request latency.",
+        ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS)
+    _cache_counter = prometheus_client.Counter(
+        "financegpt_cache_events", "Cache lookups by outcome.", ["cache", "result"])
+    _event_counter = prometheus_client.Counter(
+        "financegpt_events", "Routing and coalescing decisions by outcome.", ["event", "outcome"])
+    _gauge = prometheus_client.Gauge(
+        "financegpt_queue_depth", "Items waiting in an internal queue.", ["queue"])
+else:
+    _stage_hist = _Histogram("financegpt_stage_seconds", "Time spent in one pipeline stage.",
+                             ("endpoint", "model", "stage"))
+    _request_hist = _Histogram("financegpt_request_seconds", "End-to-end HTTP request latency.",
+                               ("endpoint", "method", "status"))
+    _cache_counter = _Counter("financegpt_cache_events", "Cache lookups by outcome.", ("cache", "result"))
+    _event_counter = _Counter("financegpt_events", "Routing and coalescing decisions by outcome.", ("event", "outcome"))
+    _gauge = None
+
+# Queue depths are sampled at scrape time rather than updated on every put/get.
+_queue_probes: Dict[str, Callable[[], float]] = {}
+
+
+# --- recording API ---
+def set_endpoint(endpoint: str):
+    _endpoint.set(endpoint)
+
+
+def set_model(model: Optional[str]):
+    _model.set(model or "-")
+
+
+def observe_stage(name: str, seconds: float, endpoint: str = None, model: str = None):
+    labels = (endpoint or _endpoint.get(), model or _model.get(), name)
+    if prometheus_client is not None:
+        _stage_hist.labels(*labels).observe(seconds)
+    else:
+        _stage_hist.observe(labels, seconds)
+
+
+@contextmanager
+def stage(name: str, endpoint: str = None, model: str = None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started, endpoint, model)
+
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float):
+    labels = (endpoint, method, str(status))
+    if prometheus_client is not None:
+        _request_hist.labels(*labels).observe(seconds)
+    else:
+        _request_hist.observe(labels, seconds)
+
+
+def record_cache(cache: str, hit: bool):
+    labels = (cache, "hit" if hit else "miss")
+    if prometheus_client is not None:
+        _cache_counter.labels(*labels).inc()
+    else:
+        _cache_counter.inc(labels)
+
+
+def count_event(event: str, outcome: str):
+    labels = (event, outcome)
+    if prometheus_client is not None:
+        _event_counter.labels(*labels).inc()
+    else:
+        _event_counter.inc(labels)
+
+
+def register_queue(name: str, probe: Callable[[], float]):
+    _queue_probes[name] = probe
+
+
+# --- export ---
+def _sample_queues() -> Dict[str, float]:
+    depths = {}
+    for name, probe in _queue_probes.items():
+        try:
+            depths[name] = float(probe())
+        except Exception:
+            continue
+    return depths
+
+
+def render_metrics():
+    """Returns (body, content_type) for the /metrics endpoint."""
+    depths = _sample_queues()
+    if prometheus_client is not None:
+        for name, depth in depths.items():
+            _gauge.labels(name).set(depth)
+        return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
+
+    lines = [*_stage_hist.render(), *_request_hist.render(), *_cache_counter.render(), *_event_counter.render(),
+             "# HELP financegpt_queue_depth Items waiting in an internal queue.",
+             "# TYPE financegpt_queue_depth gauge"]
+    lines += [f'financegpt_queue_depth{{queue="{name}"}} {depth}' for name, depth in depths.items()]
+    return ("\n".join(lines) + "\n").encode(), "text/plain; version=0.0.4; charset=utf-8"
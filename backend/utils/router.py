@@ -0,0 +1,181 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from utils.metrics import count_event, observe_stage
+
+# === Latency-aware routing with hedging ===
+# Each route has a remote primary (Gemini) and a local fallback model. The
+# primary gets a deadline taken from its own recent latency percentile; if it
+# has not produced a valid answer by then, the fallback is started as a hedge
+# and whichever valid answer arrives first wins. A primary whose recent error
+# rate is too high is skipped, except for one probe request (run hedged as
+# usual) every ROUTER_PROBE_INTERVAL_S; samples also age out after
+# ROUTER_SAMPLE_TTL_S, so an outage stops counting against it once it is over.
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "200"))
+ROUTER_PERCENTILE = float(os.getenv("ROUTER_PERCENTILE", "0.9"))
+ROUTER_MIN_DEADLINE_MS = float(os.getenv("ROUTER_MIN_DEADLINE_MS", "500"))
+ROUTER_MAX_DEADLINE_MS = float(os.getenv("ROUTER_MAX_DEADLINE_MS", "8000"))
+ROUTER_DEFAULT_DEADLINE_MS = float(os.getenv("ROUTER_DEFAULT_DEADLINE_MS", "3000"))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "20"))
+ROUTER_SAMPLE_TTL_S = float(os.getenv("ROUTER_SAMPLE_TTL_S", "300"))
+ROUTER_PROBE_INTERVAL_S = float(os.getenv("ROUTER_PROBE_INTERVAL_S", "30"))
+
+
+class BackendStats:
+    """Rolling window of (time, latency seconds, ok) for one backend.
+
+    ok is None for a call cancelled after losing a hedge: its latency is a lower
+    bound, so it counts towards the percentiles but not the error rate.
+    """
+
+    def __init__(self, window: int = ROUTER_WINDOW, ttl: float = ROUTER_SAMPLE_TTL_S):
+        self._samples = deque(maxlen=window)
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds, ok))
+
+    def _recent(self) -> list:
+        cutoff = time.monotonic() - self._ttl
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return [(seconds, ok) for _, seconds, ok in self._samples]
+
+    def percentile(self, q: float):
+        latencies = sorted(s for s, ok in self._recent() if ok is not False)
+        if len(latencies) < ROUTER_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def error_rate(self) -> float:
+        outcomes = [ok for _, ok in self._recent() if ok is not None]
+        if len(outcomes) < ROUTER_MIN_SAMPLES:
+            return 0.0
+        return sum(1 for ok in outcomes if not ok) / len(outcomes)
+
+    def snapshot(self) -> dict:
+        p50, p90 = self.percentile(0.5), self.percentile(0.9)
+        return {
+            "samples": len(self._recent()),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p90_ms": round(p90 * 1000, 1) if p90 is not None else None,
+            "error_rate": round(self.error_rate(), 3),
+        }
+
+
+class HedgedRouter:
+    def __init__(self, route: str, primary: str, fallback: str, percentile: float = ROUTER_PERCENTILE):
+        self.route = route
+        self.primary = primary
+        self.fallback = fallback
+        self.percentile = percentile
+        self.stats = {primary: BackendStats(), fallback: BackendStats()}
+        self._last_probe = 0.0
+
+    def deadline(self) -> float:
+        observed = self.stats[self.primary].percentile(self.percentile)
+        ms = observed * 1000 if observed is not None else ROUTER_DEFAULT_DEADLINE_MS
+        return min(max(ms, ROUTER_MIN_DEADLINE_MS), ROUTER_MAX_DEADLINE_MS) / 1000.0
+
+    def _launch(self, backend: str, factory: Callable[[], Awaitable[Any]], valid: Callable[[Any], bool]):
+        async def timed():
+            started = time.perf_counter()
+            try:
+                result = await factory()
+                ok = valid(result)
+            except asyncio.CancelledError:
+                # Lost the hedge: it took at least this long, which the deadline should know.
+                self.stats[backend].record(time.perf_counter() - started, None)
+                raise
+            except Exception:
+                result, ok = None, False
+            elapsed = time.perf_counter() - started
+            self.stats[backend].record(elapsed, ok)
+            observe_stage("route", elapsed, endpoint=self.route, model=backend)
+            return result, ok
+        return asyncio.ensure_future(timed())
+
+    async def run(self, primary: Callable[[], Awaitable[Any]], fallback: Callable[[], Awaitable[Any]],
+                  valid: Callable[[Any], bool] = lambda r: r is not None,
+                  fallback_valid: Callable[[Any], bool] = None) -> Tuple[Any, Dict]:
+        """Returns (result, decision); decision is stored alongside the result.
+
+        `valid` judges the primary's result and, unless `fallback_valid` is given,
+        the fallback's too; backends that report failures differently need both.
+        """
+        fallback_valid = fallback_valid or valid
+        deadline = self.deadline()
+        decision = {"route": self.route, "primary": self.primary, "fallback": self.fallback,
+                    "deadline_ms": round(deadline * 1000), "hedged": False}
+
+        if self.stats[self.primary].error_rate() > ROUTER_MAX_ERROR_RATE:
+            now = time.monotonic()
+            if now - self._last_probe < ROUTER_PROBE_INTERVAL_S:
+                decision.update(reason="primary_unhealthy", winner=self.fallback)
+                count_event(f"route_{self.route}", "primary_unhealthy")
+                task = self._launch(self.fallback, fallback, fallback_valid)
+                result, _ = await task
+                return result, decision
+            # Let this request try the primary (still hedged) so a recovery is noticed.
+            self._last_probe = now
+            decision["probe"] = True
+            count_event(f"route_{self.route}", "probe")
+
+        tasks = {self._launch(self.primary, primary, valid): self.primary}
+        done, _ = await asyncio.wait(tasks, timeout=deadline)
+        if done:
+            task = next(iter(done))
+            result, ok = task.result()
+            if ok:
+                decision.update(reason="primary", winner=self.primary)
+                count_event(f"route_{self.route}", "primary")
+                return result, decision
+
+        # Deadline passed or the primary failed: start the local model as a hedge.
+        decision.update(hedged=True, reason="primary_failed" if done else "deadline")
+        tasks[self._launch(self.fallback, fallback, fallback_valid)] = self.fallback
+        pending = {t for t in tasks if not t.done()}
+        last = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result, ok = task.result()
+                last = (result, tasks[task])
+                if ok:
+                    for other in pending:
+                        other.cancel()
+                    decision["winner"] = tasks[task]
+                    count_event(f"route_{self.route}", f"hedged_{tasks[task]}")
+                    return result, decision
+
+        # Neither produced a valid answer; return the fallback's attempt if there was one.
+        decision["winner"] = last[1] if last else None
+        count_event(f"route_{self.route}", "failed")
+        return (last[0] if last else None), decision
+
+    def snapshot(self) -> dict:
+        return {
+            "primary": self.primary,
+            "fallback": self.fallback,
+            "deadline_ms": round(self.deadline() * 1000),
+            "backends": {name: stats.snapshot() for name, stats in self.stats.items()},
+        }
+
+
+ROUTERS = {
+    "qa": HedgedRouter("qa", "gemini", "t5_small"),
+    "classify": HedgedRouter("classify", "gemini", "bert"),
+    "compliance": HedgedRouter("compliance", "gemini", "tinyllama"),
+}
+
+
+def router_stats() -> dict:
+    return {name: router.snapshot() for name, router in ROUTERS.items()}
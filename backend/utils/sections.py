@@ -0,0 +1,161 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.metrics import count_event
+
+# === Report section locator ===
+# Maps the sections targeted summaries care about to page ranges so only those
+# pages are extracted and embedded. The PDF outline is used when it names the
+# sections; otherwise page headings are matched against the usual 10-K "Item"
+# titles and annual-report headings. A page matching several headings is a
+# table of contents and is ignored. Page numbers are 0-based, ends exclusive.
+SECTION_PATTERNS = {
+    "risk_factors": r"(item\s*1a\.?\s*[:\-–]?\s*)?risk\s+factors\b",
+    "mdna": r"(item\s*7\.?\s*[:\-–]?\s*)?(management['’]?s?\s+discussion\s+and\s+analysis|md\s*&\s*a\b)",
+    "financial_statements": r"(item\s*8\.?\s*[:\-–]?\s*)?((consolidated|standalone)\s+)?financial\s+statements\b",
+    "auditor_report": r"(report\s+of\s+(the\s+)?independent\s+(registered\s+public\s+accounting\s+firm|auditors?)"
+                      r"|independent\s+auditor['’]?s?\s+report)",
+    "controls": r"(item\s*9a\.?\s*[:\-–]?\s*)?(controls\s+and\s+procedures|internal\s+control\s+over\s+financial\s+reporting)",
+}
+# Sub-sections end at the next heading of any kind; the rest run to the next top-level heading.
+NESTED_SECTIONS = {"auditor_report"}
+# Headings that only close the section before them.
+BOUNDARY_PATTERNS = [
+    r"item\s*\d{1,2}[a-c]?\.?\s",
+    r"(directors['’]?\s+report|corporate\s+governance\s+report|business\s+responsibility)",
+]
+NESTED_BOUNDARY_PATTERNS = [
+    r"consolidated\s+(balance\s+sheets?|statements?\s+of\s+(operations|income|cash\s+flows))",
+    r"notes\s+to\s+(the\s+)?(consolidated\s+)?financial\s+statements",
+]
+
+# Which sections each summary serves; types not listed use the whole report.
+SUMMARY_SECTIONS = {
+    "financial_only": ("financial_statements", "mdna"),
+    "risk_only": ("risk_factors",),
+}
+
+HEADING_MAX_CHARS = 100
+HEADING_LINES = 12
+HEADING_MAX_TRAILING_WORDS = 8
+
+_SECTION_RES = {name: re.compile(rf"^\s*{p}", re.IGNORECASE) for name, p in SECTION_PATTERNS.items()}
+_BOUNDARY_RES = [re.compile(rf"^\s*{p}", re.IGNORECASE) for p in BOUNDARY_PATTERNS]
+_NESTED_BOUNDARY_RES = [re.compile(rf"^\s*{p}", re.IGNORECASE) for p in NESTED_BOUNDARY_PATTERNS]
+
+
+def _is_heading(line: str, match) -> bool:
+    # Body text can start with the same words; headings are capitalized and short.
+    significant = [w for w in re.findall(r"[A-Za-z]+", match.group(0)) if len(w) > 3]
+    trailing = re.findall(r"[A-Za-z]+", line[match.end():])
+    return all(w[0].isupper() for w in significant) and len(trailing) <= HEADING_MAX_TRAILING_WORDS
+
+
+def match_section(title: str, strict: bool = False) -> Optional[str]:
+    """Section name for an outline title, or for a page line when `strict`."""
+    title = title.strip()
+    if len(title) > HEADING_MAX_CHARS:
+        return None
+    for name, pattern in _SECTION_RES.items():
+        match = pattern.match(title)
+        if match and (not strict or _is_heading(title, match)):
+            return name
+    return None
+
+
+def _matches_any(line: str, patterns) -> bool:
+    for pattern in patterns:
+        match = pattern.match(line)
+        if match and _is_heading(line, match):
+            return True
+    return False
+
+
+def _from_outline(toc: List[list], page_count: int) -> Dict[str, Tuple[int, int]]:
+    entries = [(level, title, page - 1) for level, title, page in toc if 0 < page <= page_count]
+    sections = {}
+    for i, (level, title, start) in enumerate(entries):
+        name = match_section(title)
+        if name is None or name in sections:
+            continue
+        end = next((p for lvl, _, p in entries[i + 1:] if lvl <= level and p > start), page_count)
+        sections[name] = (start, max(end, start + 1))
+    return sections
+
+
+def _page_headings(page_text: str):
+    """Section names and boundary kinds found in the first lines of one page."""
+    named, top, nested = set(), False, False
+    lines = [line for line in page_text.splitlines() if line.strip()][:HEADING_LINES]
+    for line in lines:
+        line = line.strip()
+        if len(line) > HEADING_MAX_CHARS:
+            continue
+        name = match_section(line, strict=True)
+        if name is not None:
+            named.add(name)
+        elif _matches_any(line, _BOUNDARY_RES):
+            top = True
+        elif _matches_any(line, _NESTED_BOUNDARY_RES):
+            nested = True
+    return named, top, nested
+
+
+def _closes(name: str, headings) -> bool:
+    """Whether a page with these headings ends section `name`.
+
+    A page headed only by the section's own title (a running header, or
+    "Risk Factors (continued)") is still inside it.
+    """
+    named, top, nested = headings
+    others = named - {name}
+    if name in NESTED_SECTIONS:
+        return bool(others or top or nested)
+    return bool(others - NESTED_SECTIONS or top)
+
+
+def _from_headings(page_texts: List[str]) -> Dict[str, Tuple[int, int]]:
+    starts: Dict[str, int] = {}
+    heading_pages = []
+    for page_no, text in enumerate(page_texts):
+        named, top, nested = _page_headings(text)
+        if len(named) >= 3:
+            continue  # table of contents
+        for name in named:
+            starts.setdefault(name, page_no)
+        if named or top or nested:
+            heading_pages.append((page_no, (named, top, nested)))
+
+    page_count = len(page_texts)
+    sections = {}
+    for name, start in starts.items():
+        # The next heading may share its page with the end of this section, so keep that page.
+        end = next((p + 1 for p, headings in heading_pages if p > start and _closes(name, headings)), page_count)
+        sections[name] = (start, end)
+    return sections
+
+
+def locate_sections(pdf) -> Dict[str, Tuple[int, int]]:
+    """Section page ranges for a PDF given as a path or as bytes."""
+    import fitz  # only needed here; the locators work on the outline and page text
+
+    with (fitz.open("pdf", pdf) if isinstance(pdf, bytes) else fitz.open(pdf)) as doc:
+        sections = _from_outline(doc.get_toc(simple=True), doc.page_count)
+        if sections:
+            count_event("sections", "outline")
+            return sections
+        sections = _from_headings([page.get_text("text") for page in doc])
+    count_event("sections", "headings" if sections else "not_found")
+    return sections
+
+
+def pages_for(sections: Dict[str, Tuple[int, int]], wanted: Optional[Iterable[str]]) -> Optional[List[int]]:
+    """Sorted pages covering the wanted sections, or None to use the whole report."""
+    if not wanted:
+        return None
+    pages = set()
+    for name in wanted:
+        if name in sections:
+            start, end = sections[name]
+            pages.update(range(start, end))
+    return sorted(pages) or None
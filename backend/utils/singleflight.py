@@ -0,0 +1,55 @@
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from db.result_writer import RESULT_WRITER
+from utils.metrics import count_event, register_queue
+
+
+# === Single-flight request coalescing ===
+# Identical requests (same endpoint, same uploaded content, same parameters)
+# arriving while one is already being computed await that computation instead of
+# starting their own. The shared work runs as its own task, so a leader whose
+# client disconnects does not cancel it for the followers. History documents
+# the leader writes are captured and re-written under each follower's user_id,
+# so every caller still gets its own history entry.
+class SingleFlight:
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._flights: Dict[tuple, asyncio.Task] = {}
+        register_queue(f"{name}_inflight", lambda: len(self._flights))
+
+    @staticmethod
+    def key(endpoint: str, content, **params) -> tuple:
+        digest = hashlib.sha256()
+        if content is not None:
+            digest.update(content if isinstance(content, bytes) else str(content).encode("utf-8"))
+        return (endpoint, digest.hexdigest(), tuple(sorted(params.items())))
+
+    @staticmethod
+    async def _run(fn: Callable[[], Awaitable[Any]]):
+        with RESULT_WRITER.capture() as writes:
+            result = await fn()
+        return result, writes
+
+    async def do(self, key: tuple, fn: Callable[[], Awaitable[Any]], user_id: Optional[str] = None) -> Any:
+        endpoint = key[0]
+        task = self._flights.get(key)
+        if task is None:
+            count_event(f"{self.name}:{endpoint}", "leader")
+            task = asyncio.ensure_future(self._run(fn))
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._flights.pop(key, None) if self._flights.get(key) is t else None)
+            result, _ = await asyncio.shield(task)
+            return result
+
+        count_event(f"{self.name}:{endpoint}", "coalesced")
+        result, writes = await asyncio.shield(task)
+        if user_id:
+            for collection, document in writes:
+                await RESULT_WRITER.write(collection, {**document, "user_id": user_id, "timestamp": datetime.utcnow()})
+        return result
+
+
+SINGLE_FLIGHT = SingleFlight()